@@ -26,8 +26,11 @@ import datetime
 import logging
 import importlib
 import csv
+import multiprocessing
 import tempfile
+import time
 import iris
+import yaml
 from esmvaltool.diag_scripts.shared import run_diagnostic
 
 logger = logging.getLogger(__name__)
@@ -175,6 +178,52 @@ def _get_filelists(cfg):
     return metrics_dict, obs_list
 
 
+def _get_manifest(filelist):
+    """Get the size and modification time of the input files."""
+    return {
+        path: [os.path.getsize(path), os.path.getmtime(path)]
+        for path in sorted(set(filelist))
+    }
+
+
+def _link_file(source, target):
+    """Link a file to a new path; hard link if possible, else symlink."""
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        os.symlink(os.path.abspath(source), target)
+
+
+def _save_cubelist(filelist, cubes_list_path, link_paths=(), reuse=False):
+    """
+    Concatenate files into a single cubeList file, and link it elsewhere.
+
+    The cubes are loaded and saved lazily, and written only once; the other
+    paths are links to the same file. A manifest of the input files is kept
+    next to the cubeList file: if `reuse` is set and the input files have not
+    changed since it was written, the existing cubeList file is kept.
+    """
+    manifest = _get_manifest(filelist)
+    manifest_path = os.path.splitext(cubes_list_path)[0] + '_manifest.yml'
+    up_to_date = False
+    if reuse and os.path.exists(cubes_list_path) and os.path.exists(
+            manifest_path):
+        with open(manifest_path, 'r') as file_handle:
+            up_to_date = yaml.safe_load(file_handle) == manifest
+    if up_to_date:
+        logger.info("Inputs of %s unchanged, reusing it", cubes_list_path)
+    else:
+        cubelist = _fix_cube(iris.load(filelist))
+        iris.save(cubelist, cubes_list_path)
+        with open(manifest_path, 'w') as file_handle:
+            yaml.safe_dump(manifest, file_handle)
+    for link_path in link_paths:
+        _link_file(cubes_list_path, link_path)
+    return cubes_list_path
+
+
 def _process_obs(cfg, obs_list, obs_loc):
     """Gather obs files and save them applying specific cases."""
     group_files = [[
@@ -182,26 +231,25 @@ def _process_obs(cfg, obs_list, obs_loc):
         if os.path.basename(ofile).split('_')[1] == obs
     ] for obs in cfg['obs_models']]
     for obs_file_group, obs_name in zip(group_files, cfg['obs_models']):
-        cubes_list_obs = iris.load(obs_file_group)
-        cubes_list_obs = _fix_cube(cubes_list_obs)
         obs_file_name = obs_name + '_cubeList.nc'
-        iris.save(cubes_list_obs, os.path.join(obs_loc, obs_file_name))
+        _save_cubelist(obs_file_group,
+                       os.path.join(obs_loc, obs_file_name),
+                       reuse=cfg.get('reuse_cubelists', False))
 
 
-def _process_metrics_data(all_files, suites, smeans):
+def _process_metrics_data(all_files, suites, smeans, reuse=False):
     """Create and save concatenated cubes for ctrl and exp."""
     cubes_lists_paths = []
     for key in all_files.keys():
         filelist = all_files[key]
         if filelist:
-            cubelist = iris.load(filelist)
-
-            # save to congragated files; save twice for supermeans as well
+            # save to congragated files; link for supermeans as well
             cubes_list_path = os.path.join(suites[key], 'cubeList.nc')
             cubes_list_smean_path = os.path.join(smeans[key], 'cubeList.nc')
-            cubelist = _fix_cube(cubelist)
-            iris.save(cubelist, cubes_list_path)
-            iris.save(cubelist, cubes_list_smean_path)
+            _save_cubelist(filelist,
+                           cubes_list_path,
+                           link_paths=[cubes_list_smean_path],
+                           reuse=reuse)
             cubes_lists_paths.append(cubes_list_path)
 
     return cubes_lists_paths
@@ -298,7 +346,11 @@ def _setup_input(cfg):
     logger.info("Files for obs model NOT for metrics: %s", obs_list)
 
     # load and save control and exp cubelists
-    all_cubelists = _process_metrics_data(metrics_dict, suites, smeans)
+    all_cubelists = _process_metrics_data(
+        metrics_dict,
+        suites,
+        smeans,
+        reuse=cfg.get('reuse_cubelists', False))
 
     # print the paths
     logger.info("Saved control data cubes: %s", str(all_cubelists))
@@ -358,6 +410,58 @@ def _create_run_dict(cfg):
     return run
 
 
+def _init_metrics_worker(log_level):
+    """Set up the logging of a worker process like run_diagnostic does."""
+    logging.basicConfig(format="%(asctime)s [%(process)d] %(levelname)-8s "
+                        "%(name)s,%(lineno)s\t%(message)s")
+    logging.Formatter.converter = time.gmtime
+    logging.captureWarnings(True)
+    logging.getLogger().setLevel(log_level.upper())
+
+
+def _calculate_suite_metrics(run_obj):
+    """
+    Run all metric functions of the area for a single suite.
+
+    Returns the metrics, in the order in which the metric functions produce
+    them, and the time each metric function took.
+    """
+    area_package = _import_package(run_obj['_area'])
+    all_metrics = {}
+    timings = []
+
+    # run each metric function
+    for metric_function in area_package.metrics_functions:
+        logger.info('# Call: %s', metric_function)
+
+        # run the metric
+        start = time.time()
+        metrics = metric_function(run_obj)
+        timings.append((metric_function.__name__, time.time() - start))
+        # check duplication
+        duplicate_metrics = list(
+            set(all_metrics.keys()) & set(metrics.keys()))
+        if duplicate_metrics:
+            raise AssertionError('Duplicate Metrics ' +
+                                 str(duplicate_metrics))
+        all_metrics.update(metrics)
+
+    return all_metrics, timings
+
+
+def _write_suite_metrics(dump_output, all_metrics, timings):
+    """Write the metrics and timings of a suite to csv files."""
+    with open(os.path.join(dump_output, 'metrics.csv'), 'w') as file_handle:
+        writer = csv.writer(file_handle)
+        for metric in all_metrics.items():
+            writer.writerow(metric)
+    with open(os.path.join(dump_output, 'metrics_timings.csv'),
+              'w') as file_handle:
+        writer = csv.writer(file_handle)
+        for timing in timings:
+            writer.writerow(timing)
+
+
 def run_area(cfg):
     """
     Kick start the area diagnostic.
@@ -372,6 +476,10 @@ def run_area(cfg):
 
     Available assessment areas: stratosphere.
 
+    The metrics of the suites are independent of each other; if the `n_workers`
+    option is larger than one, they are calculated in a pool of that many
+    processes.
+
     Parameters
     ----------
     cfg: dict
@@ -383,8 +491,8 @@ def run_area(cfg):
     area_out_dir = create_output_tree(run_obj['out_dir'], run_obj['suite_id1'],
                                       run_obj['suite_id2'], run_obj['_area'])
 
-    # the areas write all output to the cwd
-    os.chdir(area_out_dir)
+    # the areas write all output to the area output directory
+    run_obj['area_out_dir'] = os.path.abspath(area_out_dir)
 
     # import area here to allow removal of areas
     area_package = _import_package(run_obj['_area'])
@@ -395,36 +503,40 @@ def run_area(cfg):
         if run_obj['additional_metrics']:
             suite_ids.extend(run_obj['additional_metrics'])
 
-    # run the metrics generation
+    # setup for file dumping
+    suite_runs = []
     for suite_id in suite_ids:
-        logger.info('Calculating metrics for %s', suite_id)
-        # setup for file dumping
-        run_obj['runid'] = suite_id
-        run_obj['dump_output'] = os.path.join(area_out_dir, suite_id)
-        if not os.path.exists(run_obj['dump_output']):
-            os.makedirs(run_obj['dump_output'])
-        all_metrics = {}
-
-        # run each metric function
-        for metric_function in area_package.metrics_functions:
-            logger.info('# Call: %s', metric_function)
-
-            # run the metric
-            metrics = metric_function(run_obj)
-            # check duplication
-            duplicate_metrics = list(
-                set(all_metrics.keys()) & set(metrics.keys()))
-            if duplicate_metrics:
-                raise AssertionError('Duplicate Metrics ' +
-                                     str(duplicate_metrics))
-            all_metrics.update(metrics)
-
-        # write metrics to file
-        with open(os.path.join(run_obj['dump_output'], 'metrics.csv'),
-                  'w') as file_handle:
-            writer = csv.writer(file_handle)
-            for metric in all_metrics.items():
-                writer.writerow(metric)
+        suite_run = dict(run_obj)
+        suite_run['runid'] = suite_id
+        suite_run['dump_output'] = os.path.join(run_obj['area_out_dir'],
+                                                suite_id)
+        if not os.path.exists(suite_run['dump_output']):
+            os.makedirs(suite_run['dump_output'])
+        suite_runs.append(suite_run)
+
+    # run the metrics generation
+    n_workers = int(cfg.get('n_workers', 1))
+    if n_workers > 1:
+        logger.info('Calculating metrics for %s on %i processes',
+                    suite_ids, n_workers)
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(n_workers,
+                          initializer=_init_metrics_worker,
+                          initargs=(cfg.get('log_level', 'info'), )) as pool:
+            results = pool.map(_calculate_suite_metrics, suite_runs,
+                               chunksize=1)
+    else:
+        results = []
+        for suite_run in suite_runs:
+            logger.info('Calculating metrics for %s', suite_run['runid'])
+            results.append(_calculate_suite_metrics(suite_run))
+
+    # write metrics to file
+    for suite_run, (all_metrics, timings) in zip(suite_runs, results):
+        for name, seconds in timings:
+            logger.info('Metric %s for %s took %.1f s', name,
+                        suite_run['runid'], seconds)
+        _write_suite_metrics(suite_run['dump_output'], all_metrics, timings)
 
     # multimodel functions
     if hasattr(area_package, 'multi_functions'):
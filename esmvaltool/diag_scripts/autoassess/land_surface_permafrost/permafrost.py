@@ -3,13 +3,13 @@
 import os
 
 import cartopy.crs as ccrs
+import dask.array as da
 import matplotlib.pyplot as plt
 import numpy as np
 
 import iris
 import iris.coord_categorisation
 import iris.quickplot as qplt
-import iris.util as ut
 
 from esmvaltool.diag_scripts.autoassess.loaddata import load_run_ss
 # from esmvaltool.diag_scripts.shared._supermeans import get_supermean
@@ -29,7 +29,7 @@ def land_permafrost_top(run):
 
     Returns:
         metrics - dictionary of metrics names and values
-        also produces image files in the current working directory
+        also produces image files in the area output directory
 
     """
     metrics = dict()
@@ -91,7 +91,10 @@ def permafrost_area(soiltemp, airtemp, landfrac, run):
     # Make an aggregator to define the permafrost extent
     # I dont really understand this but it works
     frozen_count = iris.analysis.Aggregator(
-        'frozen_count', num_frozen, units_func=lambda units: 1)
+        'frozen_count',
+        num_frozen,
+        units_func=lambda units: 1,
+        lazy_func=num_frozen)
 
     # Calculate the permafrost locations
     pf_periods = soiltemp.collapsed(
@@ -146,7 +149,9 @@ def permafrost_area(soiltemp, airtemp, landfrac, run):
     qplt.contour(airtemp, levels, colors='k', linewidths=3)
     plt.title('Permafrost extent & zero degree isotherm ({})'.format(
         run['runid']))
-    plt.savefig('pf_extent_north_america_' + run['runid'] + '.png')
+    plt.savefig(
+        os.path.join(run['area_out_dir'],
+                     'pf_extent_north_america_' + run['runid'] + '.png'))
 
     # Figure Permafrost extent asia
     plt.figure(figsize=(8, 8))
@@ -160,7 +165,9 @@ def permafrost_area(soiltemp, airtemp, landfrac, run):
     qplt.contour(airtemp, levels, colors='k', linewidths=3)
     plt.title('Permafrost extent & zero degree isotherm ({})'.format(
         run['runid']))
-    plt.savefig('pf_extent_asia_' + run['runid'] + '.png')
+    plt.savefig(
+        os.path.join(run['area_out_dir'],
+                     'pf_extent_asia_' + run['runid'] + '.png'))
 
     # defining metrics for return up to top level
     metrics = {
@@ -172,6 +179,24 @@ def permafrost_area(soiltemp, airtemp, landfrac, run):
 
 
 # define the frozen area
+def _count_full_windows(hits, axis, window):
+    """Count the windows along an axis which are full of True-s."""
+    # The number of True-s in a window is the difference of the cumulative
+    # counts at its ends, so no array of all windows is needed.
+    counts = hits.cumsum(axis=axis, dtype=int)
+
+    def select(index):
+        """Select an index or slice along the axis."""
+        return (slice(None), ) * axis + (index, )
+
+    if counts.shape[axis] < window:
+        return (counts[select(0)] * 0).astype(int)
+    later_windows = counts[select(slice(window, None))] - counts[select(
+        slice(None, -window))]
+    return ((counts[select(window - 1)] == window).astype(int) +
+            (later_windows == window).sum(axis=axis, dtype=int))
+
+
 def num_frozen(data, threshold, axis, frozen_length):
     """
     Count valid frozen points.
@@ -180,20 +205,29 @@ def num_frozen(data, threshold, axis, frozen_length):
     is less than freezing for at least a certain number of timepoints.
 
     Generalised to operate on multiple time sequences arranged on a specific
-    axis of a multidimensional array.
+    axis of a multidimensional array. Works on numpy and (lazily) on dask
+    arrays, in time and memory proportional to the size of the data.
     """
     if axis < 0:
         # just cope with negative axis numbers
         axis += data.ndim
 
+    if isinstance(data, da.Array):
+        array_ma = da.ma
+    else:
+        array_ma = np.ma
+
     # Threshold the data to find the 'significant' points.
-    data_hits = data < threshold
-    # Make an array with data values "windowed" along the time axis.
-    hit_windows = ut.rolling_window(data_hits, window=frozen_length, axis=axis)
-    # Find the windows "full of True-s" (along the added 'window axis').
-    full_windows = np.all(hit_windows, axis=axis + 1)
-    # Count points fulfilling the condition (along the time axis).
-    frozen_point_counts = np.sum(full_windows, axis=axis, dtype=int)
+    # Masked points are counted like 'significant' points, but windows
+    # without any valid point are not counted.
+    data_hits = array_ma.filled(data < threshold, True)
+    frozen_point_counts = _count_full_windows(data_hits, axis, frozen_length)
+    if array_ma is da.ma or np.ma.is_masked(data):
+        mask = array_ma.getmaskarray(data)
+        frozen_point_counts = array_ma.masked_where(
+            mask.all(axis=axis),
+            frozen_point_counts - _count_full_windows(mask, axis,
+                                                      frozen_length))
 
     return frozen_point_counts
 
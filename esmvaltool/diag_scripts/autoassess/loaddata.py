@@ -20,46 +20,57 @@ from datetime import datetime as dd
 import cf_units
 import iris
 import iris.coord_categorisation as coord_cat
+import numpy as np
+
+
+# Cube lists of the assessment areas and the index of their cubes, keyed on
+# the path of the cubeList file
+CUBELISTS = {}
+
+STASH_REGEX = '^m01s[0-9]{2}i[0-9]{3}$'
+
+MICROSECOND = td(microseconds=1)
+
+
+def _get_time_spans(cube, unit):
+    """Get the lengths of all time bounds in microseconds, like `timedelta`."""
+    bounds = np.asarray(cube.coord('time').bounds, dtype=float)
+    return np.round((bounds[..., 1] - bounds[..., 0]) * (unit / MICROSECOND))
+
+
+def _in_microseconds(days):
+    """Get a number of days in microseconds."""
+    return td(days=days) // MICROSECOND
 
 
 def is_daily(cube):
     """Test whether the time coordinate contains only daily bound periods."""
-    def is_day(bound):
-        """Check if day."""
-        time_span = td(hours=(bound[1] - bound[0]))
-        return td(days=1) == time_span
-
-    return all([is_day(bound) for bound in cube.coord('time').bounds])
+    time_spans = _get_time_spans(cube, td(hours=1))
+    return bool(np.all(time_spans == _in_microseconds(1)))
 
 
 def is_monthly(cube):
     """A month is a period of at least 28 days, up to 31 days."""
-    def is_month(bound):
-        """Check if month."""
-        time_span = td(days=(bound[1] - bound[0]))
-        return td(days=31) >= time_span >= td(days=28)
-
-    return all([is_month(bound) for bound in cube.coord('time').bounds])
+    time_spans = _get_time_spans(cube, td(days=1))
+    return bool(
+        np.all((time_spans >= _in_microseconds(28))
+               & (time_spans <= _in_microseconds(31))))
 
 
 def is_seasonal(cube):
     """Season is 3 months, i.e. at least 89 days, and up to 92 days."""
-    def is_season(bound):
-        """Check if season."""
-        time_span = td(days=(bound[1] - bound[0]))
-        return td(days=31 + 30 + 31) >= time_span >= td(days=28 + 31 + 30)
-
-    return all([is_season(bound) for bound in cube.coord('time').bounds])
+    time_spans = _get_time_spans(cube, td(days=1))
+    return bool(
+        np.all((time_spans >= _in_microseconds(28 + 31 + 30))
+               & (time_spans <= _in_microseconds(31 + 30 + 31))))
 
 
 def is_yearly(cube):
     """A year is a period of at least 360 days, up to 366 days."""
-    def is_year(bound):
-        """Check if year."""
-        time_span = td(days=(bound[1] - bound[0]))
-        return td(days=365) == time_span or td(days=360) == time_span
-
-    return all([is_year(bound) for bound in cube.coord('time').bounds])
+    time_spans = _get_time_spans(cube, td(days=1))
+    return bool(
+        np.all((time_spans == _in_microseconds(365))
+               | (time_spans == _in_microseconds(360))))
 
 
 def is_time_mean(cube):
@@ -100,8 +111,7 @@ def select_by_variable_name(cubes, variable_name):
     :returns: CubeList with Cubes that have a matching STASH attribute.
     :rtype: CubeList
     """
-    regex = '^m01s[0-9]{2}i[0-9]{3}$'
-    if re.match(regex, variable_name):
+    if re.match(STASH_REGEX, variable_name):
         constraint = iris.AttributeConstraint(STASH=variable_name)
     else:
         constraint = iris.Constraint(variable_name)
@@ -149,6 +159,21 @@ def annual_mean(mycube):
     return yr_mean.extract(t_bound)
 
 
+def _has_averaging_period(cube, averaging_period):
+    """Check whether a cube is averaged over a certain period."""
+    select_period = {
+        'daily': is_daily,
+        'monthly': is_monthly,
+        'seasonal': is_seasonal,
+        'annual': is_yearly
+    }
+    if averaging_period == 'seasonal':
+        cube = seasonal_mean(cube.copy())
+    elif averaging_period == 'annual':
+        cube = annual_mean(cube)
+    return select_period[averaging_period](cube)
+
+
 def select_by_averaging_period(cubes, averaging_period):
     """
     Select subset from CubeList depending on averaging period.
@@ -161,26 +186,10 @@ def select_by_averaging_period(cubes, averaging_period):
     :raises: `AssertionError` if `cubes` is not a `list`.
     """
     assert isinstance(cubes, list)
-    select_period = {
-        'daily': is_daily,
-        'monthly': is_monthly,
-        'seasonal': is_seasonal,
-        'annual': is_yearly
-    }
-    if averaging_period == 'seasonal':
-        selected_cubes = [
-            cube for cube in cubes
-            if select_period[averaging_period](seasonal_mean(cube))
-        ]
-    elif averaging_period == 'annual':
-        selected_cubes = [
-            cube for cube in cubes
-            if select_period[averaging_period](annual_mean(cube))
-        ]
-    else:
-        selected_cubes = [
-            cube for cube in cubes if select_period[averaging_period](cube)
-        ]
+    selected_cubes = [
+        cube for cube in cubes
+        if _has_averaging_period(cube, averaging_period)
+    ]
     return iris.cube.CubeList(selected_cubes)
 
 
@@ -265,9 +274,21 @@ def select_by_initial_meaning_period(cubes, lbtim):
     :rtype: Iris CubeList
     :raises: `NotImplementedError` for not implemented values in `lbtim`.
     """
+    assert isinstance(cubes, list)
+    _check_lbtim(lbtim)
+
+    selected_cubes = iris.cube.CubeList()
+    for meaning_period in _get_lbtim_meaning_periods(lbtim):
+        for cube in cubes:
+            if _get_meaning_period(cube) == meaning_period:
+                selected_cubes.append(cube)
+    return selected_cubes
+
+
+def _check_lbtim(lbtim):
+    """Check that the values of `lbtim` are implemented."""
     implemented_values = [121, 122, 621, 622]
 
-    assert isinstance(cubes, list)
     assert isinstance(lbtim, list)
 
     lbtims = lbtim
@@ -276,23 +297,24 @@ def select_by_initial_meaning_period(cubes, lbtim):
               'Given:' + str(lbtims)
         raise NotImplementedError(msg)
 
-    selected_cubes = iris.cube.CubeList()
-    for lbtim in lbtims:
-        i_a, i_c = str(lbtim)[:][0], str(lbtim)[:][2]
 
-        for cube in cubes:
-            # select by original meaning interval (IA)
-            select_meaning_interval = {1: ('1 hour', ), 6: ('6 hour', )}
-            if select_meaning_interval[int(
-                    i_a)] != cube.cell_methods[0].intervals:
-                continue
-
-            # select calendar (I_C)
-            # see cf_units.CALENDARS for possible cube calendars
-            select_calendar = {1: 'gregorian', 2: '360_day'}
-            if select_calendar[int(i_c)] == cube.coord('time').units.calendar:
-                selected_cubes.append(cube)
-    return selected_cubes
+def _get_lbtim_meaning_periods(lbtim):
+    """Get the initial meaning interval and calendar encoded in `lbtim`."""
+    # select by original meaning interval (IA)
+    select_meaning_interval = {1: ('1 hour', ), 6: ('6 hour', )}
+    # select calendar (I_C)
+    # see cf_units.CALENDARS for possible cube calendars
+    select_calendar = {1: 'gregorian', 2: '360_day'}
+    return [(select_meaning_interval[int(str(value)[0])],
+             select_calendar[int(str(value)[2])]) for value in lbtim]
+
+
+def _get_meaning_period(cube):
+    """Get the initial meaning interval and calendar of a cube."""
+    if not cube.cell_methods or not cube.coords('time'):
+        return None
+    return (cube.cell_methods[0].intervals,
+            cube.coord('time').units.calendar)
 
 
 def select_certain_months(cubes, lbmon):
@@ -365,6 +387,115 @@ def extract_time_range(cubes, start, end):
     return time_ranged_cubes
 
 
+def _describe_cube(cube):
+    """Get the properties of a cube which are used to select it."""
+    pressure_levels = None
+    if cube.coords('pressure'):
+        pressure_levels = cube.coord('pressure').points
+    return {
+        'name': cube.name(),
+        'stash': str(cube.attributes.get('STASH', '')),
+        'meaning_period': _get_meaning_period(cube),
+        'pressure_levels': pressure_levels,
+        'averaging_periods': {},
+    }
+
+
+def index_cubes(cubes):
+    """
+    Index the cubes of a CubeList by their properties.
+
+    The names, initial meaning periods and pressure levels of the cubes are
+    determined once, so that repeated selections from the same cubes are
+    dictionary lookups. The averaging periods of the cubes are determined the
+    first time they are asked for.
+
+    :param CubeList cubes: Iris CubeList.
+    :returns: Dictionary with the descriptors of the cubes ('descriptors'),
+        and the positions of the cubes by CF-name ('names') and STASH code
+        ('stash').
+    :rtype: dict
+    """
+    index = {
+        'descriptors': [_describe_cube(cube) for cube in cubes],
+        'names': {},
+        'stash': {},
+    }
+    for i, descriptor in enumerate(index['descriptors']):
+        index['names'].setdefault(descriptor['name'], []).append(i)
+        if descriptor['stash']:
+            index['stash'].setdefault(descriptor['stash'], []).append(i)
+    return index
+
+
+def load_cubelist(cubelist_path):
+    """
+    Load a CubeList and its index, or get them from the cache.
+
+    The CubeList is loaded again only if the file has changed since it was
+    last loaded. The cached cubes must not be modified, copy them instead.
+
+    :param str cubelist_path: Path to the CubeList file.
+    :returns: The CubeList, sorted by standard name, and its index, see
+        `index_cubes`.
+    :rtype: tuple
+    """
+    stat = os.stat(cubelist_path)
+    file_id = (stat.st_size, stat.st_mtime)
+    cached = CUBELISTS.get(cubelist_path)
+    if cached is None or cached[0] != file_id:
+        cubes = iris.load(cubelist_path)
+        cubes.sort(key=lambda c: c.standard_name)
+        cached = (file_id, cubes, index_cubes(cubes))
+        CUBELISTS[cubelist_path] = cached
+    return cached[1:]
+
+
+def _select_indexed_cubes(cubes, index, averaging_period, variable_name,
+                          lblev, lbtim):
+    """
+    Select copies of the cubes matching a variable, period, level and lbtim.
+
+    The cubes are not cut to the pressure levels `lblev`, only the cubes
+    without any of these levels are left out.
+
+    See `load_run_ss` for explanation of the arguments.
+    """
+    if re.match(STASH_REGEX, variable_name):
+        positions = index['stash'].get(variable_name, [])
+    else:
+        positions = index['names'].get(variable_name, [])
+
+    if averaging_period in ['daily', 'monthly', 'seasonal', 'annual']:
+        selected = []
+        for i in positions:
+            periods = index['descriptors'][i]['averaging_periods']
+            if averaging_period not in periods:
+                # Use a copy, aggregating may realize the cached data
+                periods[averaging_period] = _has_averaging_period(
+                    cubes[i].copy(), averaging_period)
+            if periods[averaging_period]:
+                selected.append(i)
+        positions = selected
+
+    if lblev:
+        positions = [
+            i for i in positions
+            if index['descriptors'][i]['pressure_levels'] is not None and
+            np.isin(index['descriptors'][i]['pressure_levels'], lblev).any()
+        ]
+
+    if lbtim:
+        _check_lbtim(lbtim)
+        positions = [
+            i for meaning_period in _get_lbtim_meaning_periods(lbtim)
+            for i in positions
+            if index['descriptors'][i]['meaning_period'] == meaning_period
+        ]
+
+    return iris.cube.CubeList(cubes[i].copy() for i in positions)
+
+
 def load_run_ss(run_object,
                 averaging_period,
                 variable_name,
@@ -393,6 +524,9 @@ def load_run_ss(run_object,
     Unified Model Documentation Paper F03: "Input and Output File Formats"
     available here: https://code.metoffice.gov.uk/doc/um/vn10.5/umdp.html
 
+    The CubeList is loaded and indexed only once per file, see
+    `load_cubelist`.
+
     :param dict run_object: Dictionary specifying the assessment run. For its
         contents see `function: create_run_object` in the module
         `autoassess.run_area`.
@@ -417,8 +551,7 @@ def load_run_ss(run_object,
     cubelist_path = os.path.join(run_object['data_root'], run_object['runid'],
                                  run_object['_area'], cubelist_file)
 
-    cubes = iris.load(cubelist_path)
-    cubes.sort(key=lambda c: c.standard_name)
+    cubes, index = load_cubelist(cubelist_path)
 
     return _load_run_ss(
         cubes,
@@ -430,7 +563,8 @@ def load_run_ss(run_object,
         lblev=lblev,
         lbtim=lbtim,
         from_dt=from_dt,
-        to_dt=to_dt)
+        to_dt=to_dt,
+        index=index)
 
 
 def _load_run_ss(cubes,
@@ -442,11 +576,13 @@ def _load_run_ss(cubes,
                  lblev=None,
                  lbtim=None,
                  from_dt=None,
-                 to_dt=None):
+                 to_dt=None,
+                 index=None):
     """
     Select a single Cube from the given cubes.
 
-    See `load_run_ss` for explanation of the arguments.
+    See `load_run_ss` for explanation of the arguments. The given cubes are
+    not modified. If the `index` of the cubes is not given, it is created.
     """
     arguments = 'cubes: ' + str(cubes) + '\n' + \
                 'run_object: ' + str(run_object) + '\n' + \
@@ -458,18 +594,14 @@ def _load_run_ss(cubes,
                 'lbtim=' + str(lbtim) + ', ' + \
                 'from_dt=' + str(from_dt) + ', ' + 'to_dt=' + str(to_dt)
 
-    selected_cubes = select_by_variable_name(cubes, variable_name)
+    if index is None:
+        index = index_cubes(cubes)
+    selected_cubes = _select_indexed_cubes(cubes, index, averaging_period,
+                                           variable_name, lblev, lbtim)
 
-    if averaging_period in ['daily', 'monthly', 'seasonal', 'annual']:
-        selected_cubes = select_by_averaging_period(selected_cubes,
-                                                    averaging_period)
     if lblev:
         selected_cubes = select_by_pressure_level(selected_cubes, lblev)
 
-    if lbtim:
-        selected_cubes = select_by_initial_meaning_period(
-            selected_cubes, lbtim)
-
     if lbmon:
         selected_cubes = select_certain_months(selected_cubes, lbmon)
 
@@ -132,11 +132,14 @@ def age_of_air(run):
         diag2 = weight_lat_ave(agecube.extract(mlat_cons))
         diag2.var_name = 'midlat_age_of_air'
 
-        # Write age of air data to CWD
+        # Write age of air data to the area output directory
         outfile = '{0}_age_of_air_{1}.nc'
         cubelist = iris.cube.CubeList([diag1, diag2])
         with iris.FUTURE.context(netcdf_no_unlimited=True):
-            iris.save(cubelist, outfile.format(run['runid'], run.period))
+            iris.save(
+                cubelist,
+                os.path.join(run['area_out_dir'],
+                             outfile.format(run['runid'], run.period)))
 
         # Calculate metrics
         diag1sf6 = iai.Linear(diag1, [('level_height', ZSF6_KM)])
@@ -165,8 +168,8 @@ def multi_age_plot(run):
     run against observations.
     """
     # Run age_of_air for each run.
-    # Age_of_air returns metrics and writes results into an *.nc in the current
-    # working directory.
+    # Age_of_air returns metrics and writes results into an *.nc in the area
+    # output directory.
     # To make this function independent of the previous call to age_of_air,
     # age_of_air is run again for each run in this function
     #
@@ -186,10 +189,12 @@ def multi_age_plot(run):
     infile = '{0}_age_of_air_{1}.nc'
 
     # Create control filename
-    cntlfile = infile.format(run['suite_id1'], run['period'])
+    cntlfile = os.path.join(run['area_out_dir'],
+                            infile.format(run['suite_id1'], run['period']))
 
     # Create experiment filename
-    exptfile = infile.format(run['suite_id2'], run['period'])
+    exptfile = os.path.join(run['area_out_dir'],
+                            infile.format(run['suite_id2'], run['period']))
 
     # If no control data then stop ...
     if not os.path.exists(cntlfile):
@@ -228,7 +233,7 @@ def multi_age_plot(run):
     ax1.set_ylabel('Height (km)')
     ax1.set_ylim(16, 34)
     ax1.legend(loc='upper left')
-    fig.savefig('age_tropics.png')
+    fig.savefig(os.path.join(run['area_out_dir'], 'age_tropics.png'))
     plt.close()
 
     # Create midlats plot
@@ -263,5 +268,5 @@ def multi_age_plot(run):
     ax1.set_ylabel('Height (km)')
     ax1.set_ylim(16, 34)
     ax1.legend(loc='upper left')
-    fig.savefig('age_midlatitudes.png')
+    fig.savefig(os.path.join(run['area_out_dir'], 'age_midlatitudes.png'))
     plt.close()
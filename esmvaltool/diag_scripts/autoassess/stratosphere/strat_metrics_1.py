@@ -151,67 +151,83 @@ def calc_qbo_index(qbo):
     defined as the length of time between where U becomes positive and then
     negative and then becomes positive again (or negative/positive/negative).
     Also, periods less than 12 months are discounted.
+
+    See `calc_qbo_indices` for the QBO indices of many timeseries at once.
     """
-    ufin = qbo.data
+    (period, ampl_west, ampl_east) = calc_qbo_indices(qbo.data)
+    return (float(period), float(ampl_west), float(ampl_east))
 
-    indiciesdown, indiciesup = find_zero_crossings(ufin)
-    counterup = len(indiciesup)
-    counterdown = len(indiciesdown)
 
-    # Did we start on an upwards or downwards cycle?
-    if indiciesdown[0] < indiciesup[0]:
-        (kup, kdown) = (0, 1)
-    else:
-        (kup, kdown) = (1, 0)
-    # Translate upwards and downwards indices into U wind values
-    periodsmin = counterup - kup
-    periodsmax = counterdown - kdown
-    valsup = np.zeros(periodsmax)
-    valsdown = np.zeros(periodsmin)
-    for i in range(periodsmin):
-        valsdown[i] = np.amin(ufin[indiciesdown[i]:indiciesup[i + kup]])
-    for i in range(periodsmax):
-        valsup[i] = np.amax(ufin[indiciesup[i]:indiciesdown[i + kdown]])
-    # Calculate eastward QBO amplitude
-    counter = 0
-    totvals = 0
+def calc_qbo_indices(array, axis=-1):
+    """
+    Calculate the QBO indices of all timeseries along an axis of an array.
+
+    This is the vectorized version of `calc_qbo_index`, e.g. to calculate
+    maps of the QBO period and amplitudes for every latitude and pressure
+    level of a zonal mean wind field, or for many ensemble members, at once.
+
+    The westward (eastward) amplitude is the mean of the minima (maxima) of U
+    between a downward (upward) zero crossing and the following upward
+    (downward) zero crossing, if they are negative (positive). It is zero if
+    there are no such minima (maxima). The period is the mean distance
+    between consecutive upward or downward zero crossings, whichever is
+    larger, and zero if there are no full oscillations.
+
+    :param array: N-D array of U wind.
+    :param int axis: Time axis of the array.
+    :returns (period, ampl_west, ampl_east): Arrays with the shape of `array`
+        without `axis`.
+    """
+    ufin = np.moveaxis(np.ma.filled(array, np.nan), axis, -1)
+    shape = ufin.shape[:-1]
+    ufin = ufin.reshape(-1, ufin.shape[-1]).astype(float)
+    (n_series, n_times) = ufin.shape
+
+    # Flag the downward and upward zero crossings at the time they start
+    (down, upward) = get_zero_crossings(ufin)
+    down = np.pad(down, ((0, 0), (0, 1)), 'constant')
+    upward = np.pad(upward, ((0, 0), (0, 1)), 'constant')
+
+    # Maxima and minima of the segments between consecutive zero crossings;
+    # segments are closed if another zero crossing follows in the timeseries
+    crossings = down | upward
+    ordinal = np.cumsum(crossings, axis=-1)
+    closed = (ordinal < ordinal[:, -1:])[crossings]
+    flat_crossings = np.flatnonzero(crossings)
+    starts = np.union1d(flat_crossings, np.arange(n_series) * n_times)
+    is_crossing = np.isin(starts, flat_crossings)
+    maxima = np.maximum.reduceat(ufin.ravel(), starts)[is_crossing]
+    minima = np.minimum.reduceat(ufin.ravel(), starts)[is_crossing]
+    series = flat_crossings // n_times
+    is_down = down[crossings]
+
+    def mean_per_series(values, selection):
+        """Average the selected values of each series, zero if none."""
+        total = np.bincount(series[selection],
+                            weights=values[selection],
+                            minlength=n_series)
+        counter = np.bincount(series[selection], minlength=n_series)
+        return np.where(counter > 0, total / np.maximum(counter, 1), 0.)
+
+    # Calculate eastward and westward QBO amplitudes
     # valsup limit was initially hardcoded to +10.0
-    for i in range(periodsmax):
-        if valsup[i] > 0.:
-            totvals = totvals + valsup[i]
-            counter = counter + 1
-    if counter == 0:
-        ampl_east = 0.
-    else:
-        totvals = totvals / counter
-        ampl_east = totvals
-    # Calculate westward QBO amplitude
-    counter = 0
-    totvals = 0
-    for i in range(periodsmin):
-        # valdown limit was initially hardcoded to -20.0
-        if valsdown[i] < 0.:
-            totvals = totvals + valsdown[i]
-            counter = counter + 1
-    if counter == 0:
-        ampl_west = 0.
-    else:
-        totvals = totvals / counter
-        ampl_west = -totvals
+    ampl_east = mean_per_series(maxima, ~is_down & closed & (maxima > 0.))
+    # valdown limit was initially hardcoded to -20.0
+    ampl_west = -mean_per_series(minima, is_down & closed & (minima < 0.))
+
     # Calculate QBO period, set to zero if no full oscillations in data
-    period1 = 0.0
-    period2 = 0.0
-    if counterdown > 1:
-        period1 = (indiciesdown[counterdown - 1] - indiciesdown[0]) / (
-            counterdown - 1)
-    if counterup > 1:
-        period2 = (indiciesup[counterup - 1] - indiciesup[0]) / (counterup - 1)
+    def mean_period(flags):
+        """Get the mean distance between consecutive zero crossings."""
+        counter = flags.sum(axis=-1)
+        first = np.argmax(flags, axis=-1)
+        last = n_times - 1 - np.argmax(flags[:, ::-1], axis=-1)
+        return np.where(counter > 1,
+                        (last - first) / np.maximum(counter - 1, 1), 0.)
+
     # Pick larger oscillation period
-    if period1 < period2:
-        period = period2
-    else:
-        period = period1
-    return (period, ampl_west, ampl_east)
+    period = np.maximum(mean_period(down), mean_period(upward))
+    return (period.reshape(shape), ampl_west.reshape(shape),
+            ampl_east.reshape(shape))
 
 
 def flatten_list(list_):
@@ -237,24 +253,40 @@ def find_zero_crossings(array):
         last_pos: indices of positive values with consecutive negative value.
         last_neg: indices of negative values with consecutive positive value.
     """
+    (last_pos, last_neg) = get_zero_crossings(np.asarray(array))
+    return np.flatnonzero(last_pos).tolist(), np.flatnonzero(last_neg).tolist()
+
+
+def get_zero_crossings(array, axis=-1):
+    """
+    Find the zero crossings along an axis of an N-D array.
+
+    If a zero crossing includes zero, zero is used as last positive
+    or last negative value.
+
+    :param array: N-D array.
+    :param int axis: Axis along which the zero crossings are found.
+    :returns (last_pos, last_neg): Boolean arrays with the shape of `array`,
+        but one element shorter along `axis`.
+        last_pos: True for positive values with consecutive negative value.
+        last_neg: True for negative values with consecutive positive value.
+    """
     signed_array = np.sign(array)  # 1 if positive and -1 if negative
-    diff = np.diff(signed_array)  # difference of one item and the next item
+    # difference of one item and the next item
+    diff = np.moveaxis(np.diff(signed_array, axis=axis), axis, -1)
 
     # sum differences in case zero is included in zero crossing
     # array:  [-1, 0, 1]
     # signed: [-1, 0, 1]
     # diff:   [ 1, 1]
     # sum:    [ 0, 2]
-    for i, d in enumerate(diff):
-        if i < len(diff) - 1:  # not last item
-            if d != 0 and d == diff[i + 1]:
-                diff[i + 1] = d + diff[i + 1]
-                diff[i] = 0
-
-    last_neg = np.argwhere(diff == 2)
-    last_pos = np.argwhere(diff == -2)
-    last_neg = flatten_list(last_neg)
-    last_pos = flatten_list(last_pos)
+    # Equal consecutive differences can only be +1 or -1 and never overlap
+    pairs = (diff[..., :-1] != 0) & (diff[..., :-1] == diff[..., 1:])
+    diff[..., 1:][pairs] *= 2
+    diff[..., :-1][pairs] = 0
+
+    last_neg = np.moveaxis(diff == 2, -1, axis)
+    last_pos = np.moveaxis(diff == -2, -1, axis)
     return last_pos, last_neg
 
 
@@ -311,8 +343,12 @@ def pnj_metrics(run, ucube, metrics):
     metrics['Easterly jet: northern hem (July)'] = jul_enj.data
 
     # Plot U(Jan) and U(Jul)
-    plot_uwind(jan_annm, 'January', '{}_u_jan.png'.format(run['runid']))
-    plot_uwind(jul_annm, 'July', '{}_u_jul.png'.format(run['runid']))
+    plot_uwind(jan_annm, 'January',
+               os.path.join(run['area_out_dir'],
+                            '{}_u_jan.png'.format(run['runid'])))
+    plot_uwind(jul_annm, 'July',
+               os.path.join(run['area_out_dir'],
+                            '{}_u_jul.png'.format(run['runid'])))
 
 
 def qbo_metrics(run, ucube, metrics):
@@ -328,10 +364,13 @@ def qbo_metrics(run, ucube, metrics):
         qbo = weight_cosine(ucube.extract(tropics))
     qbo30 = qbo.extract(p30)
 
-    # write results to current working directory
+    # write results to the area output directory
     outfile = '{0}_qbo30_{1}.nc'
     with iris.FUTURE.context(netcdf_no_unlimited=True):
-        iris.save(qbo30, outfile.format(run['runid'], run['period']))
+        iris.save(
+            qbo30,
+            os.path.join(run['area_out_dir'],
+                         outfile.format(run['runid'], run['period'])))
 
     # Calculate QBO metrics
     (period, amp_west, amp_east) = calc_qbo_index(qbo30)
@@ -342,7 +381,9 @@ def qbo_metrics(run, ucube, metrics):
     metrics['QBO amplitude at 30 hPa (eastward)'] = amp_east
 
     # Plot QBO and timeseries of QBO at 30hPa
-    plot_qbo(qbo, '{}_qbo.png'.format(run['runid']))
+    plot_qbo(qbo,
+             os.path.join(run['area_out_dir'],
+                          '{}_qbo.png'.format(run['runid'])))
 
 
 def tpole_metrics(run, tcube, metrics):
@@ -387,8 +428,12 @@ def tpole_metrics(run, tcube, metrics):
     metrics['50 hPa temperature: 90S-60S (SON)'] = son_polave.data - 180.
 
     # Plot T(DJF) and T(JJA)
-    plot_temp(t_djf, 'DJF', '{}_t_djf.png'.format(run['runid']))
-    plot_temp(t_jja, 'JJA', '{}_t_jja.png'.format(run['runid']))
+    plot_temp(t_djf, 'DJF',
+              os.path.join(run['area_out_dir'],
+                           '{}_t_djf.png'.format(run['runid'])))
+    plot_temp(t_jja, 'JJA',
+              os.path.join(run['area_out_dir'],
+                           '{}_t_jja.png'.format(run['runid'])))
 
 
 def mean_and_strength(cube):
@@ -430,10 +475,13 @@ def teq_metrics(run, tcube, metrics):
     else:
         t_months = weight_cosine(t_months)
 
-    # write results to current working directory
+    # write results to the area output directory
     outfile = '{0}_teq100_{1}.nc'
     with iris.FUTURE.context(netcdf_no_unlimited=True):
-        iris.save(t_months, outfile.format(run['runid'], run['period']))
+        iris.save(
+            t_months,
+            os.path.join(run['area_out_dir'],
+                         outfile.format(run['runid'], run['period'])))
 
     # Calculate metrics
     (tmean, tstrength) = mean_and_strength(t_months)
@@ -459,10 +507,13 @@ def t_metrics(run, tcube, metrics):
     else:
         t_months = weight_cosine(t_months)
 
-    # write results to current working directory
+    # write results to the area output directory
     outfile = '{0}_t100_{1}.nc'
     with iris.FUTURE.context(netcdf_no_unlimited=True):
-        iris.save(t_months, outfile.format(run['runid'], run['period']))
+        iris.save(
+            t_months,
+            os.path.join(run['area_out_dir'],
+                         outfile.format(run['runid'], run['period'])))
 
     # Calculate metrics
     (tmean, tstrength) = mean_and_strength(t_months)
@@ -488,10 +539,13 @@ def q_metrics(run, qcube, metrics):
     else:
         q_months = weight_cosine(q_months)
 
-    # write results to current working directory
+    # write results to the area output directory
     outfile = '{0}_q70_{1}.nc'
     with iris.FUTURE.context(netcdf_no_unlimited=True):
-        iris.save(q_months, outfile.format(run['runid'], run['period']))
+        iris.save(
+            q_months,
+            os.path.join(run['area_out_dir'],
+                         outfile.format(run['runid'], run['period'])))
 
     # Calculate metrics
     qmean = q_mean(q_months)
@@ -631,8 +685,8 @@ def multi_qbo_plot(run):
     # TODO avoid running mainfunc
 
     # Run mainfunc for each run.
-    # mainfunc returns metrics and writes results into an *.nc in the current
-    # working directory.
+    # mainfunc returns metrics and writes results into an *.nc in the area
+    # output directory.
     # To make this function indendent of previous call to mainfunc, mainfunc
     # is run again for each run in this function
     #
@@ -646,10 +700,12 @@ def multi_qbo_plot(run):
     infile = '{0}_qbo30_{1}.nc'
 
     # Create control filename
-    cntlfile = infile.format(run['suite_id1'], run['period'])
+    cntlfile = os.path.join(run['area_out_dir'],
+                            infile.format(run['suite_id1'], run['period']))
 
     # Create experiment filename
-    exptfile = infile.format(run['suite_id2'], run['period'])
+    exptfile = os.path.join(run['area_out_dir'],
+                            infile.format(run['suite_id2'], run['period']))
 
     # If no control data then stop ...
     if not os.path.exists(cntlfile):
@@ -672,7 +728,7 @@ def multi_qbo_plot(run):
     ax1.set_xlabel('Time', fontsize='small')
     ax1.set_ylabel('U (m/s)', fontsize='small')
     ax1.legend(loc='upper left', fontsize='small')
-    fig.savefig('qbo_30hpa.png')
+    fig.savefig(os.path.join(run['area_out_dir'], 'qbo_30hpa.png'))
     plt.close()
 
 
@@ -686,8 +742,8 @@ def multi_teq_plot(run):
     # TODO avoid running mainfunc
 
     # Run mainfunc for each run.
-    # mainfunc returns metrics and writes results into an *.nc in the current
-    # working directory.
+    # mainfunc returns metrics and writes results into an *.nc in the area
+    # output directory.
     # To make this function indendent of previous call to mainfunc, mainfunc
     # is run again for each run in this function
     #
@@ -699,10 +755,12 @@ def multi_teq_plot(run):
     infile = '{0}_teq100_{1}.nc'
 
     # Create control filename
-    cntlfile = infile.format(run['suite_id1'], run['period'])
+    cntlfile = os.path.join(run['area_out_dir'],
+                            infile.format(run['suite_id1'], run['period']))
 
     # Create experiment filename
-    exptfile = infile.format(run['suite_id2'], run['period'])
+    exptfile = os.path.join(run['area_out_dir'],
+                            infile.format(run['suite_id2'], run['period']))
 
     # If no control data then stop ...
     if not os.path.exists(cntlfile):
@@ -734,7 +792,7 @@ def multi_teq_plot(run):
     ax1.set_xticklabels(tmon.coord('month').points, fontsize='small')
     ax1.set_ylabel('T (K)', fontsize='small')
     ax1.legend(loc='upper left', fontsize='small')
-    fig.savefig('teq_100hpa.png')
+    fig.savefig(os.path.join(run['area_out_dir'], 'teq_100hpa.png'))
     plt.close()
 
 
@@ -826,8 +884,8 @@ def multi_t100_vs_q70_plot(run):
     # TODO avoid running mainfunc
 
     # Run mainfunc for each run.
-    # mainfunc returns metrics and writes results into an *.nc in the current
-    # working directory.
+    # mainfunc returns metrics and writes results into an *.nc in the area
+    # output directory.
     # To make this function indendent of previous call to mainfunc, mainfunc
     # is run again for each run in this function
     #
@@ -840,12 +898,16 @@ def multi_t100_vs_q70_plot(run):
     q_file = '{0}_q70_{1}.nc'
 
     # Create control filenames
-    t_cntl = t_file.format(run['suite_id1'], run['period'])
-    q_cntl = q_file.format(run['suite_id1'], run['period'])
+    t_cntl = os.path.join(run['area_out_dir'],
+                          t_file.format(run['suite_id1'], run['period']))
+    q_cntl = os.path.join(run['area_out_dir'],
+                          q_file.format(run['suite_id1'], run['period']))
 
     # Create experiment filenames
-    t_expt = t_file.format(run['suite_id2'], run['period'])
-    q_expt = q_file.format(run['suite_id2'], run['period'])
+    t_expt = os.path.join(run['area_out_dir'],
+                          t_file.format(run['suite_id2'], run['period']))
+    q_expt = os.path.join(run['area_out_dir'],
+                          q_file.format(run['suite_id2'], run['period']))
 
     # If no control data then stop ...
     if not os.path.exists(t_cntl):
@@ -938,5 +1000,5 @@ def multi_t100_vs_q70_plot(run):
         ax1.scatter(tmean, qmean, s=100, label=label, marker='v')
 
     ax1.legend(loc='upper right', scatterpoints=1, fontsize='medium')
-    fig.savefig('t100_vs_q70.png')
+    fig.savefig(os.path.join(run['area_out_dir'], 't100_vs_q70.png'))
     plt.close()
@@ -48,9 +48,11 @@ import matplotlib.pyplot as plt
 import iris
 import iris.quickplot as qplt
 import cartopy
+import numpy as np
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
+from esmvaltool.diag_scripts.shared.plot import fast_map_plot, make_map_axes
 
 # This part sends debug statements to stdout
 logger = logging.getLogger(os.path.basename(__file__))
@@ -92,12 +94,16 @@ def make_map_plots(
     for layer_index, (layer, cube_layer) in enumerate(cubes.items()):
         layer = str(layer)
 
-        qplt.contourf(cube_layer, 25, linewidth=0, rasterized=True)
-
-        try:
-            plt.gca().coastlines()
-        except AttributeError:
-            logger.warning('Not able to add coastlines')
+        ax1 = make_map_axes()
+        if cfg.get('fast_maps', False):
+            zrange = diagtools.get_cube_range([cube_layer])
+            levels = np.linspace(zrange[0], zrange[1], 26)
+            mesh = fast_map_plot(cube_layer, levels, axes=ax1,
+                                 rasterized=True)
+            plt.colorbar(mesh, orientation='horizontal', ticks=levels[::5],
+                         label=str(cube_layer.units))
+        else:
+            qplt.contourf(cube_layer, 25, linewidth=0, rasterized=True)
 
         # Add title to plot
         title = ' '.join([metadata['dataset'], metadata['long_name']])
@@ -182,6 +188,7 @@ def make_map_contour(
     # Making plots for each layer
     for layer_index, (layer, cube_layer) in enumerate(cubes.items()):
         layer = str(layer)
+        make_map_axes(land={'zorder': 10, 'facecolor': [0.8, 0.8, 0.8]})
         qplt.contour(cube_layer,
                      thresholds,
                      colors=colours,
@@ -189,16 +196,6 @@ def make_map_contour(
                      linestyles=linestyles,
                      rasterized=True)
 
-        try:
-            plt.gca().coastlines()
-        except AttributeError:
-            logger.warning('Not able to add coastlines')
-        try:
-            plt.gca().add_feature(cartopy.feature.LAND,
-                                  zorder=10,
-                                  facecolor=[0.8, 0.8, 0.8])
-        except AttributeError:
-            logger.warning('Not able to add coastlines')
         # Add legend
         diagtools.add_legend_outside_right(plot_details,
                                            plt.gca(),
@@ -274,7 +271,7 @@ def multi_model_contours(
         z_units = ''
         plot_details = {}
         cmap = plt.cm.get_cmap('jet')
-        land_drawn = False
+        make_map_axes(land={'zorder': 10, 'facecolor': [0.8, 0.8, 0.8]})
 
         # Plot each file in the group
         for index, filename in enumerate(sorted(metadata)):
@@ -312,16 +309,6 @@ def multi_model_contours(
                 'label': metadata[filename]['dataset']
             }
 
-            if not land_drawn:
-                try:
-                    plt.gca().coastlines()
-                except AttributeError:
-                    logger.warning('Not able to add coastlines')
-                plt.gca().add_feature(cartopy.feature.LAND,
-                                      zorder=10,
-                                      facecolor=[0.8, 0.8, 0.8])
-                land_drawn = True
-
             title = metadata[filename]['long_name']
             if layer != '':
                 z_units = model_cubes[filename][layer].coords('depth')[0].units
@@ -380,13 +367,11 @@ def main(cfg):
         metadatas = diagtools.get_input_files(cfg, index=index)
         thresholds = diagtools.load_thresholds(cfg, metadatas)
 
+        tasks = []
         if thresholds:
             #######
             # Multi model contour plots
-            multi_model_contours(
-                cfg,
-                metadatas,
-            )
+            tasks.append((multi_model_contours, (cfg, metadatas)))
 
         for filename in sorted(metadatas.keys()):
 
@@ -399,11 +384,15 @@ def main(cfg):
             ######
             # Contour maps of individual model
             if thresholds:
-                make_map_contour(cfg, metadatas[filename], filename)
+                tasks.append(
+                    (make_map_contour, (cfg, metadatas[filename], filename)))
 
             ######
             # Maps of individual model
-            make_map_plots(cfg, metadatas[filename], filename)
+            tasks.append(
+                (make_map_plots, (cfg, metadatas[filename], filename)))
+
+        diagtools.run_plot_tasks(cfg, tasks)
 
     logger.info('Success')
 
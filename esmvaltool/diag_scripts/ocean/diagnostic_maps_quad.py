@@ -60,13 +60,14 @@ import numpy as np
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
+from esmvaltool.diag_scripts.shared.plot import fast_map_plot, make_map_axes
 
 # This part sends debug statements to stdout
 logger = logging.getLogger(os.path.basename(__file__))
 logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
 
-def add_map_subplot(subplot, cube, nspace, title='', cmap=''):
+def add_map_subplot(subplot, cube, nspace, title='', cmap='', fast=False):
     """
     Add a map subplot to the current pyplot figure.
 
@@ -82,16 +83,23 @@ def add_map_subplot(subplot, cube, nspace, title='', cmap=''):
         A string to set as the subplot title.
     cmap: str
         A string to describe the matplotlib colour map.
+    fast: bool
+        Draw the data with pcolormesh on the projected grid points, instead
+        of reprojecting filled contours.
 
     """
-    plt.subplot(subplot)
-    qplot = qplt.contourf(cube, nspace, linewidth=0,
-                          cmap=plt.cm.get_cmap(cmap))
-    qplot.colorbar.set_ticks([nspace.min(),
-                              (nspace.max() + nspace.min()) / 2.,
-                              nspace.max()])
-
-    plt.gca().coastlines()
+    ax1 = make_map_axes(position=subplot)
+    ticks = [nspace.min(), (nspace.max() + nspace.min()) / 2., nspace.max()]
+    if fast:
+        mesh = fast_map_plot(cube, nspace, axes=ax1, cmap=cmap)
+        cbar = plt.colorbar(mesh, orientation='horizontal',
+                            label=str(cube.units))
+        cbar.set_ticks(ticks)
+    else:
+        qplot = qplt.contourf(cube, nspace, linewidth=0,
+                              cmap=plt.cm.get_cmap(cmap))
+        qplot.colorbar.set_ticks(ticks)
+
     plt.title(title)
 
 
@@ -157,6 +165,10 @@ def multi_model_maps(
         cube223 = cubes[ctl_key][layer] - cubes[obs_key][layer]
         cube224 = cubes[exp_key][layer] - cubes[obs_key][layer]
 
+        # Load the data of all panels at once.
+        diagtools.get_cube_statistics([cube221, cube222, cube223, cube224],
+                                      realise=True)
+
         # create the z axis for plots 2, 3, 4.
         zrange1 = diagtools.get_cube_range([cube221, ])
         zrange2 = diagtools.get_cube_range_diff([cube222, cube223, cube224])
@@ -165,13 +177,15 @@ def multi_model_maps(
         linspace2 = np.linspace(zrange2[0], zrange2[1], 12, endpoint=True)
 
         # Add the sub plots to the figure.
-        add_map_subplot(221, cube221, linspace1, cmap='viridis', title=exper)
+        fast = cfg.get('fast_maps', False)
+        add_map_subplot(221, cube221, linspace1, cmap='viridis', title=exper,
+                        fast=fast)
         add_map_subplot(222, cube222, linspace2, cmap='bwr',
-                        title=' '.join([exper, 'minus', control]))
+                        title=' '.join([exper, 'minus', control]), fast=fast)
         add_map_subplot(223, cube223, linspace2, cmap='bwr',
-                        title=' '.join([control, 'minus', obs]))
+                        title=' '.join([control, 'minus', obs]), fast=fast)
         add_map_subplot(224, cube224, linspace2, cmap='bwr',
-                        title=' '.join([exper, 'minus', obs]))
+                        title=' '.join([exper, 'minus', obs]), fast=fast)
 
         # Add overall title
         fig.suptitle(long_name, fontsize=14)
@@ -57,6 +57,7 @@ from scipy.stats import linregress
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
+from esmvaltool.diag_scripts.shared.plot import fast_map_plot, make_map_axes
 
 # This part sends debug statements to stdout
 logger = logging.getLogger(os.path.basename(__file__))
@@ -64,7 +65,7 @@ logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
 
 def add_map_subplot(subplot, cube, nspace, title='',
-                    cmap='', extend='neither', log=False):
+                    cmap='', extend='neither', log=False, fast=False):
     """
     Add a map subplot to the current pyplot figure.
 
@@ -85,10 +86,25 @@ def add_map_subplot(subplot, cube, nspace, title='',
     log: bool
         Flag to plot the colour scale linearly (False) or
         logarithmically (True)
+    fast: bool
+        Draw the data with pcolormesh on the projected grid points, instead
+        of reprojecting filled contours.
     """
-    plt.subplot(subplot)
+    ax1 = make_map_axes(position=subplot)
     logger.info('add_map_subplot: %s', subplot)
-    if log:
+    if fast:
+        if extend != 'neither':
+            cube = cube.copy(np.ma.clip(cube.data, nspace.min(),
+                                        nspace.max()))
+        mesh = fast_map_plot(cube, nspace, axes=ax1, cmap=cmap)
+        cbar = pyplot.colorbar(mesh, orientation='horizontal')
+        if log:
+            cbar.set_ticks([0.1, 1., 10.])
+        else:
+            cbar.set_ticks(
+                [nspace.min(), (nspace.max() + nspace.min()) / 2.,
+                 nspace.max()])
+    elif log:
         qplot = qplt.contourf(
             cube,
             nspace,
@@ -112,7 +128,6 @@ def add_map_subplot(subplot, cube, nspace, title='',
             [nspace.min(), (nspace.max() + nspace.min()) / 2.,
              nspace.max()])
 
-    plt.gca().coastlines()
     plt.title(title)
 
 
@@ -184,6 +199,10 @@ def make_model_vs_obs_plots(
         cube223 = cubes['model'][layer] - cubes['obs'][layer]
         cube224 = cubes['model'][layer] / cubes['obs'][layer]
 
+        # Load the data of all panels at once.
+        diagtools.get_cube_statistics([cube221, cube222, cube223, cube224],
+                                      realise=True)
+
         # create the z axis for plots 2, 3, 4.
         extend = 'neither'
         zrange12 = diagtools.get_cube_range([cube221, cube222])
@@ -205,20 +224,22 @@ def make_model_vs_obs_plots(
         logspace4 = np.logspace(-1., 1., 12, endpoint=True)
 
         # Add the sub plots to the figure.
+        fast = cfg.get('fast_maps', False)
         add_map_subplot(
             221, cube221, linspace12, cmap='viridis', title=model,
-            extend=extend)
+            extend=extend, fast=fast)
         add_map_subplot(
             222, cube222, linspace12, cmap='viridis',
             title=' '.join([obs]),
-            extend=extend)
+            extend=extend, fast=fast)
         add_map_subplot(
             223,
             cube223,
             linspace3,
             cmap='bwr',
             title=' '.join([model, 'minus', obs]),
-            extend=extend)
+            extend=extend,
+            fast=fast)
         if np.min(zrange12) > 0.:
             add_map_subplot(
                 224,
@@ -226,7 +247,8 @@ def make_model_vs_obs_plots(
                 logspace4,
                 cmap='bwr',
                 title=' '.join([model, 'over', obs]),
-                log=True)
+                log=True,
+                fast=fast)
 
         # Add overall title
         fig.suptitle(long_name + ' [' + units + ']', fontsize=14)
@@ -489,6 +511,7 @@ def main(cfg):
         )
         obs_filename = diagtools.match_model_to_key('observational_dataset',
                                                     cfg[model_type], metadatas)
+        tasks = []
         for filename in sorted(metadatas.keys()):
 
             if filename == obs_filename:
@@ -503,11 +526,15 @@ def main(cfg):
 
             # #####
             # model vs obs scatter plots
-            make_scatter(cfg, metadatas, filename, obs_filename)
+            tasks.append(
+                (make_scatter, (cfg, metadatas, filename, obs_filename)))
 
             # #####
             # model vs obs map plots
-            make_model_vs_obs_plots(cfg, metadatas, filename, obs_filename)
+            tasks.append((make_model_vs_obs_plots,
+                          (cfg, metadatas, filename, obs_filename)))
+
+        diagtools.run_plot_tasks(cfg, tasks)
     logger.info('Success')
 
 
@@ -222,6 +222,7 @@ def main(cfg):
                                                         metadatas)
             obs_metadata = metadatas[obs_filename]
 
+        tasks = []
         for filename in sorted(metadatas.keys()):
 
             if filename == obs_filename:
@@ -235,9 +236,11 @@ def main(cfg):
 
             ######
             # Time series of individual model
-            make_profiles_plots(cfg, metadatas[filename], filename,
-                                obs_metadata=obs_metadata,
-                                obs_filename=obs_filename)
+            tasks.append((make_profiles_plots,
+                          (cfg, metadatas[filename], filename, obs_metadata,
+                           obs_filename)))
+
+        diagtools.run_plot_tasks(cfg, tasks)
 
     logger.info('Success')
 
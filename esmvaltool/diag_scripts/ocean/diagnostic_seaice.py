@@ -67,6 +67,7 @@ import sys
 from itertools import product
 
 import cartopy
+import dask.array as da
 import iris
 import iris.quickplot as qplt
 import matplotlib
@@ -75,6 +76,7 @@ import numpy as np
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
+from esmvaltool.diag_scripts.shared.plot import fast_map_plot, make_map_axes
 
 # This part sends debug statements to stdout
 logger = logging.getLogger(os.path.basename(__file__))
@@ -84,6 +86,10 @@ logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 # Note that this recipe may not function on machines with no access to
 # the internet, as cartopy may try to download geographic files.
 
+# Projections and extents of the polar maps
+POLAR_PROJECTIONS = {'North': 'NorthPolarStereo', 'South': 'SouthPolarStereo'}
+POLAR_EXTENTS = {'North': [-180, 180, 50, 90], 'South': [-180, 180, -90, -50]}
+
 
 def create_ice_cmap(threshold=0.15):
     """
@@ -116,6 +122,11 @@ def calculate_area_time_series(cube, plot_type, threshold):
 
     Requires a cube with two spacial dimensions. (no depth coordinate).
 
+    The cell areas are computed once, and the ice extent or ice area of all
+    time steps are obtained with a single sum over the spacial dimensions.
+    If the cube has lazy data, the sum is computed lazily, one chunk at a
+    time.
+
     Parameters
     ----------
     cube: iris.cube.Cube
@@ -133,27 +144,28 @@ def calculate_area_time_series(cube, plot_type, threshold):
         An numpy array containing the total ice extent or total ice area.
 
     """
-    data = []
     times = diagtools.cube_time_to_float(cube)
-    for time_itr, time in enumerate(times):
-        icedata = cube[time_itr].data
-
-        area = iris.analysis.cartography.area_weights(cube[time_itr])
-        if plot_type.lower() == 'ice extent':
-            # Ice extend is the area with more than 15% ice cover.
-            icedata = np.ma.masked_where(icedata < threshold, icedata)
-            total_area = np.ma.masked_where(icedata.mask, area.data).sum()
-        if plot_type.lower() == 'ice area':
-            # Ice area is cover * cell area
-            total_area = np.sum(icedata * area)
-
-        logger.debug('Calculating time series area: %s, %s, %s,', time_itr,
-                     time, total_area)
-        data.append(total_area)
-
-    ######
-    # Create a small dummy output array
-    data = np.array(data)
+    # The cell areas are the same at all time steps
+    area = iris.analysis.cartography.area_weights(cube[0])
+    if cube.has_lazy_data():
+        array_module = da
+    else:
+        array_module = np
+    icedata = cube.core_data()
+    valid = ~array_module.ma.getmaskarray(icedata)
+    icedata = array_module.ma.filled(icedata, 0.)
+    spacial_axes = tuple(range(1, cube.ndim))
+    if plot_type.lower() == 'ice extent':
+        # Ice extend is the area with more than 15% ice cover.
+        total_area = array_module.where(valid & (icedata >= threshold), area,
+                                        0.).sum(axis=spacial_axes)
+    if plot_type.lower() == 'ice area':
+        # Ice area is cover * cell area
+        total_area = (icedata * area).sum(axis=spacial_axes)
+    if cube.has_lazy_data():
+        total_area = total_area.compute()
+    data = np.array(total_area)
+    logger.debug('Calculated time series area: %s', data)
     return times, data
 
 
@@ -241,10 +253,49 @@ def make_ts_plots(
             plt.close()
 
 
+def make_polar_axes(pole):
+    """
+    Make the polar stereoscopic axes of a hemisphere, with land and coasts.
+
+    The land and coastlines are projected once per hemisphere and reused by
+    all the following polar maps.
+
+    Parameters
+    ----------
+    pole: str
+        The hemisphere
+
+    Returns
+    ----------
+    cartopy.mpl.geoaxes.GeoAxes:
+        The polar map axes.
+
+    """
+    try:
+        ax1 = make_map_axes(
+            POLAR_PROJECTIONS[pole],
+            POLAR_EXTENTS[pole],
+            land={
+                'zorder': 10,
+                'facecolor': [0.8, 0.8, 0.8]
+            },
+        )
+    except ConnectionRefusedError:
+        logger.error('Cartopy was unable add coastlines due to  a '
+                     'connection error.')
+        projection = getattr(cartopy.crs, POLAR_PROJECTIONS[pole])()
+        ax1 = plt.subplot(111, projection=projection)
+        ax1.set_extent(POLAR_EXTENTS[pole], cartopy.crs.PlateCarree())
+    ax1.gridlines(
+        linewidth=0.5, color='black', zorder=20, alpha=0.5, linestyle='--')
+    return ax1
+
+
 def make_polar_map(
         cube,
         pole='North',
         cmap='Blues_r',
+        fast=False,
 ):
     """
     Make a polar stereoscopic map plot.
@@ -261,6 +312,9 @@ def make_polar_map(
         The hemisphere
     cmap: str
         The string describing the matplotlib colourmap.
+    fast: bool
+        Draw the data with pcolormesh on the projected grid points, instead
+        of reprojecting filled contours.
 
     Returns
     ----------
@@ -279,33 +333,16 @@ def make_polar_map(
     if pole not in ['North', 'South']:
         logger.fatal('make_polar_map: hemisphere not provided.')
 
-    if pole == 'North':  # North Hemisphere
-        ax1 = plt.subplot(111, projection=cartopy.crs.NorthPolarStereo())
-        ax1.set_extent([-180, 180, 50, 90], cartopy.crs.PlateCarree())
-
-    if pole == 'South':  # South Hemisphere
-        ax1 = plt.subplot(111, projection=cartopy.crs.SouthPolarStereo())
-        ax1.set_extent([-180, 180, -90, -50], cartopy.crs.PlateCarree())
+    ax1 = make_polar_axes(pole)
 
-    linrange = np.linspace(0., 100., 21.)
-    qplt.contourf(cube, linrange, cmap=cmap, linewidth=0, rasterized=True)
+    linrange = np.linspace(0., 100., 21)
+    if fast:
+        mesh = fast_map_plot(cube, linrange, axes=ax1, cmap=cmap,
+                             rasterized=True)
+        plt.colorbar(mesh, orientation='horizontal', label=str(cube.units))
+    else:
+        qplt.contourf(cube, linrange, cmap=cmap, linewidth=0, rasterized=True)
     plt.tight_layout()
-
-    try:
-        ax1.add_feature(
-            cartopy.feature.LAND,
-            zorder=10,
-            facecolor=[0.8, 0.8, 0.8],
-        )
-    except ConnectionRefusedError:
-        logger.error('Cartopy was unable add coastlines due to  a '
-                     'connection error.')
-    ax1.gridlines(
-        linewidth=0.5, color='black', zorder=20, alpha=0.5, linestyle='--')
-    try:
-        plt.gca().coastlines()
-    except AttributeError:
-        logger.warning('make_polar_map: Not able to add coastlines')
     return fig
 
 
@@ -443,7 +480,8 @@ def make_map_plots(
             time_str = get_time_string(cube)
 
             # Make the polar map.
-            make_polar_map(cube, pole=pole, cmap=cmap)
+            make_polar_map(cube, pole=pole, cmap=cmap,
+                           fast=cfg.get('fast_maps', False))
 
             # Add title to plot
             title = ' '.join([metadata['dataset'], plot_type, time_str])
@@ -548,37 +586,17 @@ def make_map_extent_plots(
         fig = plt.figure()
         fig.set_size_inches(7, 7)
 
-        if pole == 'North':  # North Hemisphere
-            projection = cartopy.crs.NorthPolarStereo()
-            ax1 = plt.subplot(111, projection=projection)
-            ax1.set_extent([-180, 180, 50, 90], cartopy.crs.PlateCarree())
-
-        if pole == 'South':  # South Hemisphere
-            projection = cartopy.crs.SouthPolarStereo()
-            ax1 = plt.subplot(111, projection=projection)
-            ax1.set_extent([-180, 180, -90, -50], cartopy.crs.PlateCarree())
-        try:
-            ax1.add_feature(
-                cartopy.feature.LAND, zorder=10, facecolor=[0.8, 0.8, 0.8])
-        except ConnectionRefusedError:
-            logger.error('Cartopy was unable add coastlines due to  a '
-                         'connection error.')
-
-        ax1.gridlines(
-            linewidth=0.5, color='black', zorder=20, alpha=0.5, linestyle='--')
-
-        try:
-            plt.gca().coastlines()
-        except AttributeError:
-            logger.warning('make_polar_map: Not able to add coastlines')
+        ax1 = make_polar_axes(pole)
 
         times = np.array(cube.coord('time').points.astype(float))
+        labels = [str(int(year)) for year in cube_layer.coord('year').points]
+        colors = plt.cm.jet(np.arange(len(times)) / float(len(times)))
         plot_desc = {}
         for time_itr, time in enumerate(times):
             cube = cube_layer[time_itr]
             line_width = 1
-            color = plt.cm.jet(float(time_itr) / float(len(times)))
-            label = get_year(cube)
+            color = colors[time_itr]
+            label = labels[time_itr]
             plot_desc[time] = {'label': label,
                                'c': [color, ],
                                'lw': [line_width, ],
@@ -674,6 +692,7 @@ def main(cfg):
         )
 
         metadatas = diagtools.get_input_files(cfg, index=index)
+        tasks = []
         for filename in sorted(metadatas):
 
             logger.info('-----------------')
@@ -683,15 +702,19 @@ def main(cfg):
             )
             ######
             # extent maps plots of individual models
-            make_map_extent_plots(cfg, metadatas[filename], filename)
+            tasks.append(
+                (make_map_extent_plots, (cfg, metadatas[filename], filename)))
 
             ######
             # maps plots of individual models
-            make_map_plots(cfg, metadatas[filename], filename)
+            tasks.append(
+                (make_map_plots, (cfg, metadatas[filename], filename)))
 
             ######
             # time series plots o
-            make_ts_plots(cfg, metadatas[filename], filename)
+            tasks.append((make_ts_plots, (cfg, metadatas[filename], filename)))
+
+        diagtools.run_plot_tasks(cfg, tasks)
 
     logger.info('Success')
 
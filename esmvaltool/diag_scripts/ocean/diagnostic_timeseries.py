@@ -54,6 +54,7 @@ import os
 import iris
 import matplotlib.pyplot as plt
 import numpy as np
+from cf_units import Unit
 
 from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
 from esmvaltool.diag_scripts.shared import run_diagnostic
@@ -86,7 +87,110 @@ def timeplot(cube, **kwargs):
         return
 
     times = diagtools.cube_time_to_float(cube)
-    plt.plot(times, cubedata, **kwargs)
+    seriesplot(times, cubedata, **kwargs)
+
+
+def seriesplot(times, data, **kwargs):
+    """
+    Create a time series plot from decimal times and data.
+
+    This function does the same plotting as timeplot, from the time series
+    already extracted from a cube.
+
+    Parameters
+    ----------
+    times: list
+        The decimal times.
+    data: numpy.ma.MaskedArray
+        The data of the time series.
+
+    """
+    if len(data.compressed()) == 1:
+        plt.axhline(data.compressed(), **kwargs)
+        return
+    plt.plot(times, data, **kwargs)
+
+
+def reduce_time_series(cfg, metadata, cube, layer):
+    """
+    Reduce a layer cube to the small time series needed for the plots.
+
+    Parameters
+    ----------
+    cfg: dict
+        the opened global config dictionairy, passed by ESMValTool.
+    metadata: dict
+        The metadata dictionairy for a specific model.
+    cube: iris.cube.Cube
+        The cube of a single layer.
+    layer: str or float
+        The layer name.
+
+    Returns
+    ---------
+    dict
+        The decimal times, the data, the units and the depth units.
+
+    """
+    cube = diagtools.bgc_units(cube, metadata['short_name'])
+    # Take a moving average, if needed.
+    if 'moving_average' in cfg:
+        cube = moving_average(cube, cfg['moving_average'])
+    z_units = ''
+    if layer != '' and cube.coords('depth'):
+        z_units = cube.coord('depth').units
+    return {
+        'times': diagtools.cube_time_to_float(cube),
+        'data': np.ma.array(cube.data),
+        'units': str(cube.units),
+        'z_units': z_units,
+    }
+
+
+# Number of minutes in a 31 day month, used to order dates within a month
+MONTH_MINUTES = 31 * 24 * 60
+
+
+def window_time_keys(cube, win_units):
+    """
+    Calculate numeric time values to compare with a moving average window.
+
+    For windows in days, the values are the time points in days. For windows
+    in months or years, the values are integers counting the months in units
+    of 31 days, plus the minutes since the start of the month. These values
+    are ordered as the dates in any calendar, and shifting them by a number of
+    months shifts the month of a date and keeps the day, hour and minute.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Input cube
+    win_units: str
+        The units of the moving average window.
+
+    Returns
+    ----------
+    numpy.array:
+        The numeric time values.
+    float:
+        The length of one window unit in the same units as the time values.
+
+    """
+    time_coord = cube.coord('time')
+    if win_units in ['days', 'day', 'dy']:
+        time_units = str(time_coord.units).split(' since ')[0]
+        to_days = Unit(time_units).convert(1., 'days')
+        return time_coord.points * to_days, 1.
+
+    dates = np.array([(time_itr.year, time_itr.month, time_itr.day,
+                       time_itr.hour, time_itr.minute)
+                      for time_itr in time_coord.units.num2date(
+                          time_coord.points)]).T
+    minutes = (dates[2] - 1) * 24 * 60 + dates[3] * 60 + dates[4]
+    keys = (dates[0] * 12 + dates[1] - 1) * MONTH_MINUTES + minutes
+    if win_units in ['years', 'yrs', 'year', 'yr']:
+        return keys, 12. * MONTH_MINUTES
+    return keys, float(MONTH_MINUTES)
 
 
 def moving_average(cube, window):
@@ -111,6 +215,12 @@ def moving_average(cube, window):
     in the moving average of a ``10 year`` window will only include the average
     of the five subsequent years.
 
+    The average is computed along the time dimension, for each point of the
+    other dimensions, and masked values are excluded from the average. The
+    bounds of all the windows are found at once in the sorted time values and
+    the averages are obtained from cumulative sums, so the cost grows
+    linearly with the length of the time series.
+
     Parameters
     ----------
     cube: iris.cube.Cube
@@ -135,41 +245,24 @@ def moving_average(cube, window):
         raise ValueError("Moving average window units not recognised: " +
                          "{}".format(win_units))
 
-    times = cube.coord('time').units.num2date(cube.coord('time').points)
-
-    datetime = diagtools.guess_calendar_datetime(cube)
-
-    output = []
-
-    times = np.array([
-        datetime(time_itr.year, time_itr.month, time_itr.day, time_itr.hour,
-                 time_itr.minute) for time_itr in times
-    ])
-
-    for time_itr in times:
-        if win_units in ['years', 'yrs', 'year', 'yr']:
-            tmin = datetime(time_itr.year - window_len, time_itr.month,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-            tmax = datetime(time_itr.year + window_len, time_itr.month,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-
-        if win_units in ['months', 'month', 'mn']:
-            tmin = datetime(time_itr.year, time_itr.month - window_len,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-            tmax = datetime(time_itr.year, time_itr.month + window_len,
-                            time_itr.day, time_itr.hour, time_itr.minute)
-
-        if win_units in ['days', 'day', 'dy']:
-            tmin = datetime(time_itr.year, time_itr.month,
-                            time_itr.day - window_len, time_itr.hour,
-                            time_itr.minute)
-            tmax = datetime(time_itr.year, time_itr.month,
-                            time_itr.day + window_len, time_itr.hour,
-                            time_itr.minute)
-
-        arr = np.ma.masked_where((times < tmin) + (times > tmax), cube.data)
-        output.append(arr.mean())
-    cube.data = np.array(output)
+    keys, unit_len = window_time_keys(cube, win_units)
+    half_width = window_len * unit_len
+    # First and last (excluded) index of the window around each time
+    i_min = np.searchsorted(keys, keys - half_width, side='left')
+    i_max = np.searchsorted(keys, keys + half_width, side='right')
+
+    time_dim = cube.coord_dims('time')[0]
+    data = np.ma.masked_invalid(np.moveaxis(cube.data, time_dim, 0))
+    mask = np.ma.getmaskarray(data)
+    zeros = np.zeros((1, ) + data.shape[1:])
+    cum_sum = np.concatenate(
+        (zeros, np.cumsum(np.where(mask, 0., data.data), axis=0)))
+    cum_count = np.concatenate((zeros, np.cumsum(~mask, axis=0)))
+    total = cum_sum[i_max] - cum_sum[i_min]
+    count = cum_count[i_max] - cum_count[i_min]
+    output = np.ma.masked_where(count == 0, total) / np.ma.masked_equal(
+        count, 0)
+    cube.data = np.moveaxis(output, 0, time_dim)
     return cube
 
 
@@ -271,6 +364,8 @@ def multi_model_time_series(
     This tool loads several cubes from the files, checks that the units are
     sensible BGC units, checks for layers, adjusts the titles accordingly,
     determines the ultimate file name and format, then saves the image.
+    As in make_cube_layer_dict, both depth and region layers are plotted
+    separately.
 
     Parameters
     ----------
@@ -281,24 +376,19 @@ def multi_model_time_series(
 
     """
 
-    ####
-    # Load the data for each layer as a separate cube
-    model_cubes = {}
-    layers = {}
-    for filename in sorted(metadata):
-        cube = iris.load_cube(filename)
-        cube = diagtools.bgc_units(cube, metadata[filename]['short_name'])
-
-        cubes = diagtools.make_cube_layer_dict(cube)
-        model_cubes[filename] = cubes
-        for layer in cubes:
-            layers[layer] = True
-
     # Load image format extention
     image_extention = diagtools.get_image_format(cfg)
 
-    # Make a plot for each layer
-    for layer in layers:
+    # Make a plot for each layer, loading one layer of all files at a time
+    for layer, layer_cubes in diagtools.iterate_cube_layers(
+            metadata, layer_names=('depth', 'region')):
+
+        # Only keep the small time series of this layer
+        series = {}
+        for filename, cube in layer_cubes.items():
+            series[filename] = reduce_time_series(cfg, metadata[filename],
+                                                  cube, layer)
+        del layer_cubes
 
         title = ''
         z_units = ''
@@ -306,60 +396,39 @@ def multi_model_time_series(
         cmap = plt.cm.get_cmap('viridis')
 
         # Plot each file in the group
-        for index, filename in enumerate(sorted(metadata)):
+        for filename in sorted(series):
+            index = sorted(metadata).index(filename)
             if len(metadata) > 1:
                 color = cmap(index / (len(metadata) - 1.))
             else:
                 color = 'blue'
 
-            # Take a moving average, if needed.
-            if 'moving_average' in cfg:
-                cube = moving_average(model_cubes[filename][layer],
-                                      cfg['moving_average'])
-            else:
-                cube = model_cubes[filename][layer]
-
             if 'MultiModel' in metadata[filename]['dataset']:
-                timeplot(
-                    cube,
-                    c=color,
-                    # label=metadata[filename]['dataset'],
-                    ls=':',
-                    lw=2.,
-                )
-                plot_details[filename] = {
-                    'c': color,
-                    'ls': ':',
-                    'lw': 2.,
-                    'label': metadata[filename]['dataset']
-                }
+                linestyle = ':'
             else:
-                timeplot(
-                    cube,
-                    c=color,
-                    # label=metadata[filename]['dataset'])
-                    ls='-',
-                    lw=2.,
-                )
-                plot_details[filename] = {
-                    'c': color,
-                    'ls': '-',
-                    'lw': 2.,
-                    'label': metadata[filename]['dataset']
-                }
+                linestyle = '-'
+            seriesplot(
+                series[filename]['times'],
+                series[filename]['data'],
+                c=color,
+                ls=linestyle,
+                lw=2.,
+            )
+            plot_details[filename] = {
+                'c': color,
+                'ls': linestyle,
+                'lw': 2.,
+                'label': metadata[filename]['dataset']
+            }
 
             title = metadata[filename]['long_name']
-            if layer != '':
-                if model_cubes[filename][layer].coords('depth'):
-                    z_units = model_cubes[filename][layer].coord('depth').units
-                else:
-                    z_units = ''
+            z_units = series[filename]['z_units']
         # Add title, legend to plots
         if layer:
             title = ' '.join([title, '(', str(layer), str(z_units), ')'])
         plt.title(title)
         plt.legend(loc='best')
-        plt.ylabel(str(model_cubes[filename][layer].units))
+        plt.ylabel(series[filename]['units'])
 
         # Saving files:
         if cfg['write_plots']:
@@ -403,10 +472,7 @@ def main(cfg):
 
         #######
         # Multi model time series
-        multi_model_time_series(
-            cfg,
-            metadatas,
-        )
+        tasks = [(multi_model_time_series, (cfg, metadatas))]
 
         for filename in sorted(metadatas):
 
@@ -418,7 +484,10 @@ def main(cfg):
 
             ######
             # Time series of individual model
-            make_time_series_plots(cfg, metadatas[filename], filename)
+            tasks.append(
+                (make_time_series_plots, (cfg, metadatas[filename], filename)))
+
+        diagtools.run_plot_tasks(cfg, tasks)
     logger.info('Success')
 
 
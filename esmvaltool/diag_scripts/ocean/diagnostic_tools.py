@@ -10,9 +10,16 @@ This tool is part of the ocean diagnostic tools package in the ESMValTool.
 Author: Lee de Mora (PML)
     ledm@pml.ac.uk
 """
+import hashlib
 import logging
+import multiprocessing
 import os
 import sys
+import weakref
+
+import cartopy
+import dask
+import dask.array as da
 import iris
 
 import numpy as np
@@ -26,6 +33,12 @@ from esmvaltool.diag_scripts.shared._base import _get_input_data_files
 logger = logging.getLogger(os.path.basename(__file__))
 logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
+# Decimal times, keyed on the time units, calendar and hash of the time points
+DECIMAL_TIMES = {}
+
+# Statistics of the cube data, keyed on the identity of the cube
+CUBE_STATISTICS = {}
+
 
 def get_obs_projects():
     """
@@ -199,6 +212,13 @@ def cube_time_to_float(cube):
     Convert from time coordinate into decimal time.
 
     Takes an iris time coordinate and returns a list of floats.
+    The fraction of the year is the time since the start of the year divided
+    by the length of that year in the calendar of the cube, i.e. 360 days,
+    365 days or 365/366 days, depending on the calendar.
+
+    The decimal times are cached per time units, calendar and time points, so
+    that the different layers of a dataset are converted only once.
+
     Parameters
     ----------
     cube: iris.cube.Cube
@@ -211,30 +231,22 @@ def cube_time_to_float(cube):
 
     """
     times = cube.coord('time')
-    datetime = guess_calendar_datetime(cube)
-
-    dtimes = times.units.num2date(times.points)
-    floattimes = []
-    for dtime in dtimes:
-        # TODO: it would be better to have a calendar dependent value
-        # for daysperyear, as this is not accurate for 360 day calendars.
-        daysperyear = 365.25
-
-        try:
-            dayofyr = dtime.dayofyr
-        except AttributeError:
-            time = datetime(dtime.year, dtime.month, dtime.day)
-            time0 = datetime(dtime.year, 1, 1, 0, 0)
-            dayofyr = (time - time0).days
-
-        floattime = dtime.year + dayofyr / daysperyear + dtime.hour / (
-            24. * daysperyear)
-        if dtime.hour:
-            floattime += dtime.hour / (24. * daysperyear)
-        if dtime.minute:
-            floattime += dtime.minute / (24. * 60. * daysperyear)
-        floattimes.append(floattime)
-    return floattimes
+    points = np.ascontiguousarray(times.points)
+    key = (str(times.units), times.units.calendar,
+           hashlib.sha1(points.view(np.uint8)).hexdigest())
+    if key not in DECIMAL_TIMES:
+        datetime = guess_calendar_datetime(cube)
+        first_year = times.units.num2date(points.min()).year
+        last_year = times.units.num2date(points.max()).year
+        years = np.arange(first_year, last_year + 2)
+        year_starts = np.array(
+            times.units.date2num([datetime(year, 1, 1) for year in years]),
+            dtype=float)
+        index = np.searchsorted(year_starts, points, side='right') - 1
+        year_length = year_starts[index + 1] - year_starts[index]
+        DECIMAL_TIMES[key] = (
+            years[index] + (points - year_starts[index]) / year_length)
+    return list(DECIMAL_TIMES[key])
 
 
 def guess_calendar_datetime(cube):
@@ -615,6 +627,178 @@ def make_cube_layer_dict(cube):
     return cubes
 
 
+def make_cube_layer_constraints(cube, layer_names=('depth', 'region')):
+    """
+    Take a cube and return a dictionairy layer:constraint
+
+    The layers are the same as the keys of make_cube_layer_dict, but each item
+    is the constraint which extracts the layer from the cube, so that a
+    single layer can be extracted from a lazily loaded cube.
+
+    Cubes with no depth component are returned as dict, where the dict key
+    is a blank empty string, and the value is None.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        the opened dataset as a cube.
+    layer_names: tuple
+        The standard names of the layer coordinates.
+
+    Returns
+    ---------
+    dict
+        A dictionairy of layer name : iris.Constraint.
+    """
+    layers = [
+        coord for coord in cube.coords() if coord.standard_name in layer_names
+    ]
+    if layers == [] or len(layers[0].points) == 1:
+        return {'': None}
+
+    layer_dim = layers[0]
+    constraints = {}
+    for point in layer_dim.points:
+        layer = point
+        if layer_dim.standard_name == 'region':
+            layer = point.replace('_', ' ').title()
+        constraints[layer] = iris.Constraint(
+            coord_values={layer_dim.standard_name: point})
+    return constraints
+
+
+def iterate_cube_layers(metadata, layer_names=('depth', 'region')):
+    """
+    Iterate over the layers of several datasets, one layer at a time.
+
+    The files are loaded lazily once, to determine their layers. Then, for
+    each layer, the cube of that layer is extracted lazily from the loaded
+    cubes, so that only one layer of all the datasets is in memory at any
+    time.
+
+    Parameters
+    ----------
+    metadata: dict
+        The metadata dictionairy, with the preprocessed files as keys.
+    layer_names: tuple
+        The standard names of the layer coordinates.
+
+    Yields
+    ------
+    str or float
+        The layer name, as in make_cube_layer_dict.
+    dict
+        A dictionairy of filename : layer cube, for the sorted files which
+        contain the layer.
+    """
+    lazy_cubes = {}
+    layers = {}
+    for filename in sorted(metadata):
+        cube = iris.load_cube(filename)
+        lazy_cubes[filename] = cube
+        constraints = make_cube_layer_constraints(cube, layer_names)
+        for layer, constraint in constraints.items():
+            layers.setdefault(layer, {})[filename] = constraint
+
+    for layer, constraints in layers.items():
+        cubes = {}
+        for filename, constraint in constraints.items():
+            # Never hand out the loaded cubes, they must stay lazy
+            if constraint is None:
+                cubes[filename] = lazy_cubes[filename].copy()
+            else:
+                cubes[filename] = lazy_cubes[filename].extract(constraint)
+        yield layer, cubes
+
+
+def _get_lazy_statistics(data, percentiles=()):
+    """Get the lazy minimum, maximum and percentiles of a (masked) array."""
+    data = da.asanyarray(data)
+    statistics = {'min': data.min(), 'max': data.max()}
+    if percentiles:
+        values = da.ma.filled(data.astype(float), np.nan).ravel().rechunk(-1)
+        statistics['percentiles'] = values.map_blocks(
+            np.nanpercentile,
+            q=list(percentiles),
+            chunks=(len(percentiles), ),
+            dtype=float,
+        )
+    return statistics
+
+
+def get_cube_statistics(cubes, percentiles=(), realise=False):
+    """
+    Determine the minimum, maximum and percentiles of a list of cubes.
+
+    The statistics of all the cubes are computed lazily in a single
+    dask.compute call, so data which several cubes are derived from (for
+    instance, a dataset and its difference to another dataset) is only loaded
+    once. The results are memoized per cube object, so the cubes should not be
+    modified after their statistics have been determined.
+
+    Parameters
+    ----------
+    cubes: list of iris.cube.Cube
+        A list of cubes.
+    percentiles: tuple of floats
+        The percentiles to compute, between 0 and 100.
+    realise: bool
+        Realise the data of the lazy cubes in the same computation, so that
+        plotting the cubes afterwards does not load their data again.
+
+    Returns
+    ----------
+    list:
+        A list with a dictionairy for each cube, with the minimum ('min'),
+        maximum ('max') and, if requested, the array of percentiles
+        ('percentiles') of the cube data.
+
+    """
+    percentiles = tuple(percentiles)
+    lazy_statistics = {}
+    for cube in cubes:
+        key = id(cube)
+        if key not in CUBE_STATISTICS:
+            CUBE_STATISTICS[key] = {'percentiles': {}}
+            weakref.finalize(cube, CUBE_STATISTICS.pop, key, None)
+        known = CUBE_STATISTICS[key]
+        missing = [
+            percentile for percentile in percentiles
+            if percentile not in known['percentiles']
+        ]
+        realise_cube = realise and cube.has_lazy_data()
+        if 'min' in known and not missing and not realise_cube:
+            continue
+        lazy_statistics[key] = _get_lazy_statistics(cube.core_data(), missing)
+        if realise_cube:
+            lazy_statistics[key]['data'] = cube.lazy_data()
+        lazy_statistics[key]['missing'] = missing
+
+    if lazy_statistics:
+        results = dask.compute(lazy_statistics)[0]
+        for cube in cubes:
+            result = results.pop(id(cube), None)
+            if result is None:
+                continue
+            if 'data' in result:
+                cube.data = result.pop('data')
+            known = CUBE_STATISTICS[id(cube)]
+            known['percentiles'].update(
+                zip(result.pop('missing'), result.pop('percentiles', [])))
+            known.update(result)
+
+    statistics = []
+    for cube in cubes:
+        known = CUBE_STATISTICS[id(cube)]
+        cube_statistics = {'min': known['min'], 'max': known['max']}
+        if percentiles:
+            cube_statistics['percentiles'] = np.array(
+                [known['percentiles'][percentile]
+                 for percentile in percentiles])
+        statistics.append(cube_statistics)
+    return statistics
+
+
 def get_cube_range(cubes):
     """
     Determinue the minimum and maximum values of a list of cubes.
@@ -631,11 +815,9 @@ def get_cube_range(cubes):
         list of cubes.
 
     """
-    mins = []
-    maxs = []
-    for cube in cubes:
-        mins.append(cube.data.min())
-        maxs.append(cube.data.max())
+    statistics = get_cube_statistics(cubes)
+    mins = [cube_statistics['min'] for cube_statistics in statistics]
+    maxs = [cube_statistics['max'] for cube_statistics in statistics]
     return [np.min(mins), np.max(maxs), ]
 
 
@@ -654,9 +836,9 @@ def get_cube_range_diff(cubes):
         A list of two values: the maximum deviation from zero and its opposite.
     """
     ranges = []
-    for cube in cubes:
-        ranges.append(np.abs(cube.data.min()))
-        ranges.append(np.abs(cube.data.max()))
+    for cube_statistics in get_cube_statistics(cubes):
+        ranges.append(np.abs(cube_statistics['min']))
+        ranges.append(np.abs(cube_statistics['max']))
     return [-1. * np.max(ranges), np.max(ranges)]
 
 
@@ -675,10 +857,64 @@ def get_array_range(arrays):
         A list of two values, the overall minumum and maximum values of the
         list of cubes.
     """
-    mins = []
-    maxs = []
-    for arr in arrays:
-        mins.append(arr.min())
-        maxs.append(arr.max())
+    statistics = dask.compute([_get_lazy_statistics(arr) for arr in arrays])[0]
+    mins = [arr_statistics['min'] for arr_statistics in statistics]
+    maxs = [arr_statistics['max'] for arr_statistics in statistics]
     logger.info('get_array_range: %s, %s', np.min(mins), np.max(maxs))
     return [np.min(mins), np.max(maxs), ]
+
+
+def _init_plot_worker(auxiliary_data_dir):
+    """Configure a new plot worker process like the diagnostic process."""
+    if auxiliary_data_dir:
+        cartopy.config['data_dir'] = auxiliary_data_dir
+
+
+def _run_plot_task(function, args):
+    """
+    Run a single plot making task and close all its figures.
+
+    Closing the figures keeps the matplotlib state of each task separate when
+    a worker process runs several tasks one after another.
+    """
+    try:
+        return function(*args)
+    finally:
+        plt.close('all')
+
+
+def run_plot_tasks(cfg, tasks):
+    """
+    Run independent plot making tasks.
+
+    The tasks are distributed over a pool of `n_workers` processes if this
+    option is set in the diagnostic settings, otherwise they are run one
+    after another. The worker processes are spawned rather than forked, so
+    that they do not inherit the matplotlib state or the dask threads of the
+    diagnostic process.
+
+    Parameters
+    ----------
+    cfg: dict
+        the opened global config dictionairy, passed by ESMValTool.
+    tasks: list
+        A list of (function, args) tuples, where each function is a module
+        level plot making function and args is the tuple of its arguments.
+
+    Returns
+    ---------
+    list
+        The return values of the tasks, in the order of the tasks.
+    """
+    n_workers = int(cfg.get('n_workers', 1))
+    if n_workers > 1 and len(tasks) > 1:
+        logger.info('Running %i plot tasks on %i processes', len(tasks),
+                    n_workers)
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(
+                n_workers,
+                initializer=_init_plot_worker,
+                initargs=(cfg.get('auxiliary_data_dir'), ),
+        ) as pool:
+            return pool.starmap(_run_plot_task, tasks, chunksize=1)
+    return [_run_plot_task(function, args) for function, args in tasks]
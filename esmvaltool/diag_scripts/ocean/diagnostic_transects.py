@@ -28,7 +28,6 @@ Author: Lee de Mora (PML)
 import logging
 import os
 import sys
-from itertools import product
 
 import iris
 import iris.quickplot as qplt
@@ -429,21 +428,11 @@ def multi_model_contours(
 
     """
     ####
-    # Load the data for each layer as a separate cube
-    model_cubes = {}
-    regions = {}
+    # Load the thresholds and y scale from the metadata of each file
     thresholds = {}
     set_y_logscale = True
 
     for filename in sorted(metadatas):
-        cube = iris.load_cube(filename)
-        cube = diagtools.bgc_units(cube, metadatas[filename]['short_name'])
-        cube = make_depth_safe(cube)
-        cubes = make_cube_region_dict(cube)
-        model_cubes[filename] = cubes
-        for region in model_cubes[filename]:
-            regions[region] = True
-
         # Determine y log scale.
         set_y_logscale = determine_set_y_logscale(cfg, metadatas[filename])
 
@@ -455,86 +444,122 @@ def multi_model_contours(
     # Load image format extention
     image_extention = diagtools.get_image_format(cfg)
 
-    # Make a plot for each layer and each threshold
-    for region, threshold in product(regions, thresholds):
-        logger.info('plotting threshold: \t%s', threshold)
-        title = ''
-        plot_details = {}
+    # Make a plot for each region and each threshold, loading one region of
+    # all files at a time
+    for region, region_cubes in diagtools.iterate_cube_layers(
+            metadatas, layer_names=('region', )):
+        for filename, cube in region_cubes.items():
+            cube = diagtools.bgc_units(cube,
+                                       metadatas[filename]['short_name'])
+            region_cubes[filename] = make_depth_safe(cube)
+        for threshold in thresholds:
+            make_multi_model_contour(cfg, metadatas, region_cubes, region,
+                                     threshold, set_y_logscale,
+                                     image_extention)
+
+
+def make_multi_model_contour(cfg, metadatas, region_cubes, region,
+                             threshold, set_y_logscale, image_extention):
+    """
+    Make a multi model transect contour plot for a region and a threshold.
 
-        # Plot each file in the group
-        for index, filename in enumerate(sorted(metadatas)):
-            color = diagtools.get_colour_from_cmap(index, len(metadatas))
-            linewidth = 1.
-            linestyle = '-'
-            # Determine line style for MultiModel statistics:
-            if 'MultiModel' in metadatas[filename]['dataset']:
-                linewidth = 2.
-                linestyle = ':'
-            # Determine line style for Observations
-            if metadatas[filename]['project'] in diagtools.get_obs_projects():
-                color = 'black'
-                linewidth = 1.7
-                linestyle = '-'
-
-            qplt.contour(
-                model_cubes[filename][region], [
-                    threshold,
-                ],
-                colors=[
-                    color,
-                ],
-                linewidths=linewidth,
-                linestyles=linestyle,
-                rasterized=True)
-
-            plot_details[filename] = {
-                'c': color,
-                'ls': linestyle,
-                'lw': linewidth,
-                'label': metadatas[filename]['dataset']
-            }
+    Parameters
+    ----------
+    cfg: dict
+        the opened global config dictionairy, passed by ESMValTool.
+    metadatas: dict
+        The metadatas dictionairy for a specific model.
+    region_cubes: dict
+        A dictionairy of filename : cube of the region.
+    region: str
+        The region name.
+    threshold: float
+        The value of the contour.
+    set_y_logscale: bool
+        Whether to use a log scale y axis.
+    image_extention: str
+        The image file extention.
 
-            if set_y_logscale:
-                plt.axes().set_yscale('log')
+    """
+    logger.info('plotting threshold: \t%s', threshold)
+    title = ''
+    plot_details = {}
 
-            title = metadatas[filename]['long_name']
-            units = str(model_cubes[filename][region].units)
+    # Plot each file in the group
+    for filename in sorted(region_cubes):
+        index = sorted(metadatas).index(filename)
+        color = diagtools.get_colour_from_cmap(index, len(metadatas))
+        linewidth = 1.
+        linestyle = '-'
+        # Determine line style for MultiModel statistics:
+        if 'MultiModel' in metadatas[filename]['dataset']:
+            linewidth = 2.
+            linestyle = ':'
+        # Determine line style for Observations
+        if metadatas[filename]['project'] in diagtools.get_obs_projects():
+            color = 'black'
+            linewidth = 1.7
+            linestyle = '-'
 
-            add_sea_floor(model_cubes[filename][region])
+        qplt.contour(
+            region_cubes[filename], [
+                threshold,
+            ],
+            colors=[
+                color,
+            ],
+            linewidths=linewidth,
+            linestyles=linestyle,
+            rasterized=True)
 
-        # Add title, threshold, legend to plots
-        title = ' '.join([
-            title,
-            str(threshold), units,
-            determine_transect_str(model_cubes[filename][region], region)
-        ])
-        titlify(title)
-        plt.legend(loc='best')
+        plot_details[filename] = {
+            'c': color,
+            'ls': linestyle,
+            'lw': linewidth,
+            'label': metadatas[filename]['dataset']
+        }
 
-        # Saving files:
-        if cfg['write_plots']:
-            path = diagtools.get_image_path(
-                cfg,
-                metadatas[filename],
-                prefix='MultipleModels',
-                suffix='_'.join([
-                    'contour_tramsect', region,
-                    str(threshold) + image_extention
-                ]),
-                metadata_id_list=[
-                    'field', 'short_name', 'preprocessor', 'diagnostic',
-                    'start_year', 'end_year'
-                ],
-            )
+        if set_y_logscale:
+            plt.axes().set_yscale('log')
 
-        # Resize and add legend outside thew axes.
-        plt.gcf().set_size_inches(9., 6.)
-        diagtools.add_legend_outside_right(
-            plot_details, plt.gca(), column_width=0.15)
+        title = metadatas[filename]['long_name']
+        units = str(region_cubes[filename].units)
+
+        add_sea_floor(region_cubes[filename])
+
+    # Add title, threshold, legend to plots
+    title = ' '.join([
+        title,
+        str(threshold), units,
+        determine_transect_str(region_cubes[filename], region)
+    ])
+    titlify(title)
+    plt.legend(loc='best')
+
+    # Saving files:
+    if cfg['write_plots']:
+        path = diagtools.get_image_path(
+            cfg,
+            metadatas[filename],
+            prefix='MultipleModels',
+            suffix='_'.join([
+                'contour_tramsect', region,
+                str(threshold) + image_extention
+            ]),
+            metadata_id_list=[
+                'field', 'short_name', 'preprocessor', 'diagnostic',
+                'start_year', 'end_year'
+            ],
+        )
 
-        logger.info('Saving plots to %s', path)
-        plt.savefig(path)
-        plt.close()
+    # Resize and add legend outside thew axes.
+    plt.gcf().set_size_inches(9., 6.)
+    diagtools.add_legend_outside_right(
+        plot_details, plt.gca(), column_width=0.15)
+
+    logger.info('Saving plots to %s', path)
+    plt.savefig(path)
+    plt.close()
 
 
 def main(cfg):
@@ -562,11 +587,9 @@ def main(cfg):
 
         #######
         # Multi model contour plots
+        tasks = []
         if thresholds:
-            multi_model_contours(
-                cfg,
-                metadatas,
-            )
+            tasks.append((multi_model_contours, (cfg, metadatas)))
 
         for filename in sorted(metadatas):
 
@@ -578,12 +601,16 @@ def main(cfg):
 
             ######
             # Time series of individual model
-            make_transects_plots(cfg, metadatas[filename], filename)
+            tasks.append(
+                (make_transects_plots, (cfg, metadatas[filename], filename)))
 
             ######
             # Contour maps of individual model
             if thresholds:
-                make_transect_contours(cfg, metadatas[filename], filename)
+                tasks.append((make_transect_contours,
+                              (cfg, metadatas[filename], filename)))
+
+        diagtools.run_plot_tasks(cfg, tasks)
 
     logger.info('Success')
 
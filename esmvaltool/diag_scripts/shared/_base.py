@@ -440,6 +440,11 @@ def run_diagnostic():
     # Read input metadata
     cfg['input_data'] = _get_input_data_files(cfg)
 
+    # Set global options for writing netcdf files (imported here to avoid
+    # circular imports)
+    from .io import set_netcdf_options
+    set_netcdf_options(cfg)
+
     logger.info("Starting diagnostic script %s with configuration:\n%s",
                 cfg['script'], yaml.safe_dump(cfg))
 
@@ -8,15 +8,41 @@ seasons are averaged periodically.
 Annual 'Supermeans' are averages over several full years.
 """
 
+import calendar
 import os.path
 
 import cf_units
+import dask
 import iris
 import iris.coord_categorisation
-from iris.coord_categorisation import _pt_date
 import numpy as np
 
 
+SEASONS = ('djf', 'mam', 'jja', 'son')
+MONTHS = tuple(m.lower() for m in calendar.month_abbr[1:])
+_MONTH_TO_SEASON = {
+    'dec': 'djf',
+    'jan': 'djf',
+    'feb': 'djf',
+    'mar': 'mam',
+    'apr': 'mam',
+    'may': 'mam',
+    'jun': 'jja',
+    'jul': 'jja',
+    'aug': 'jja',
+    'sep': 'son',
+    'oct': 'son',
+    'nov': 'son',
+}
+
+# Caches for loaded cube lists and computed supermeans. They only keep the
+# latest version of each file and at most _MAX_CACHED_SUPERMEANS supermeans;
+# entries live until they are replaced or `clear_cache` is called.
+_CUBES_CACHE = {}
+_SUPERMEANS_CACHE = {}
+_MAX_CACHED_SUPERMEANS = 32
+
+
 class NoBoundsError(ValueError):
     """Return error and pass."""
 
@@ -44,35 +70,197 @@ def get_supermean(name, season, data_dir, obs_flag=None):
     The annual supermean is a continuous mean over multiple years.
 
     Supermeans are only applied to full clima years (Starting Dec 1st).
+
+    All supermeans of a cube are computed at once and cached, see
+    `get_supermeans`.
     """
-    name_constraint = iris.Constraint(name=name)
+    if season not in ('ann', ) + SEASONS:
+        raise ValueError(
+            "Argument 'season' must be one of "
+            "['ann', 'djf', 'mam', 'jja', 'son']. "
+            "It is: " + str(season))
+    return get_supermeans(name, data_dir, obs_flag=obs_flag)[season]
+
 
+def get_supermeans(name, data_dir, obs_flag=None):
+    """Return annual, seasonal and monthly supermeans of a cube.
+
+    The supermeans are computed in a single aggregation pass over the data
+    (see `all_periodic_means`) and cached, so subsequent calls for the same
+    cube and file only return copies of the cached cubes.
+
+    :param name: Cube name. Should be CF-standard name. If no CF-standard name
+                 exists the STASH code in msi format (for example m01s30i403)
+                 is used as name.
+    :param data_dir: Directory containing cubes of model output data for
+                     supermeans.
+    :returns: Supermeaned cubes for the keys 'ann', the seasons
+              ['djf', 'mam', 'jja', 'son'] and the months
+              ['jan', 'feb', ..., 'dec'].
+    :rtype dict:
+    """
     if not obs_flag:
         cubes_path = os.path.join(data_dir, 'cubeList.nc')
     else:
         cubes_path = os.path.join(data_dir, obs_flag + '_cubeList.nc')
-    cubes = iris.load(cubes_path)
+    key = (name, ) + _file_key(cubes_path)
+    if key not in _SUPERMEANS_CACHE:
+        cube = _extract_cube(load_cubes(cubes_path),
+                             iris.Constraint(name=name))
+        _drop_stale_entries(_SUPERMEANS_CACHE, key[1], key[2])
+        while len(_SUPERMEANS_CACHE) >= _MAX_CACHED_SUPERMEANS:
+            # dicts are ordered by insertion, drop the oldest supermeans
+            del _SUPERMEANS_CACHE[next(iter(_SUPERMEANS_CACHE))]
+        _SUPERMEANS_CACHE[key] = all_periodic_means(cube)
+    return {
+        period: cube.copy()
+        for (period, cube) in _SUPERMEANS_CACHE[key].items()
+    }
+
+
+def load_cubes(cubes_path):
+    """Load cube list used for supermeans.
+
+    Cubes without name are renamed to their STASH code. The cube list is
+    cached and only loaded again if the file changed.
+
+    :param cubes_path: Path to the file containing the cube list.
+    :returns: Loaded cubes.
+    :rtype CubeList:
+    """
+    key = _file_key(cubes_path)
+    if key not in _CUBES_CACHE:
+        _drop_stale_entries(_CUBES_CACHE, *key)
+        cubes = iris.load(cubes_path)
 
-    # use STASH if no standard name
-    for cube in cubes:
-        if cube.name() == 'unknown':
-            cube.rename(str(cube.attributes['STASH']))
+        # use STASH if no standard name
+        for cube in cubes:
+            if cube.name() == 'unknown':
+                cube.rename(str(cube.attributes['STASH']))
+        _CUBES_CACHE[key] = cubes
+    return _CUBES_CACHE[key]
 
-    cube = cubes.extract_strict(name_constraint)
 
-    if season in ['djf', 'mam', 'jja', 'son']:
-        supermeans_cube = periodic_mean(cube, period='season')
-        return supermeans_cube.extract(iris.Constraint(season=season))
-    elif season == 'ann':
-        return periodic_mean(cube)
-    else:
-        raise ValueError(
-            "Argument 'season' must be one of "
-            "['ann', 'djf', 'mam', 'jja', 'son']. "
-            "It is: " + str(season))
+def clear_cache():
+    """Clear cached cube lists and supermeans."""
+    _CUBES_CACHE.clear()
+    _SUPERMEANS_CACHE.clear()
+
+
+def _drop_stale_entries(cache, path, mtime):
+    """Remove cache entries of older versions of a file."""
+    for key in list(cache):
+        if key[-2] == path and key[-1] != mtime:
+            del cache[key]
+
+
+def _extract_cube(cubes, constraint):
+    """Extract exactly one cube from a cube list on iris 2 and 3."""
+    if hasattr(cubes, 'extract_cube'):
+        return cubes.extract_cube(constraint)
+    return cubes.extract(constraint, strict=True)
+
+
+def _file_key(path):
+    """Return key identifying the current version of a file."""
+    path = os.path.abspath(path)
+    return (path, os.path.getmtime(path))
+
+
+class TimeAxisProfile(object):
+    """Profile of the time axis of a cube.
+
+    Collects the properties of the time axis needed for the supermeans. It
+    can be computed once per cube and passed to
+    `contains_full_climate_years`, `periodic_mean` and `all_periodic_means`.
+
+    :param cube: Cube.
 
+    Attributes:
 
-def contains_full_climate_years(cube):
+    * is_24h_sampled (bool):
+        Cube data is sampled once per day, see `is_24h_sampled`.
+    * start_hours (numpy.ndarray):
+        Hour of the day of each time step, taken from the first time bound,
+        or the time point if no bounds exist.
+    * sampling_hours (numpy.ndarray):
+        Sorted unique hours of the day at which data is sampled.
+    * intervals (int):
+        Number of time steps within the first 24 time units (diurnal
+        sampling intervals).
+    * starts_climate_year, ends_climate_year (bool or None):
+        First (last) time bound(s) are at a climate year boundary
+        (YYYY-12-01), `None` if the time coordinate has no bounds.
+    """
+
+    def __init__(self, cube):
+        """Compute profile of the time axis of `cube`."""
+        time_coord = cube.coord('time')
+        self.is_24h_sampled = is_24h_sampled(cube)
+        if time_coord.has_bounds():
+            self.start_hours = _hours_of_day(time_coord,
+                                             time_coord.bounds[:, 0])
+        else:
+            self.start_hours = _hours_of_day(time_coord, time_coord.points)
+        self.sampling_hours = np.unique(self.start_hours)
+        points = time_coord.points
+        self.intervals = int(np.count_nonzero(points[:-1] - points[0] < 24))
+        self.starts_climate_year = None
+        self.ends_climate_year = None
+        self._same_start_end = None
+        if time_coord.has_bounds():
+            self._check_climate_year_bounds(time_coord)
+
+    @property
+    def full_climate_years(self):
+        """Return True if cube covers full climate year(s)."""
+        if self.starts_climate_year is None:
+            raise NoBoundsError()
+        return (self.starts_climate_year and self.ends_climate_year
+                and self._same_start_end)
+
+    def _check_climate_year_bounds(self, time_coord):
+        """Check if first and last bounds are at climate year boundaries."""
+        if self.is_24h_sampled:
+            n_bounds = self.intervals
+        else:
+            n_bounds = 1
+        bounds = time_coord.bounds
+        starts = bounds[:n_bounds, 0]
+        ends = bounds[len(bounds) - n_bounds:, 1]
+        dates = cf_units.num2date(np.concatenate([starts, ends]),
+                                  time_coord.units.origin,
+                                  time_coord.units.calendar)
+        fields = np.array(
+            [(d.month, d.day, d.hour, d.minute, d.second) for d in dates],
+            dtype=int).reshape(-1, 5)
+        (start_fields, end_fields) = (fields[:n_bounds], fields[n_bounds:])
+
+        def _at_boundary(fields):
+            at_boundary = ((fields[:, 0] == 12) & (fields[:, 1] == 1) &
+                           (fields[:, 3] == 0) & (fields[:, 4] == 0))
+            if not self.is_24h_sampled:
+                at_boundary &= fields[:, 2] == 0
+            return bool(np.all(at_boundary))
+
+        self.starts_climate_year = _at_boundary(start_fields)
+        self.ends_climate_year = _at_boundary(end_fields)
+        self._same_start_end = bool(np.array_equal(start_fields, end_fields))
+
+
+def _hours_of_day(time_coord, values):
+    """Return hour of the day of time values (vectorized)."""
+    units = time_coord.units
+    hours = units.convert(
+        np.asarray(values, dtype=np.float64),
+        cf_units.Unit('hours since 1970-01-01 00:00:00',
+                      calendar=units.calendar))
+    # Avoid rounding errors of the conversion
+    hours = np.floor(np.round(hours, 6))
+    return np.mod(hours, 24).astype(int)
+
+
+def contains_full_climate_years(cube, profile=None):
     """Test whether cube covers full climate year(s).
 
     A climate year begins at YYYY-12-01 00:00:00,
@@ -83,47 +271,16 @@ def contains_full_climate_years(cube):
     data sampled at 18:00 would be YYYY-12-01 18:00:00.
 
     :param Cube: Cube.
+    :param profile: `TimeAxisProfile` of the cube, computed if not given.
     :returns: True if first and last time bound
               in cube are at YYYY-12-01 00:00:00.
     :rtype: boolean
     """
-    origin = cube.coord('time').units.origin
-    calendar = cube.coord('time').units.calendar
-    format_ = 'YYYY-%m-%d %H:%M:%S'
-
     if not cube.coord('time').has_bounds():
         raise NoBoundsError()
-
-    def _num2date(num):
-        return cf_units.num2date(num, origin, calendar)
-
-    if is_24h_sampled(cube):
-        # find out number of sampling intervals (difference < 24 h)
-        intervals = []
-        for i in range(len(cube.coord('time').points) - 1):
-            diff = cube.coord('time').points[i] - cube.coord('time').points[0]
-            if diff < 24:
-                intervals.append(round(diff))
-        intervals = len(intervals)
-
-        year_boundaries = [
-            'YYYY-12-01 {:02d}:00:00'.format(hour) for hour in range(24)
-        ]
-
-        bounding_datetimes = []
-        time_bounds = cube.coord('time').bounds
-        for i in range(intervals):
-            start = _num2date(time_bounds[i][0]).strftime(format_)
-            end = _num2date(time_bounds[i - intervals][1]).strftime(format_)
-            bounding_datetimes.append((start, end))
-        return all(start == end and start in year_boundaries and
-                   end in year_boundaries
-                   for start, end in bounding_datetimes)
-    else:
-        start = _num2date(cube.coord('time').bounds[0][0]).strftime(format_)
-        end = _num2date(cube.coord('time').bounds[-1][1]).strftime(format_)
-        year_boundary = 'YYYY-12-01 00:00:00'
-        return start == year_boundary and end == year_boundary
+    if profile is None:
+        profile = TimeAxisProfile(cube)
+    return profile.full_climate_years
 
 
 def is_24h_sampled(cube):
@@ -135,7 +292,7 @@ def is_24h_sampled(cube):
     return '24 hour' in meaning_periods
 
 
-def periodic_mean(cube, period=None):
+def periodic_mean(cube, period=None, profile=None):
     """Return cube in which all identical periods are averaged into one.
 
     In case of months this would be averages over all Januaries, Februaries,
@@ -153,6 +310,7 @@ def periodic_mean(cube, period=None):
 
     :param cube: Cube with data for each calendar month.
     :param period: 'month', 'season'
+    :param profile: `TimeAxisProfile` of the cube, computed if not given.
     :returns: Cube with periodic monthly averages.
     :rtype: Cube
 
@@ -164,12 +322,9 @@ def periodic_mean(cube, period=None):
     if period not in [None, 'month', 'season']:
         raise InvalidPeriod('Invalid period: ' + str(period))
 
-    _cube = cube.copy()
-
-    if _cube.coord('time').has_bounds():
-        add_start_hour(_cube, 'time', name='start_hour')
-    else:
-        iris.coord_categorisation.add_hour(_cube, 'time', name='start_hour')
+    if profile is None:
+        profile = TimeAxisProfile(cube)
+    _cube = _add_start_hour(cube, profile)
 
     if period == 'month':
         iris.coord_categorisation.add_month(_cube, 'time', name='month')
@@ -180,7 +335,7 @@ def periodic_mean(cube, period=None):
     else:
         raise InvalidPeriod('Invalid period: ' + str(period))
 
-    time_points_per_day = len(set(_cube.coord('start_hour').points))
+    time_points_per_day = len(profile.sampling_hours)
     if period is None:  # multi-annual mean
         if time_points_per_day > 1:
             _cube = time_average_by(_cube, 'start_hour')
@@ -197,6 +352,83 @@ def periodic_mean(cube, period=None):
     return _cube
 
 
+def all_periodic_means(cube, profile=None):
+    """Return annual, seasonal and monthly periodic means of a cube.
+
+    Gives the same results as `periodic_mean` for all periods, but the data
+    is only aggregated once: the duration weighted sums of all calendar
+    months are computed in a single pass, seasonal and annual means are
+    derived from these sums.
+
+    :param cube: Cube with data for each calendar month.
+    :param profile: `TimeAxisProfile` of the cube, computed if not given.
+    :returns: Cubes with periodic averages for the keys 'ann', the seasons
+              ['djf', 'mam', 'jja', 'son'] and the months
+              ['jan', 'feb', ..., 'dec'].
+    :rtype: dict
+    """
+    if profile is None:
+        profile = TimeAxisProfile(cube)
+    _cube = _add_start_hour(cube, profile)
+    iris.coord_categorisation.add_month(_cube, 'time', name='month')
+    if len(profile.sampling_hours) > 1:
+        diurnal = ['start_hour']
+    else:
+        _cube.remove_coord('start_hour')
+        diurnal = []
+    orig_cell_methods = _cube.cell_methods
+
+    # single aggregation over the full data
+    durations_cube = _durations_cube(_cube, ['month'] + diurnal)
+    (sums, weights) = _weighted_sums_by(_cube, durations_cube,
+                                        ['month'] + diurnal)
+    # realize the (small) monthly sums, all supermeans are derived from them
+    (sums.data, weights.data) = dask.compute(sums.core_data(),
+                                             weights.core_data())
+    supermeans = {}
+    monthly = _divide_by_weights(sums, weights, orig_cell_methods,
+                                 ['month'] + diurnal)
+    for month in MONTHS:
+        supermeans[month] = monthly.extract(
+            iris.Constraint(month=month.capitalize()))
+
+    # seasonal means from sums over months
+    seasons = [_MONTH_TO_SEASON[m.lower()] for m in sums.coord('month').points]
+    for sum_cube in (sums, weights):
+        sum_cube.add_aux_coord(
+            iris.coords.AuxCoord(seasons, units='no_unit', long_name='season'),
+            sum_cube.coord_dims('month'))
+        sum_cube.remove_coord('month')
+    seasonal = _divide_by_weights(*_sums_by(sums, weights,
+                                            ['season'] + diurnal),
+                                  orig_cell_methods, ['season'] + diurnal)
+    for season in SEASONS:
+        supermeans[season] = seasonal.extract(iris.Constraint(season=season))
+
+    # annual mean from sums over months
+    for sum_cube in (sums, weights):
+        sum_cube.remove_coord('season')
+    annual_periods = diurnal or ['time']
+    supermeans['ann'] = _divide_by_weights(
+        *_sums_by(sums, weights, annual_periods), orig_cell_methods,
+        annual_periods)
+    return supermeans
+
+
+def _add_start_hour(cube, profile):
+    """Return cube with coordinate `start_hour` without copying the data."""
+    # the data is not modified in place
+    _cube = cube.copy(cube.core_data())
+    time_coord = _cube.coord('time')
+    _cube.add_aux_coord(
+        iris.coords.AuxCoord(profile.start_hours,
+                             long_name='start_hour',
+                             units='1',
+                             attributes=time_coord.attributes.copy()),
+        _cube.coord_dims(time_coord))
+    return _cube
+
+
 def add_start_hour(cube, coord, name='diurnal_sampling_hour'):
     """Add AuxCoord for diurnal data. Diurnal data is sampled every 24 hours.
 
@@ -208,7 +440,7 @@ def add_start_hour(cube, coord, name='diurnal_sampling_hour'):
 
 def start_hour_from_bounds(coord, _, bounds):
     """Add hour from bounds."""
-    return np.array([_pt_date(coord, _bounds[0]).hour for _bounds in bounds])
+    return _hours_of_day(coord, bounds[:, 0])
 
 
 def _add_categorised_coord(cube,
@@ -273,14 +505,28 @@ def time_average_by(cube, periods='time'):
 
     i. e. time-based categorical
     coordinates, with calendar dependent weighting.
+
+    Lazy data is kept lazy, the weighting is done blockwise.
     """
     if isinstance(periods, str):
         periods = [periods]
 
-    # create new cube with time coord and orig duration as data
+    # calculate weighted sum
+    orig_cell_methods = cube.cell_methods
+    durations_cube = _durations_cube(cube, periods)
+    (cube, durations_cube) = _weighted_sums_by(cube, durations_cube, periods)
+
+    # divide by aggregated weights
+    return _divide_by_weights(cube, durations_cube, orig_cell_methods,
+                              periods)
+
+
+def _durations_cube(cube, periods):
+    """Create cube with time coord and normalised durations as data."""
+    durs = durations(cube.coord('time'))
     durations_cube = iris.cube.Cube(
         # durations normalised to 1
-        durations(cube.coord('time')) / np.max(durations(cube.coord('time'))),
+        durs / np.max(durs),
         long_name='duration',
         units='1',
         attributes=None,
@@ -289,32 +535,39 @@ def time_average_by(cube, periods='time'):
     for period in periods:
         if period != 'time':
             durations_cube.add_aux_coord(cube.coord(period), 0)
+    return durations_cube
 
-    # calculate weighted sum
-    orig_cell_methods = cube.cell_methods
 
+def _weighted_sums_by(cube, durations_cube, periods):
+    """Sum duration weighted cube and durations over time or periods."""
     # multiply each time slice by its duration
-    idx_obj = [None] * cube.data.ndim
-    idx_obj[cube.coord_dims('time')[0]] = slice(
-        None)  # [None, slice(None), None] == [np.newaxis, :, np.newaxis]
-    cube.data *= durations_cube.data[idx_obj]
+    cube = cube.copy(cube.core_data() *
+                     _broadcast_weights(cube, durations_cube.data))
+    return _sums_by(cube, durations_cube, periods)
 
-    if periods == ['time']:  # duration weighted averaging
+
+def _sums_by(cube, durations_cube, periods):
+    """Sum cube and durations over time or periods."""
+    if periods == ['time']:
         cube = cube.collapsed(periods, iris.analysis.SUM)
         durations_cube = durations_cube.collapsed(periods, iris.analysis.SUM)
     else:
         cube = cube.aggregated_by(periods, iris.analysis.SUM)
         durations_cube = durations_cube.aggregated_by(periods,
                                                       iris.analysis.SUM)
+    return (cube, durations_cube)
 
-    # divide by aggregated weights
+
+def _divide_by_weights(cube, durations_cube, cell_methods, periods):
+    """Divide weighted sums by aggregated weights and set cell methods."""
     if durations_cube.data.shape == ():
-        cube.data /= durations_cube.data
+        cube = cube.copy(cube.core_data() / durations_cube.data)
     else:
-        cube.data /= durations_cube.data[idx_obj]
+        cube = cube.copy(cube.core_data() /
+                         _broadcast_weights(cube, durations_cube.data))
 
     # correct cell methods
-    cube.cell_methods = orig_cell_methods
+    cube.cell_methods = cell_methods
     time_averaging_method = iris.coords.CellMethod(
         method='mean', coords=periods)
     cube.add_cell_method(time_averaging_method)
@@ -322,9 +575,17 @@ def time_average_by(cube, periods='time'):
     return cube
 
 
+def _broadcast_weights(cube, weights):
+    """Reshape weights along time dimension so they broadcast to the data."""
+    shape = [1] * cube.ndim
+    shape[cube.coord_dims('time')[0]] = -1
+    if np.issubdtype(cube.dtype, np.floating):
+        weights = weights.astype(cube.dtype)
+    return weights.reshape(shape)
+
+
 def durations(time_coord):
     """Return durations of time periods."""
     assert time_coord.has_bounds(), 'No bounds. Do not guess.'
-    durs = np.array(
-        [bounds[1] - bounds[0] for bounds in time_coord.bounds])
-    return durs
+    bounds = time_coord.bounds
+    return bounds[:, 1] - bounds[:, 0]
@@ -6,10 +6,26 @@ import os
 import iris
 import numpy as np
 
-from .iris_helpers import unify_1d_cubes
+from .iris_helpers import unify_1d_cubes_to_array
 
 logger = logging.getLogger(__name__)
 
+NETCDF_FORMATS = [
+    'NETCDF4',
+    'NETCDF4_CLASSIC',
+    'NETCDF3_CLASSIC',
+    'NETCDF3_64BIT',
+]
+NETCDF_OPTIONS = [
+    'chunksizes',
+    'complevel',
+    'netcdf_format',
+    'shuffle',
+    'unlimited_dimensions',
+    'zlib',
+]
+_GLOBAL_NETCDF_OPTIONS = {}
+
 VAR_KEYS = [
     'long_name',
     'units',
@@ -145,7 +161,130 @@ def netcdf_to_metadata(cfg, pattern=None, root=None):
     return metadata
 
 
-def metadata_to_netcdf(cube, metadata):
+def _check_netcdf_options(options):
+    """Check if options for writing netcdf files are valid."""
+    for key in options:
+        if key not in NETCDF_OPTIONS:
+            raise ValueError(
+                f"Got invalid netcdf option '{key}', expected one of "
+                f"{NETCDF_OPTIONS}")
+    netcdf_format = options.get('netcdf_format')
+    if netcdf_format is not None and netcdf_format not in NETCDF_FORMATS:
+        raise ValueError(
+            f"Got invalid netcdf format '{netcdf_format}', expected one of "
+            f"{NETCDF_FORMATS}")
+    complevel = options.get('complevel')
+    if complevel is not None and complevel not in range(10):
+        raise ValueError(
+            f"Expected compression level between 0 and 9, got {complevel}")
+
+
+def _get_chunksizes(cubes, chunksizes):
+    """Get chunk sizes for the data variable of cubes.
+
+    `chunksizes` is either given as a sequence with one element per dimension
+    or as :obj:`dict` with coordinate names (keys) and chunk sizes (values).
+    Dimensions which are not given in the :obj:`dict` are not chunked. Since
+    :func:`iris.save` only supports a single set of chunk sizes, `None` is
+    returned if these differ for the given cubes.
+
+    """
+    all_chunks = set()
+    for cube in cubes:
+        if cube.ndim == 0:
+            return None
+        if isinstance(chunksizes, dict):
+            chunks = list(cube.shape)
+            for (coord_name, size) in chunksizes.items():
+                try:
+                    dims = cube.coord_dims(coord_name)
+                except iris.exceptions.CoordinateNotFoundError:
+                    continue
+                for dim in dims:
+                    chunks[dim] = size
+        else:
+            chunks = list(chunksizes)
+            if len(chunks) != cube.ndim:
+                logger.warning(
+                    "Ignoring chunk sizes %s for cube with %i dimensions",
+                    chunksizes, cube.ndim)
+                return None
+        all_chunks.add(
+            tuple(max(1, min(c, s)) for (c, s) in zip(chunks, cube.shape)))
+    if len(all_chunks) != 1:
+        logger.warning(
+            "Ignoring chunk sizes %s, the cubes to be saved have different "
+            "shapes", chunksizes)
+        return None
+    return all_chunks.pop()
+
+
+def get_netcdf_options(**netcdf_options):
+    """Get options for writing netcdf files.
+
+    Global options set by :func:`set_netcdf_options` are updated by the
+    given keyword arguments.
+
+    Parameters
+    ----------
+    **netcdf_options
+        Options for writing netcdf files (see :func:`set_netcdf_options`).
+
+    Returns
+    -------
+    dict
+        Options for writing netcdf files.
+
+    Raises
+    ------
+    ValueError
+        Invalid option given.
+
+    """
+    _check_netcdf_options(netcdf_options)
+    options = dict(_GLOBAL_NETCDF_OPTIONS)
+    options.update(netcdf_options)
+    return options
+
+
+def set_netcdf_options(cfg=None, **netcdf_options):
+    """Set global options for writing netcdf files.
+
+    These options are used by :func:`iris_save` and all functions in this
+    module that write netcdf files unless they are overwritten in a specific
+    call. Options which are not set use the defaults of :func:`iris.save`.
+
+    Parameters
+    ----------
+    cfg : dict, optional
+        Diagnostic script configuration. The options are read from the key
+        `netcdf_options`.
+    **netcdf_options
+        Options for writing netcdf files, overwrite options given in `cfg`.
+        Possible options are `netcdf_format` (one of `NETCDF4`,
+        `NETCDF4_CLASSIC`, `NETCDF3_CLASSIC` or `NETCDF3_64BIT`), `zlib`
+        (:obj:`bool`), `complevel` (:obj:`int` between 0 and 9), `shuffle`
+        (:obj:`bool`), `chunksizes` (sequence with one element per dimension
+        or :obj:`dict` with coordinate names as keys) and
+        `unlimited_dimensions` (:obj:`list` of coordinate names).
+
+    Raises
+    ------
+    ValueError
+        Invalid option given.
+
+    """
+    options = {}
+    if cfg is not None:
+        options.update(cfg.get('netcdf_options') or {})
+    options.update(netcdf_options)
+    _check_netcdf_options(options)
+    _GLOBAL_NETCDF_OPTIONS.clear()
+    _GLOBAL_NETCDF_OPTIONS.update(options)
+    logger.debug("Set global netcdf options to %s", options)
+
+
+def metadata_to_netcdf(cube, metadata, **netcdf_options):
     """Convert single metadata dictionary to netcdf file.
 
     Parameters
@@ -154,6 +293,8 @@ def metadata_to_netcdf(cube, metadata):
         Cube to be written.
     metadata : dict
         Metadata for the cube.
+    **netcdf_options
+        Options for writing the netcdf file (see :func:`set_netcdf_options`).
 
     """
     metadata = dict(metadata)
@@ -174,10 +315,15 @@ def metadata_to_netcdf(cube, metadata):
         if isinstance(val, bool):
             metadata[attr] = str(val)
     cube.attributes.update(metadata)
-    iris_save(cube, metadata['filename'])
+    iris_save(cube, metadata['filename'], **netcdf_options)
 
 
-def save_1d_data(cubes, path, coord_name, var_attrs, attributes=None):
+def save_1d_data(cubes,
+                 path,
+                 coord_name,
+                 var_attrs,
+                 attributes=None,
+                 **netcdf_options):
     """Save 1D data for multiple datasets.
 
     Create 2D cube with the dimensionsal coordinate `coord_name` and the
@@ -202,6 +348,8 @@ def save_1d_data(cubes, path, coord_name, var_attrs, attributes=None):
         Attributes for the variable (`short_name`, `long_name`, or `units`).
     attributes : dict, optional
         Additional attributes for the cube.
+    **netcdf_options
+        Options for writing the netcdf file (see :func:`set_netcdf_options`).
 
     """
     var_attrs = dict(var_attrs)
@@ -214,43 +362,62 @@ def save_1d_data(cubes, path, coord_name, var_attrs, attributes=None):
         return
     datasets = list(cubes.keys())
     cube_list = iris.cube.CubeList(list(cubes.values()))
-    cube_list = unify_1d_cubes(cube_list, coord_name)
-    data = [c.data for c in cube_list]
+    (data, coord) = unify_1d_cubes_to_array(cube_list, coord_name)
     dataset_coord = iris.coords.AuxCoord(datasets, long_name='dataset')
-    coord = cube_list[0].coord(coord_name)
     if attributes is None:
         attributes = {}
     var_attrs['var_name'] = var_attrs.pop('short_name')
 
     # Create new cube
-    cube = iris.cube.Cube(np.ma.array(data),
+    cube = iris.cube.Cube(data,
                           aux_coords_and_dims=[(dataset_coord, 0), (coord, 1)],
                           attributes=attributes,
                           **var_attrs)
-    iris_save(cube, path)
+    iris_save(cube, path, **netcdf_options)
 
 
-def iris_save(source, path):
+def iris_save(source, path, **netcdf_options):
     """Save :mod:`iris` objects with correct attributes.
 
+    Lazy data is not realized but streamed to the file chunk by chunk.
+
     Parameters
     ----------
     source : iris.cube.Cube or iterable of iris.cube.Cube
         Cube(s) to be saved.
     path : str
         Path to the new file.
+    **netcdf_options
+        Options for writing the netcdf file, overwrite global options set by
+        :func:`set_netcdf_options`.
+
+    Raises
+    ------
+    ValueError
+        Invalid netcdf option given.
 
     """
     if isinstance(source, iris.cube.Cube):
+        cubes = [source]
         source.attributes['filename'] = path
     else:
-        for cube in source:
+        cubes = list(source)
+        for cube in cubes:
             cube.attributes['filename'] = path
-    iris.save(source, path)
+    options = get_netcdf_options(**netcdf_options)
+    if options.get('chunksizes') is not None:
+        options['chunksizes'] = _get_chunksizes(cubes, options['chunksizes'])
+    options = {key: val for (key, val) in options.items() if val is not None}
+    iris.save(source, path, **options)
     logger.info("Wrote %s", path)
 
 
-def save_scalar_data(data, path, var_attrs, aux_coord=None, attributes=None):
+def save_scalar_data(data,
+                     path,
+                     var_attrs,
+                     aux_coord=None,
+                     attributes=None,
+                     **netcdf_options):
     """Save scalar data for multiple datasets.
 
     Create 1D cube with the auxiliary dimension `dataset` and save scalar data
@@ -272,6 +439,8 @@ def save_scalar_data(data, path, var_attrs, aux_coord=None, attributes=None):
         Optional auxiliary coordinate.
     attributes : dict, optional
         Additional attributes for the cube.
+    **netcdf_options
+        Options for writing the netcdf file (see :func:`set_netcdf_options`).
 
     """
     var_attrs = dict(var_attrs)
@@ -293,4 +462,4 @@ def save_scalar_data(data, path, var_attrs, aux_coord=None, attributes=None):
                           aux_coords_and_dims=coords,
                           attributes=attributes,
                           **var_attrs)
-    iris_save(cube, path)
+    iris_save(cube, path, **netcdf_options)
@@ -1,7 +1,9 @@
 """Convenience functions for :mod:`iris` objects."""
 import logging
+from functools import reduce
 from pprint import pformat
 
+import dask.array as da
 import iris
 import numpy as np
 
@@ -10,6 +12,68 @@ from ._base import group_metadata
 logger = logging.getLogger(__name__)
 
 
+def _get_indices_in_ref(points, ref_points, ref_name):
+    """Get indices of coordinate points in (unique) reference points."""
+    sorter = np.argsort(ref_points)
+    indices = np.searchsorted(ref_points, points, sorter=sorter)
+    indices = np.clip(indices, 0, len(ref_points) - 1)
+    indices = sorter[indices]
+    if not np.array_equal(ref_points[indices], points):
+        raise ValueError(
+            f"Coordinate points {points} are not subset of reference "
+            f"coordinate '{ref_name}' {ref_points}")
+    return indices
+
+
+def _scatter_lazy_to_ref(cubes, all_columns, n_ref):
+    """Scatter lazy data of 1D cubes into 2D array given by reference."""
+    rows = []
+    for (cube, columns) in zip(cubes, all_columns):
+        # Points that are not covered by the cube point to an appended NaN
+        inverse = np.full(n_ref, len(columns))
+        inverse[columns] = np.arange(len(columns))
+        data = da.ma.filled(cube.lazy_data().astype(float), np.nan)
+        data = da.concatenate([data, da.from_array(np.array([np.nan]))])
+        rows.append(data[inverse])
+    return da.ma.masked_invalid(da.stack(rows))
+
+
+def _scatter_to_ref(cubes, ref_coord):
+    """Scatter data of 1D cubes into 2D array given by reference.
+
+    The result is a lazy array if any of the cubes has lazy data.
+
+    """
+    ref_points = ref_coord.points
+    if len(np.unique(ref_points)) != len(ref_points):
+        raise ValueError(
+            f"Expected unique coordinate '{ref_coord.name()}', got "
+            f"{ref_coord}")
+    coord_name = ref_coord.name()
+    all_points = []
+    for cube in cubes:
+        points = cube.coord(coord_name).points
+        if len(np.unique(points)) != len(points):
+            raise ValueError(
+                f"Coordinate '{coord_name}' of cube\n{cube}\n is not "
+                f"unique")
+        all_points.append(points)
+    if not all_points:
+        return np.ma.masked_all((0, ref_coord.shape[0]))
+    columns = _get_indices_in_ref(np.concatenate(all_points), ref_points,
+                                  coord_name)
+    if any(cube.has_lazy_data() for cube in cubes):
+        splits = np.cumsum([len(p) for p in all_points])[:-1]
+        return _scatter_lazy_to_ref(cubes, np.split(columns, splits),
+                                    ref_coord.shape[0])
+    rows = np.repeat(np.arange(len(all_points)),
+                     [len(p) for p in all_points])
+    new_data = np.full((len(all_points), ref_coord.shape[0]), np.nan)
+    new_data[rows, columns] = np.concatenate(
+        [np.ma.filled(cube.data, np.nan) for cube in cubes])
+    return np.ma.masked_invalid(new_data)
+
+
 def _transform_coord_to_ref(cubes, ref_coord):
     """Transform coordinates of cubes to reference."""
     try:
@@ -17,23 +81,11 @@ def _transform_coord_to_ref(cubes, ref_coord):
         ref_coord = iris.coords.DimCoord.from_coord(ref_coord)
     except ValueError:
         pass
-    if not np.array_equal(
-            np.unique(ref_coord.points), np.sort(ref_coord.points)):
-        raise ValueError(
-            f"Expected unique coordinate '{ref_coord.name()}', got "
-            f"{ref_coord}")
+    new_data = _scatter_to_ref(cubes, ref_coord)
     coord_name = ref_coord.name()
     new_cubes = iris.cube.CubeList()
-    for cube in cubes:
-        coord = cube.coord(coord_name)
-        if not np.all(np.isin(coord.points, ref_coord.points)):
-            raise ValueError(
-                f"Coordinate {coord} of cube\n{cube}\nis not subset of "
-                f"reference coordinate {ref_coord}")
-        new_data = np.full(ref_coord.shape, np.nan)
-        indices = np.where(np.in1d(ref_coord.points, coord.points))
-        new_data[indices] = np.ma.filled(cube.data, np.nan)
-        new_cube = iris.cube.Cube(np.ma.masked_invalid(new_data))
+    for (cube, data) in zip(cubes, new_data):
+        new_cube = iris.cube.Cube(data)
         if isinstance(ref_coord, iris.coords.DimCoord):
             new_cube.add_dim_coord(ref_coord, 0)
         else:
@@ -43,7 +95,6 @@ def _transform_coord_to_ref(cubes, ref_coord):
                 new_cube.add_aux_coord(aux_coord, [])
         new_cube.metadata = cube.metadata
         new_cubes.append(new_cube)
-    check_coordinate(new_cubes, coord_name)
     logger.debug("Successfully unified coordinate '%s' to %s", coord_name,
                  ref_coord)
     logger.debug("of cubes")
@@ -51,6 +102,32 @@ def _transform_coord_to_ref(cubes, ref_coord):
     return new_cubes
 
 
+def _unify_1d_ref_coord(cubes, coord_name):
+    """Get union of coordinates of 1D cubes as reference coordinate."""
+    coords = []
+    for cube in cubes:
+        if cube.ndim != 1:
+            raise ValueError(f"Dimension of cube\n{cube}\nis not 1")
+        try:
+            new_coord = cube.coord(coord_name)
+        except iris.exceptions.CoordinateNotFoundError:
+            raise iris.exceptions.CoordinateNotFoundError(
+                f"'{coord_name}' is not a coordinate of cube\n{cube}")
+        if len(np.unique(new_coord.points)) != len(new_coord.points):
+            raise ValueError(
+                f"Coordinate '{coord_name}' of cube\n{cube}\n is not unique, "
+                f"unifying not possible")
+        coords.append(new_coord)
+    if coord_name == 'time':
+        iris.util.unify_time_units(cubes)
+    if len(coords) == 1:
+        return coords[0]
+
+    # Compute union of all coordinates at once
+    new_points = np.unique(np.concatenate([c.points for c in coords]))
+    return coords[0].copy(new_points)
+
+
 def check_coordinate(cubes, coord_name):
     """Compare coordinate of cubes and raise error if not identical.
 
@@ -155,6 +232,32 @@ def iris_project_constraint(projects, cfg, negate=False):
     return iris.Constraint(dataset=project_constraint)
 
 
+def _get_common_dataset_indices(cubes):
+    """Get common elements of coordinate `dataset` and indices of them."""
+    all_points = []
+    for cube in cubes:
+        try:
+            coord_points = cube.coord('dataset').points
+        except iris.exceptions.CoordinateNotFoundError:
+            raise iris.exceptions.CoordinateNotFoundError(
+                f"'dataset' is not a coordinate of cube\n{cube}")
+        if len(np.unique(coord_points)) != len(coord_points):
+            raise ValueError(
+                f"Coordinate 'dataset' of cube\n{cube}\n contains duplicate "
+                f"elements")
+        all_points.append(coord_points)
+    common_elements = reduce(
+        lambda x, y: np.intersect1d(x, y, assume_unique=True),
+        all_points[1:], np.sort(all_points[0]))
+    if not common_elements.size:
+        raise ValueError(f"Cubes {cubes} do not share common elements")
+    indices = [
+        np.intersect1d(p, common_elements, assume_unique=True,
+                       return_indices=True)[1] for p in all_points
+    ]
+    return (common_elements, indices)
+
+
 def intersect_dataset_coordinates(cubes):
     """Compare dataset coordinates of cubes and match them if necessary.
 
@@ -180,41 +283,62 @@ def intersect_dataset_coordinates(cubes):
         duplicate elements or the cubes do not share common elements.
 
     """
-    common_elements = None
-
-    # Get common elements
-    for cube in cubes:
-        try:
-            coord_points = cube.coord('dataset').points
-        except iris.exceptions.CoordinateNotFoundError:
-            raise iris.exceptions.CoordinateNotFoundError(
-                f"'dataset' is not a coordinate of cube\n{cube}")
-        if len(set(coord_points)) != len(coord_points):
-            raise ValueError(
-                f"Coordinate 'dataset' of cube\n{cube}\n contains duplicate "
-                f"elements")
-        if common_elements is None:
-            common_elements = set(coord_points)
-        else:
-            common_elements = common_elements.intersection(set(coord_points))
-    common_elements = list(common_elements)
+    (common_elements, indices) = _get_common_dataset_indices(cubes)
 
     # Save new cubes
     new_cubes = iris.cube.CubeList()
-    for cube in cubes:
-        cube = cube.extract(iris.Constraint(dataset=common_elements))
-        if cube is None:
-            raise ValueError(f"Cubes {cubes} do not share common elements")
-        sorted_idx = np.argsort(cube.coord('dataset').points)
-        new_cubes.append(cube[sorted_idx])
+    for (cube, idx) in zip(cubes, indices):
+        slices = [slice(None)] * cube.ndim
+        for dim in cube.coord_dims('dataset'):
+            slices[dim] = idx
+        new_cubes.append(cube[tuple(slices)])
     check_coordinate(new_cubes, 'dataset')
     logger.debug("Successfully matched 'dataset' coordinate to %s",
-                 sorted(common_elements))
+                 common_elements)
     logger.debug("of cubes")
     logger.debug(pformat(cubes))
     return new_cubes
 
 
+def intersect_dataset_data(cubes):
+    """Get data of cubes for the datasets which are given in all cubes.
+
+    Similar to :func:`intersect_dataset_coordinates`, but returns the aligned
+    data as arrays directly (e.g. for regressions) without creating new
+    cubes. The data of all cubes is sorted by the coordinate `dataset`.
+
+    Parameters
+    ----------
+    cubes : iris.cube.CubeList
+        Cubes to be compared.
+
+    Returns
+    -------
+    tuple of numpy.ndarray and list of numpy.ma.MaskedArray
+        Sorted common elements of coordinate `dataset` and data of the
+        individual cubes for these elements.
+
+    Raises
+    ------
+    iris.exceptions.CoordinateNotFoundError
+        Coordinate `dataset` is not a coordinate of one of the cubes.
+    ValueError
+        At least one of the cubes contains a `dataset` coordinate with
+        duplicate elements or the cubes do not share common elements.
+
+    """
+    (common_elements, indices) = _get_common_dataset_indices(cubes)
+    all_data = []
+    for (cube, idx) in zip(cubes, indices):
+        data = cube.core_data()
+        for dim in cube.coord_dims('dataset'):
+            data = data[(slice(None), ) * dim + (idx, )]
+        if cube.has_lazy_data():
+            data = data.compute()
+        all_data.append(np.ma.asarray(data))
+    return (common_elements, all_data)
+
+
 def unify_1d_cubes(cubes, coord_name):
     """Unify 1D cubes by transforming them to identical coordinates.
 
@@ -240,34 +364,49 @@ def unify_1d_cubes(cubes, coord_name):
         are subsets of longest coordinate.
 
     """
-    ref_coord = None
-
-    # Get reference coordinate
-    for cube in cubes:
-        if cube.ndim != 1:
-            raise ValueError(f"Dimension of cube\n{cube}\nis not 1")
-        try:
-            new_coord = cube.coord(coord_name)
-        except iris.exceptions.CoordinateNotFoundError:
-            raise iris.exceptions.CoordinateNotFoundError(
-                f"'{coord_name}' is not a coordinate of cube\n{cube}")
-        if not np.array_equal(
-                np.unique(new_coord.points), np.sort(new_coord.points)):
-            raise ValueError(
-                f"Coordinate '{coord_name}' of cube\n{cube}\n is not unique, "
-                f"unifying not possible")
-        if ref_coord is None:
-            ref_coord = new_coord
-        else:
-            new_points = np.union1d(ref_coord.points, new_coord.points)
-            ref_coord = ref_coord.copy(new_points)
-    if coord_name == 'time':
-        iris.util.unify_time_units(cubes)
+    ref_coord = _unify_1d_ref_coord(cubes, coord_name)
 
     # Transform all cubes
     return _transform_coord_to_ref(cubes, ref_coord)
 
 
+def unify_1d_cubes_to_array(cubes, coord_name):
+    """Unify data of 1D cubes to a single 2D array.
+
+    Similar to :func:`unify_1d_cubes`, but does not create intermediate
+    cubes. The data of every cube is scattered into a row of the output array,
+    points that are not covered by a cube are masked.
+
+    Parameters
+    ----------
+    cubes : iris.cube.CubeList
+        Cubes to be processed.
+    coord_name : str
+        Name of the coordinate.
+
+    Returns
+    -------
+    tuple of numpy.ma.MaskedArray or dask.array.Array and iris.coords.Coord
+        Unified data with shape `(number of cubes, length of coordinate)` and
+        common coordinate of all cubes. The data is lazy if any of the cubes
+        has lazy data.
+
+    Raises
+    ------
+    ValueError
+        Cubes are not 1D, coordinate name differs or not all cube coordinates
+        are subsets of longest coordinate.
+
+    """
+    ref_coord = _unify_1d_ref_coord(cubes, coord_name)
+    try:
+        # Convert AuxCoord to DimCoord if necessary and possible
+        ref_coord = iris.coords.DimCoord.from_coord(ref_coord)
+    except ValueError:
+        pass
+    return (_scatter_to_ref(cubes, ref_coord), ref_coord)
+
+
 def var_name_constraint(var_name):
     """:mod:`iris.Constraint` using `var_name` of an :mod:`iris.cube.Cube`.
 
@@ -1,5 +1,10 @@
 """Module that provides common plot functions."""
 
+from ._maps import (
+    get_map_template,
+    make_map_axes,
+    fast_map_plot,
+)
 from ._plot import (
     get_path_to_mpl_style,
     get_dataset_style,
@@ -9,6 +14,9 @@ from ._plot import (
 )
 
 __all__ = [
+    'get_map_template',
+    'make_map_axes',
+    'fast_map_plot',
     'get_path_to_mpl_style',
     'get_dataset_style',
     'quickplot',
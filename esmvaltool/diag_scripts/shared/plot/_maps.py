@@ -0,0 +1,221 @@
+"""Cached map templates for cartopy map plots."""
+import hashlib
+import logging
+
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+import matplotlib.pyplot as plt
+import numpy as np
+from cartopy.feature import ShapelyFeature
+from matplotlib.colors import BoundaryNorm
+
+logger = logging.getLogger(__name__)
+
+# Map templates, keyed on the name of the projection and the extent
+MAP_TEMPLATES = {}
+
+# Projected grid points, keyed on the projection and hash of the points
+PROJECTED_POINTS = {}
+
+
+def _project_feature(feature, projection, extent):
+    """Project the geometries of a feature within an extent once."""
+    if extent is None:
+        geometries = feature.geometries()
+    else:
+        geometries = feature.intersecting_geometries(extent)
+    projected = []
+    for geometry in geometries:
+        geometry = projection.project_geometry(geometry, feature.crs)
+        if not geometry.is_empty:
+            projected.append(geometry)
+    return ShapelyFeature(projected, projection)
+
+
+def get_map_template(projection='PlateCarree', extent=None):
+    """Get the (cached) projection and background features of a map.
+
+    The Natural Earth land and coastline geometries are projected only the
+    first time a template is requested for a projection and extent. The
+    features of the template are defined in the projection itself, so cartopy
+    does not project them again when they are drawn.
+
+    Parameters
+    ----------
+    projection : str, optional (default: 'PlateCarree')
+        Name of the projection in :mod:`cartopy.crs`, e.g.
+        `'NorthPolarStereo'`.
+    extent : list of float, optional
+        Extent of the map as `[lon_min, lon_max, lat_min, lat_max]`, in
+        degrees. The whole globe is used if not given.
+
+    Returns
+    -------
+    dict
+        The projection (`'projection'`), the extent (`'extent'`) and the
+        projected land (`'land'`) and coastline (`'coastlines'`) features.
+
+    """
+    if extent is not None:
+        extent = tuple(float(value) for value in extent)
+    key = (projection, extent)
+    if key not in MAP_TEMPLATES:
+        logger.debug("Creating map template for projection %s and extent %s",
+                     projection, extent)
+        crs = getattr(ccrs, projection)()
+        MAP_TEMPLATES[key] = {
+            'projection': crs,
+            'extent': extent,
+            'land': _project_feature(cfeature.LAND, crs, extent),
+            'coastlines': _project_feature(cfeature.COASTLINE, crs, extent),
+        }
+    return MAP_TEMPLATES[key]
+
+
+def make_map_axes(projection='PlateCarree',
+                  extent=None,
+                  position=111,
+                  land=None,
+                  coastlines=True):
+    """Create map axes in the current figure from a cached map template.
+
+    Parameters
+    ----------
+    projection : str, optional (default: 'PlateCarree')
+        Name of the projection in :mod:`cartopy.crs`.
+    extent : list of float, optional
+        Extent of the map as `[lon_min, lon_max, lat_min, lat_max]`, in
+        degrees.
+    position : int, optional (default: 111)
+        Subplot position of the axes.
+    land : dict, optional
+        Keyword arguments (e.g. `facecolor` and `zorder`) used to draw the
+        land. The land is not drawn if not given.
+    coastlines : bool, optional (default: True)
+        Draw the coastlines.
+
+    Returns
+    -------
+    cartopy.mpl.geoaxes.GeoAxes
+        The new map axes.
+
+    """
+    template = get_map_template(projection, extent)
+    axes = plt.subplot(position, projection=template['projection'])
+    if extent is not None:
+        axes.set_extent(extent, ccrs.PlateCarree())
+    if land is not None:
+        axes.add_feature(template['land'], **land)
+    if coastlines:
+        axes.add_feature(template['coastlines'],
+                         facecolor='none',
+                         edgecolor='black')
+    return axes
+
+
+def _get_2d_corners(coord):
+    """Get the corners of the cells of a 2D coordinate."""
+    if coord.has_bounds():
+        bounds = coord.bounds
+        corners = np.empty((bounds.shape[0] + 1, bounds.shape[1] + 1))
+        corners[:-1, :-1] = bounds[..., 0]
+        corners[:-1, -1] = bounds[:, -1, 1]
+        corners[-1, -1] = bounds[-1, -1, 2]
+        corners[-1, :-1] = bounds[-1, :, 3]
+        return corners
+
+    # Guess the corners as the mean of the neighbouring cell centres
+    points = coord.points
+    if coord.name() == 'longitude':
+        points = np.rad2deg(np.unwrap(np.deg2rad(points), axis=1))
+    for axis in (0, 1):
+        first = 2. * points.take([0], axis) - points.take([1], axis)
+        last = 2. * points.take([-1], axis) - points.take([-2], axis)
+        points = np.concatenate((first, points, last), axis=axis)
+    return 0.25 * (points[:-1, :-1] + points[1:, :-1] + points[:-1, 1:] +
+                   points[1:, 1:])
+
+
+def _get_cell_corners(cube):
+    """Get the longitudes and latitudes of the corners of all grid cells."""
+    lon = cube.coord(axis='x')
+    lat = cube.coord(axis='y')
+    if lon.ndim == 2:
+        return (_get_2d_corners(lon), _get_2d_corners(lat))
+    corners = []
+    for coord in (lon, lat):
+        if not coord.has_bounds():
+            coord = coord.copy()
+            coord.guess_bounds()
+        corners.append(coord.contiguous_bounds())
+    return np.meshgrid(*corners)
+
+
+def _get_projected_points(projection, lon, lat):
+    """Get the (cached) cell corners in the coordinates of a projection."""
+    digest = hashlib.sha1(lon.tobytes() + lat.tobytes()).hexdigest()
+    key = (projection.proj4_init, lon.shape, digest)
+    if key not in PROJECTED_POINTS:
+        points = projection.transform_points(ccrs.PlateCarree(), lon, lat)
+        x_points = points[..., 0]
+        y_points = points[..., 1]
+
+        # Grid cells which wrap around the projection or have corners outside
+        # of it cannot be drawn
+        invalid = ~(np.isfinite(x_points) & np.isfinite(y_points))
+        x_points = np.where(invalid, 0., x_points)
+        y_points = np.where(invalid, 0., y_points)
+        x_limit = 0.5 * np.ptp(projection.x_limits)
+        jumps = np.abs(np.diff(x_points, axis=-1)) > x_limit
+        wrapped = jumps[:-1] | jumps[1:]
+        wrapped |= (invalid[:-1, :-1] | invalid[:-1, 1:] | invalid[1:, :-1]
+                    | invalid[1:, 1:])
+        PROJECTED_POINTS[key] = (x_points, y_points, wrapped)
+    return PROJECTED_POINTS[key]
+
+
+def fast_map_plot(cube, levels, axes=None, cmap=None, **kwargs):
+    """Plot a 2D cube on map axes with :func:`matplotlib.pyplot.pcolormesh`.
+
+    This is a fast alternative to :func:`iris.quickplot.contourf`: the cell
+    corners are transformed to the projection of the axes once per grid, and
+    the data is drawn without any reprojection of contours. Missing bounds of
+    the coordinates are guessed. Like filled contours, the data is coloured in
+    bins given by `levels` and data outside the levels is not drawn.
+
+    Parameters
+    ----------
+    cube : iris.cube.Cube
+        Two dimensional cube with longitude and latitude coordinates.
+    levels : array-like
+        The boundaries of the colour bins.
+    axes : cartopy.mpl.geoaxes.GeoAxes, optional
+        The map axes, by default the current axes.
+    cmap : str or matplotlib.colors.Colormap, optional
+        The colour map.
+    **kwargs
+        Keyword arguments for :func:`matplotlib.pyplot.pcolormesh`.
+
+    Returns
+    -------
+    matplotlib.collections.QuadMesh
+        The plotted mesh.
+
+    """
+    if axes is None:
+        axes = plt.gca()
+    levels = np.asarray(levels)
+    lon, lat = _get_cell_corners(cube)
+    x_points, y_points, wrapped = _get_projected_points(
+        axes.projection, lon, lat)
+    data = np.ma.masked_outside(cube.data, levels[0], levels[-1])
+    data = np.ma.masked_where(wrapped, data)
+    cmap = plt.get_cmap(cmap)
+    norm = BoundaryNorm(levels, ncolors=cmap.N)
+    return axes.pcolormesh(x_points,
+                           y_points,
+                           data,
+                           cmap=cmap,
+                           norm=norm,
+                           transform=axes.projection,
+                           **kwargs)
@@ -0,0 +1,496 @@
+"""IN-MEMORY COMPUTATIONS.
+
+Module containing an in-memory version of the core computations.
+
+This module provides the same computations as the computations module for the
+energy and water mass budgets, the baroclinic efficiency and the material
+entropy production with the indirect method. Instead of chaining CDO
+operators, each of them writing an intermediate NetCDF file, the fields are
+kept in memory as lazy (dask) xarray arrays, and only the final outputs are
+written to NetCDF files. The in-memory computations are selected by setting
+the in_memory option to true in the recipe. The auxiliary fields of the
+boundary layer, otherwise computed by the mkthe module, are also provided.
+
+The functions that are here contained are:
+- baroceff: function for the baroclinic efficiency;
+- bl_fields: function for the temperature at the LCL, the temperature and
+  the height at the boundary layer top (on NumPy arrays);
+- budgets: function for the energy budgets (TOA, atmospheric, surface);
+- fldmean: function for area weighted global means (as cdo fldmean);
+- gtc: function for masking values greater than a constant (as cdo gtc);
+- indentr: function for material entropy production (indirect method);
+- landoc_budg: function for budget computations over land and oceans;
+- lat_weights: function for the area weights of a regular lonlat grid;
+- load: function for lazily loading a variable from a NetCDF file;
+- ltc: function for masking values lower than a constant (as cdo ltc);
+- mkthe_main: function for the auxiliary fields of the boundary layer;
+- setctomiss: function for setting a constant to missing (as cdo setctomiss);
+- setrtomiss: function for setting a range to missing (as cdo setrtomiss);
+- timmean: function for time averages (as cdo timmean);
+- wmbudg: function for water mass and latent energy budgets;
+- write_eb: function for writing fields and computing global mean budgets;
+- write_field: function for writing a field to a NetCDF file;
+- yearmonmean: function for annual means of monthly data (as cdo
+  yearmonmean);
+"""
+
+import numpy as np
+import xarray as xr
+
+AKAP = 0.286  # Kappa (Poisson constant R/Cp)
+ALV = 2.5008e6  # Latent heat of vaporization
+G_0 = 9.81  # Gravity acceleration
+GAS_CON = 287.0  # Gas constant
+H_S = 300.  # stable boundary layer height (m)
+H_U = 1000.  # unstable boundary layer height (m)
+L_C = 2501000  # latent heat of condensation
+LC_SUB = 2835000  # latent heat of sublimation
+P_0 = 100000.  # reference pressure
+RA_1 = 610.78  # Parameter for Magnus-Teten-Formula
+RIC_RS = 0.39  # Critical Richardson number for stable layer
+RIC_RU = 0.28  # Critical Richardson number for unstable layer
+RV = 461.51  # Gas constant for water vapour
+T_MELT = 273.15  # freezing temp.
+CHUNKS = {'time': 120}  # Size of the chunks of lazily loaded fields
+
+
+def baroceff(model, wdir, aux_file, toab_file, te_file):
+    """Compute the baroclinic efficiency of the atmosphere.
+
+    The function computes the baroclinic efficiency of the atmosphere, i.e.
+    the efficiency of the meridional heat transports from the low latitudes,
+    where there is a net energy gain, towards the high latitudes, where there
+    is a net energy loss (after Lucarini et al., 2011).
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - aux_file: the name of a dummy aux. file (not used, kept for consistency
+      with the computations module);
+    - toab_file: a file containing the annual mean TOA energy budgets
+      (time,lon,lat);
+    - te_file: a file containing the annual mean emission temperature
+      (time,lon,lat);
+    """
+    toab = load(toab_file, 'toab')
+    t_e = load(te_file, 'rlut')
+    gain = gtc(toab, 0)
+    loss = ltc(toab, 0)
+    toabgain = setrtomiss(toab * gain, -1000, 0)
+    toabloss = setrtomiss(toab * loss, 0, 1000)
+    tegain = setrtomiss(t_e * gain, -1000, 0)
+    teloss = setrtomiss(t_e * loss, -1000, 0)
+    tegainm = fldmean(toabgain) / fldmean(toabgain / tegain)
+    telossm = fldmean(toabloss) / fldmean(toabloss / teloss)
+    baroc_eff = ((1 / telossm - 1 / tegainm) /
+                 (0.5 * (1 / tegainm + 1 / telossm)))
+    baroceff_file = wdir + '/{}_barocEff.nc'.format(model)
+    write_field(baroc_eff, 'toab', baroceff_file)
+    return float(baroc_eff[0])
+
+
+def bl_fields(hfss, hus, p_s, t_e, t_s, vv_hor, lev):
+    """Compute the auxiliary fields of the boundary layer.
+
+    The function evaluates the same expressions as mkthe.mkthe_main, on a
+    block of NumPy arrays, and is applied to each chunk of the lazily loaded
+    fields by mkthe_main, so that the temporary arrays have the size of a
+    chunk. Missing values are given as NaN.
+
+    Arguments:
+    - hfss, p_s, t_e, t_s, vv_hor: the sensible heat fluxes, the surface
+      pressure, the emission temperature, the skin temperature and the
+      near-surface wind speed (same shape);
+    - hus: the specific humidity, with the pressure levels as last dimension;
+    - lev: the pressure levels;
+    """
+    huss = np.where(lev[0] >= p_s, hus[..., 0], 0.)
+    for l_l, plev in enumerate(lev):
+        huss = huss + np.where(p_s >= plev, hus[..., l_l], 0.)
+    ricr = np.where(hfss >= 0.75, RIC_RU, RIC_RS)
+    h_bl = np.where(hfss >= 0.75, H_U, H_S)
+    ev_p = huss * p_s / (huss + GAS_CON / RV)  # Water vapour pressure
+    t_d = 1 / ((1 / T_MELT) - (RV / ALV) * np.log(ev_p / RA_1))  # Dewpoint t.
+    hlcl = 125. * (t_s - t_d)  # Empirical formula for LCL height
+    hlcl = np.where(hlcl >= 0., hlcl, h_bl)
+    cp_d = GAS_CON / AKAP
+    ztlcl = t_s - (G_0 / cp_d) * hlcl
+    gw_pa = (G_0 / cp_d) * (1 + ((ALV * huss) / (GAS_CON * ztlcl)) / (1 + (
+        (ALV**2 * huss * 0.622) / (cp_d * GAS_CON * ztlcl**2))))
+    htop = -(t_e - ztlcl) / gw_pa + hlcl
+    ths = t_s * (P_0 / p_s)**AKAP
+    thz = ths + 0.03 * ricr * (vv_hor)**2 / h_bl
+    p_z = p_s * np.exp((-G_0 * h_bl) / (GAS_CON * t_s))  # Barometric eq.
+    t_z = thz * (P_0 / p_z)**(-AKAP)
+    return ztlcl, t_z, htop
+
+
+def _stack_bl_fields(*args, lev):
+    """Compute the auxiliary fields of the boundary layer as one array."""
+    return np.stack(bl_fields(*args, lev=lev), axis=-1)
+
+
+def budgets(model, wdir, aux_file, filelist):
+    """Compute radiative budgets from radiative and heat fluxes.
+
+    The function computes TOA and surface energy budgets from radiative and
+    heat fluxes, then writes the annual mean to the log info file and write
+    the (lat,lon) annual mean fields to a NetCDF file, as well as the time
+    series of the annual mean globally averaged fields.
+
+    toab = rsdt - rsut - rlut
+    surb = rsds + rlds - rsus - rlus - hfls - hfss
+    atmb = toab - atmb
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - aux_file: the name of a dummy aux. file (not used, kept for consistency
+      with the computations module);
+    - filelist: a list of file names containing the input fields;
+    """
+    hfls = load(filelist[0], 'hfls')
+    hfss = load(filelist[1], 'hfss')
+    rlds = load(filelist[6], 'rlds')
+    rlus = load(filelist[7], 'rlus')
+    rlut = load(filelist[8], 'rlut')
+    rsds = load(filelist[9], 'rsds')
+    rsdt = load(filelist[10], 'rsdt')
+    rsus = load(filelist[11], 'rsus')
+    rsut = load(filelist[12], 'rsut')
+    toab_file = wdir + '/{}_toab.nc'.format(model)
+    surb_file = wdir + '/{}_surb.nc'.format(model)
+    atmb_file = wdir + '/{}_atmb.nc'.format(model)
+    toab = rsdt - rsut - rlut
+    toab_gmean = write_eb(toab, 'toab', toab_file, rsdt.attrs)
+    toab_ymm_file = wdir + '/{}_toab_ymm.nc'.format(model)
+    write_field(yearmonmean(toab), 'toab', toab_ymm_file, rsdt.attrs)
+    # Surface energy budget
+    surb = rsds + rlds - rsus - rlus - hfls - hfss
+    surb_gmean = write_eb(surb, 'surb', surb_file, rsds.attrs)
+    # Atmospheric energy budget
+    atmb = toab - surb
+    atmb_gmean = write_eb(atmb, 'atmb', atmb_file, rsdt.attrs)
+    eb_gmean = [toab_gmean, atmb_gmean, surb_gmean]
+    eb_file = [toab_file, atmb_file, surb_file]
+    return eb_gmean, eb_file, toab_ymm_file
+
+
+def fldmean(data):
+    """Compute the area weighted global mean of a field.
+
+    Missing values are excluded from the average, as in cdo fldmean.
+
+    Arguments:
+    - data: a field with dimensions (...,lat,lon);
+    """
+    weights = lat_weights(data['lat'])
+    valid_weights = weights.where(data.notnull())
+    return ((data * weights).sum(('lat', 'lon')) /
+            valid_weights.sum(('lat', 'lon')))
+
+
+def gtc(data, const):
+    """Return 1 where a field is greater than a constant, 0 elsewhere.
+
+    Arguments:
+    - data: the input field;
+    - const: the constant;
+    """
+    return (data > const).astype(data.dtype).where(data.notnull())
+
+
+def indentr(model, wdir, infile, aux_file, toab_gmean):
+    """Compute the material entropy production with the indirect method.
+
+    The function computes the material entropy production with the indirect
+    method, isolating a vertical and a horizontal component
+    (after Lucarini et al., 2011). The outputs are stored in terms of global
+    mean time series, and in terms of (lat,lon) fields for each year to a NC
+    file.
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - infile: a list of files, containing each the fields rlds, rlus, rsds,
+      rsus, emission temperature (te), TOA energy budget (toab) and ts;
+    - aux_file: the name of a dummy aux. file (not used, kept for consistency
+      with the computations module);
+    - toab_gmean: the climatological annaul mean TOA energy budget;
+    """
+    rlds = load(infile[0], 'rlds')
+    rlus = load(infile[1], 'rlus')
+    rsds = load(infile[2], 'rsds')
+    rsus = load(infile[3], 'rsus')
+    t_e = load(infile[4], 'rlut')
+    toab = load(infile[5], 'toab')
+    t_s = load(infile[6], 'ts')
+    horzentropy_file = wdir + '/{}_horizEntropy.nc'.format(model)
+    vertentropy_file = wdir + '/{}_verticalEntropy.nc'.format(model)
+    horzentr = yearmonmean(-1 * (toab - np.nanmean(toab_gmean)) / t_e)
+    horzentr_mean = write_eb(horzentr, 'shor', horzentropy_file, toab.attrs)
+    vertenergy = yearmonmean(rlds + (rsds - (rlus + rsus)))
+    vertentr = vertenergy * (yearmonmean(1 / t_e) - yearmonmean(1 / t_s))
+    vertentr_mean = write_eb(vertentr, 'sver', vertentropy_file, rlds.attrs)
+    return horzentr_mean, vertentr_mean, horzentropy_file, vertentropy_file
+
+
+def landoc_budg(model, wdir, infile, mask, name):
+    """Compute budgets separately on land and oceans.
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - infile: the file containing the original budget field as (time,lat,lon);
+    - mask: the file containing the land-sea mask;
+    - name: the variable name as in the input file;
+    """
+    data = load(infile, name)
+    with xr.open_dataset(mask) as dataset:
+        sftlf = dataset['sftlf'].values
+    ocean = data * (sftlf == 0)
+    oc_gmean = float(timmean(fldmean(ocean)))
+    land = setctomiss(data - ocean, 0)
+    la_gmean = float(timmean(fldmean(land)))
+    return oc_gmean, la_gmean
+
+
+def lat_weights(lat):
+    """Compute the area weights of the latitudes of a regular lonlat grid.
+
+    The cell boundaries are placed halfway between the latitudes and limited
+    to the poles, as done by CDO when no bounds are provided.
+
+    Arguments:
+    - lat: the latitude coordinate (in degrees);
+    """
+    lat_rad = np.deg2rad(lat.values)
+    pole = np.pi / 2 * (1 if lat_rad[-1] >= lat_rad[0] else -1)
+    bounds = np.concatenate(([-pole], 0.5 * (lat_rad[1:] + lat_rad[:-1]),
+                             [pole]))
+    weights = np.abs(np.sin(bounds[1:]) - np.sin(bounds[:-1]))
+    return xr.DataArray(weights, coords={'lat': lat}, dims=('lat', ))
+
+
+def load(filename, varname):
+    """Lazily load a variable from a NetCDF file.
+
+    The file is closed again, it is reopened when the data are computed.
+
+    Arguments:
+    - filename: the name of the file;
+    - varname: the name of the variable;
+    """
+    with xr.open_dataset(filename, chunks=CHUNKS) as dataset:
+        return dataset[varname]
+
+
+def ltc(data, const):
+    """Return 1 where a field is lower than a constant, 0 elsewhere.
+
+    Arguments:
+    - data: the input field;
+    - const: the constant;
+    """
+    return (data < const).astype(data.dtype).where(data.notnull())
+
+
+def mkthe_main(wdir, file_list, modelname):
+    """Compute the auxiliary variables for the Thermodynamic diagnostic tool.
+
+    The fields are lazily loaded in chunks of timesteps, the expressions of
+    bl_fields are evaluated chunk by chunk and the three outputs are written
+    in a single pass through the input files, so that the memory usage does
+    not depend on the length of the time series.
+
+    Arguments:
+    - wdir: the working directory path;
+    - file_list: the list of file containing ts, hus,
+    ps, uas, vas, hfss, te;
+    - modelname: the name of the model from which the fields are;
+    """
+    t_s = setctomiss(load(file_list[0], 'ts'), 0)
+    hus = setctomiss(load(file_list[1], 'hus'), 0)
+    p_s = setctomiss(load(file_list[2], 'ps'), 0)
+    uas = load(file_list[3], 'uas')
+    vas = load(file_list[4], 'vas')
+    vv_hor = setctomiss(np.sqrt(uas**2 + vas**2).astype(np.float32), 0)
+    hfss = setctomiss(load(file_list[5], 'hfss'), 0)
+    t_e = setctomiss(load(file_list[6], 'rlut'), 0)
+    # Fields are combined by position, as the time axes of the monthly means
+    # may differ from those of the original fields
+    hus, p_s, vv_hor, hfss, t_e = [
+        override_coords(data, t_s) for data in (hus, p_s, vv_hor, hfss, t_e)
+    ]
+    # The three outputs are stacked along a new dimension, so that they are
+    # computed in a single pass with a single-output function
+    stacked = xr.apply_ufunc(
+        _stack_bl_fields,
+        hfss,
+        hus,
+        p_s,
+        t_e,
+        t_s,
+        vv_hor,
+        input_core_dims=[[], ['plev'], [], [], [], []],
+        output_core_dims=[['bl_field']],
+        kwargs={'lev': hus['plev'].values},
+        dask='parallelized',
+        output_dtypes=[np.float64],
+        output_sizes={'bl_field': 3})
+    outlist = [stacked.isel(bl_field=i) for i in range(3)]
+    attrs = [{
+        'long_name': "LCL Temperature",
+        'units': "K",
+        'var_desc': ("LCL temperature from LCL height (Magnus formulas and "
+                     "dry adiabatic lapse ratio)")
+    }, {
+        'long_name': "Temperature at BL top",
+        'units': "K",
+        'var_desc': ("Temperature at the Boundary Layer top, from boundary "
+                     "layer thickness and barometric equation")
+    }, {
+        'long_name': "Height at BL top",
+        'units': "m",
+        'var_desc': ("Height at the Boundary Layer top, from boundary layer "
+                     "thickness and barometric equation")
+    }]
+    names = ['tlcl', 'tabl', 'htop']
+    rmax = [400, 400, 12000]
+    datasets = []
+    for data, name, attr, r_m in zip(outlist, names, attrs, rmax):
+        data = setrtomiss(data, r_m, 1e36).rename(name)
+        data.attrs = dict(attr, level_desc="surface", statistic='monthly mean')
+        datasets.append(data.to_dataset())
+    tlcl_file, tabl_file, htop_file = [
+        wdir + '/{}_{}.nc'.format(modelname, name) for name in names
+    ]
+    xr.save_mfdataset(datasets, [tlcl_file, tabl_file, htop_file])
+    return htop_file, tabl_file, tlcl_file
+
+
+def override_coords(data, ref):
+    """Replace the coordinates of a field by those of a reference field.
+
+    The coordinates of the dimensions shared with the reference are replaced
+    by position, so the sizes of these dimensions must be equal.
+
+    Arguments:
+    - data: the input field;
+    - ref: the reference field;
+    """
+    return data.assign_coords(
+        **{dim: ref[dim].values
+           for dim in ref.dims if dim in data.dims})
+
+
+def setctomiss(data, const):
+    """Set values equal to a constant to missing.
+
+    Arguments:
+    - data: the input field;
+    - const: the constant;
+    """
+    return data.where(data != const)
+
+
+def setrtomiss(data, rmin, rmax):
+    """Set values in the range [rmin, rmax] to missing.
+
+    Arguments:
+    - data: the input field;
+    - rmin: the lower bound of the range;
+    - rmax: the upper bound of the range;
+    """
+    return data.where((data < rmin) | (data > rmax))
+
+
+def timmean(data):
+    """Compute the time average of a field.
+
+    Arguments:
+    - data: the input field;
+    """
+    return data.mean('time')
+
+
+def wmbudg(model, wdir, aux_file, filelist, auxlist):
+    """Compute the water mass and latent energy budgets.
+
+    This function computes the annual mean water mass and latent energy budgets
+    from the evaporation and rainfall/snowfall precipitation fluxes and prints
+    them to a NetCDF file.
+    The globally averaged annual mean budgets are also provided and saved to
+    a NetCDF file.
+
+    Arguments:
+    - model: the model name;
+    - wdir: the working directory where the outputs are stored;
+    - aux_file: the name of a dummy aux. file (not used, kept for consistency
+      with the computations module);
+    - filelist: a list of file names containing the input fields;
+    - auxlist: a list of auxiliary files, containing the evaporation (first)
+      and the rainfall precipitation (third), as in the computations module;
+    """
+    hfls = load(filelist[0], 'hfls')
+    p_r = load(filelist[3], 'pr')
+    prsn = load(filelist[4], 'prsn')
+    evspsbl = load(auxlist[0], 'hfls')
+    prr = load(auxlist[2], 'prr')
+    wmbudg_file = wdir + '/{}_wmb.nc'.format(model)
+    latene_file = wdir + '/{}_latent.nc'.format(model)
+    wmass_gmean = write_eb(evspsbl - p_r, 'wmb', wmbudg_file, hfls.attrs)
+    latent = hfls - (LC_SUB * prsn + L_C * prr)
+    latent_gmean = write_eb(latent, 'latent', latene_file, hfls.attrs)
+    varlist = [wmass_gmean, latent_gmean]
+    filelist = [wmbudg_file, latene_file]
+    return varlist, filelist
+
+
+def write_eb(data, nameout, d3_file, attrs=None):
+    """Write a field to file and compute its annual global averages.
+
+    Arguments:
+    - data: the (time,lat,lon) field;
+    - nameout: the name of the variable;
+    - d3_file: the name of the file where the field is stored;
+    - attrs: the attributes of the variable;
+    """
+    write_field(data, nameout, d3_file, attrs)
+    return fldmean(yearmonmean(data)).values
+
+
+def write_field(data, name, filename, attrs=None):
+    """Write a field to a NetCDF file with single precision.
+
+    Arguments:
+    - data: the field;
+    - name: the name of the variable;
+    - filename: the name of the file;
+    - attrs: the attributes of the variable;
+    """
+    data = data.rename(name)
+    if attrs is not None:
+        data.attrs = {
+            key: value
+            for key, value in attrs.items() if key != 'standard_name'
+        }
+    data.to_netcdf(filename, encoding={name: {'dtype': 'float32'}})
+
+
+def yearmonmean(data):
+    """Compute annual means of monthly data, weighted by days per month.
+
+    Missing values are excluded from the average, as in cdo yearmonmean. The
+    time coordinate of the output is the first timestep of each year.
+
+    Arguments:
+    - data: the input field with a time dimension;
+    """
+    days = data['time'].dt.days_in_month.astype(data.dtype)
+    valid_days = days.where(data.notnull())
+    annual = ((data * days).groupby('time.year').sum('time') /
+              valid_days.groupby('time.year').sum('time'))
+    times = data['time'].groupby('time.year').first()
+    annual = annual.rename({'year': 'time'})
+    return annual.assign_coords(time=times.values)
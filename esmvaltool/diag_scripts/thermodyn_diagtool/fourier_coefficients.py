@@ -8,6 +8,9 @@ gridsteps. The outputs are given as (time,level,wave,lat) where wave stands
 for the zonal wavenumber. In the context of the thermodynamic diagnostic tool,
 this is used for the computation of the Lorenz Energy Cycle.
 
+The fields can be processed in blocks of timesteps, which are written
+incrementally to the output files, in order to limit the memory usage.
+
 @author: valerio.lembo@uni-hamburg.de, Valerio Lembo, Hamburg University, 2018.
 """
 
@@ -22,37 +25,92 @@ GAS_CON = 287.0  # Gas constant
 P_0 = 10000  # Reference tropospheric pressure
 
 
-def fourier_coeff(tadiagfile, outfile, ta_input, tas_input):
+def fourier_coeff(tadiagfile,
+                  outfile,
+                  ta_input,
+                  tas_input,
+                  ntime_chunk=None,
+                  dtype='f8'):
     """Compute Fourier coefficients in lon direction.
 
+    The input fields are processed in blocks of ntime_chunk timesteps, which
+    are written to the output files one after the other, so that the memory
+    usage is determined by the size of the blocks.
+
     Receive as input:
     - tadiagfile: the name of a file to store modified t fields;
     - outfile: the name of a file to store the Fourier coefficients;
     - ta_input: the name of a file containing t,u,v,w fields;
-    - tas_input: the name of a file containing t2m field.
+    - tas_input: the name of a file containing t2m field;
+    - ntime_chunk: the number of timesteps processed at once (all timesteps
+      if None);
+    - dtype: the floating point type used for computations and outputs
+      ('f8' or 'f4').
     """
     with Dataset(ta_input) as dataset:
-        lon = dataset.variables['lon'][:]
-        lat = dataset.variables['lat'][:]
-        lev = dataset.variables['plev'][:]
-        time = dataset.variables['time'][:]
-        t_a = dataset.variables['ta'][:, :, :, :]
-        u_a = dataset.variables['ua'][:, :, :, :]
-        v_a = dataset.variables['va'][:, :, :, :]
-        wap = dataset.variables['wap'][:, :, :, :]
-    nlon = len(lon)
-    nlat = len(lat)
-    nlev = len(lev)
-    ntime = len(time)
+        nlon = len(dataset.variables['lon'])
+        nlat = len(dataset.variables['lat'])
+        lev = np.array(dataset.variables['plev'][:], dtype=dtype)
+        ntime = len(dataset.variables['time'])
     i = np.min(np.where(2 * nlat <= GP_RES))
     trunc = FC_RES[i] + 1
     wave2 = np.linspace(0, trunc - 1, trunc)
-    with Dataset(tas_input) as dataset:
-        tas = dataset.variables['tas'][:, :, :]
-    tas = tas[:, ::-1, :]
+    if ntime_chunk is None:
+        ntime_chunk = ntime
+    pr_output_diag(ta_input, tadiagfile, 'ta', dtype)
+    pr_output(['ta', 'ua', 'va', 'wap'], ta_input, outfile,
+              'Fourier coefficients', wave2, dtype)
+    with Dataset(ta_input) as in_fid, Dataset(tas_input) as tas_fid, \
+            Dataset(tadiagfile, 'a') as diag_fid, \
+            Dataset(outfile, 'a') as out_fid:
+        for t_0 in range(0, ntime, ntime_chunk):
+            t_t = slice(t_0, min(t_0 + ntime_chunk, ntime))
+            tas = tas_fid.variables['tas'][t_t, :, :][:, ::-1, :].astype(dtype)
+            t_a = in_fid.variables['ta'][t_t, :, :, :].astype(dtype)
+            t_a = fill_ta(t_a, tas, lev)
+            diag_fid.variables['ta'][t_t, :, :, :] = t_a
+            for key in ['ta', 'ua', 'va', 'wap']:
+                if key != 'ta':
+                    t_a = in_fid.variables[key][t_t, :, :, :].astype(dtype)
+                out_fid.variables[key][t_t, :, :, :] = fourier(
+                    t_a, nlon, trunc, dtype)
+
+
+def fourier(fld, nlon, trunc, dtype):
+    """Compute the truncated Fourier coefficients of a field in lon direction.
+
+    Real and imaginary parts of the coefficients are stored alternately
+    along the last dimension.
+
+    Arguments:
+    - fld: the field, with shape (time,level,lat,lon);
+    - nlon: the number of longitudes;
+    - trunc: the spectral truncation;
+    - dtype: the floating point type of the coefficients.
+    """
+    fft_p = np.fft.rfft(fld, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
+    fft_c = np.zeros(np.shape(fld)[:3] + (trunc, ), dtype=dtype)
+    fft_c[:, :, :, 0::2] = np.real(fft_p)
+    fft_c[:, :, :, 1::2] = np.imag(fft_p)
+    return fft_c
+
+
+def fill_ta(t_a, tas, lev):
+    """Fill the temperature field below the surface.
+
+    Temperatures are extrapolated from the near-surface temperature using
+    the standard atmosphere lapse rate where the field is set to 0.
+
+    Arguments:
+    - t_a: the temperature field, with shape (time,level,lat,lon);
+    - tas: the near-surface temperature field, with shape (time,lat,lon);
+    - lev: the pressure levels.
+    """
+    ntime, nlev, nlat, nlon = np.shape(t_a)
+    dtype = t_a.dtype
     ta1_fx = np.array(t_a)
-    deltat = np.zeros([ntime, nlev, nlat, nlon])
-    p_s = np.full([ntime, nlat, nlon], P_0)
+    deltat = np.zeros([ntime, nlev, nlat, nlon], dtype=dtype)
+    p_s = np.full([ntime, nlat, nlon], P_0, dtype=dtype)
     for i in np.arange(nlev - 1, 0, -1):
         h_1 = np.ma.masked_where(ta1_fx[:, i, :, :] != 0, ta1_fx[:, i, :, :])
         if np.any(h_1.mask > 0):
@@ -75,58 +133,32 @@ def fourier_coeff(tadiagfile, outfile, ta_input, tas_input):
                              (GAM * GAS_CON)) * deltat[:, i - 1, :, :] / tas)
                     p_s = np.where(ta1_fx[:, i + k, :, :] != 0, p_s,
                                    lev[i + k] + d_p)
-    ta2_fx = np.array(t_a)
-    mask = np.zeros([nlev, ntime, nlat, nlon])
-    dat = np.zeros([nlev, ntime, nlat, nlon])
-    tafr_bar = np.zeros([nlev, ntime, nlat, nlon])
-    deltap = np.zeros([ntime, nlev, nlat, nlon])
     for i in np.arange(nlev):
-        deltap[:, i, :, :] = p_s - lev[i]
-        h_2 = np.ma.masked_where(ta2_fx[:, i, :, :] == 0, ta2_fx[:, i, :, :])
-        mask[i, :, :, :] = np.array(h_2.mask)
-        tafr_bar[i, :, :, :] = (1 * np.array(mask[i, :, :, :]) * (
-            tas - GAM * GAS_CON / (G_0 * p_s) * deltap[:, i, :, :] * tas))
-        dat[i, :, :, :] = (
-            ta2_fx[:, i, :, :] * (1 - 1 * np.array(mask[i, :, :, :])))
-        t_a[:, i, :, :] = dat[i, :, :, :] + tafr_bar[i, :, :, :]
-    pr_output_diag(t_a, ta_input, tadiagfile, 'ta')
-    tafft_p = np.fft.fft(t_a, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    uafft_p = np.fft.fft(u_a, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    vafft_p = np.fft.fft(v_a, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    wapfft_p = np.fft.fft(wap, axis=3)[:, :, :, :int(trunc / 2)] / (nlon)
-    tafft = np.zeros([ntime, nlev, nlat, trunc])
-    uafft = np.zeros([ntime, nlev, nlat, trunc])
-    vafft = np.zeros([ntime, nlev, nlat, trunc])
-    wapfft = np.zeros([ntime, nlev, nlat, trunc])
-    tafft[:, :, :, 0::2] = np.real(tafft_p)
-    tafft[:, :, :, 1::2] = np.imag(tafft_p)
-    uafft[:, :, :, 0::2] = np.real(uafft_p)
-    uafft[:, :, :, 1::2] = np.imag(uafft_p)
-    vafft[:, :, :, 0::2] = np.real(vafft_p)
-    vafft[:, :, :, 1::2] = np.imag(vafft_p)
-    wapfft[:, :, :, 0::2] = np.real(wapfft_p)
-    wapfft[:, :, :, 1::2] = np.imag(wapfft_p)
-    dict_v = {'ta': tafft, 'ua': uafft, 'va': vafft, 'wap': wapfft}
-    file_desc = 'Fourier coefficients'
-    pr_output(dict_v, ta_input, outfile, file_desc, wave2)
-
-
-def pr_output(dict_v, nc_f, fileo, file_desc, wave2):
-    """Print outputs to NetCDF.
-
-    Save fields to NetCDF, retrieving information from an existing
+        deltap = p_s - lev[i]
+        mask = np.array(ta1_fx[:, i, :, :] == 0)
+        tafr_bar = (1 * mask * (
+            tas - GAM * GAS_CON / (G_0 * p_s) * deltap * tas))
+        dat = ta1_fx[:, i, :, :] * (1 - 1 * mask)
+        t_a[:, i, :, :] = dat + tafr_bar
+    return t_a
+
+
+def pr_output(varnames, nc_f, fileo, file_desc, wave2, dtype='f8'):
+    """Prepare the NetCDF output file for the Fourier coefficients.
+
+    Create a NetCDF file, retrieving information from an existing
     NetCDF file. Metadata are transferred from the existing file to the
-    new one.
+    new one. The fields are written afterwards.
     Arguments:
-        - var1, var2, var3, var4: the fields to be stored, with shape
+        - varnames: the names of the variables to be stored, with shape
           (time,level,wave,lon);
         - nc_f: the existing dataset, from where the metadata are
           retrieved. Coordinates time,level and lon have to be the same
           dimension as the fields to be saved to the new files;
         - fileo: the name of the output file;
+        - file_desc: the description of the output file;
         - wave2: an array containing the zonal wavenumbers;
-        - name1, name2, name3, name4: the name of the variables to be
-          saved;
+        - dtype: the floating point type of the variables;
 
     PROGRAMMER(S)
         Chris Slocum (2014), modified by Valerio Lembo (2018).
@@ -143,27 +175,26 @@ def pr_output(dict_v, nc_f, fileo, file_desc, wave2):
             var_nc_fid.createVariable('wave', nc_fid.variables['plev'].dtype,
                                       ('wave', ))
         var_nc_fid.variables['wave'][:] = wave2
-        for key in dict_v:
-            value = dict_v[key]
+        for key in varnames:
             var1_nc_var = var_nc_fid.createVariable(
-                key, 'f8', ('time', 'plev', 'lat', 'wave'))
+                key, dtype, ('time', 'plev', 'lat', 'wave'))
             varatts(var1_nc_var, key)
-            var_nc_fid.variables[key][:, :, :, :] = value
 
 
-def pr_output_diag(var1, nc_f, fileo, name1):
-    """Print processed ta field to NetCDF file.
+def pr_output_diag(nc_f, fileo, name1, dtype='f8'):
+    """Prepare the NetCDF output file for the processed ta field.
 
-    Save fields to NetCDF, retrieving information from an existing
+    Create a NetCDF file, retrieving information from an existing
     NetCDF file. Metadata are transferred from the existing file to the
-    new one.
+    new one. The field is written afterwards.
     Arguments:
-        - var1: the field to be stored, with shape (time,level,lat,lon);
         - nc_f: the existing dataset, from where the metadata are
           retrieved. Coordinates time,level, lat and lon have to be the
           same dimension as the fields to be saved to the new files;
         - fileo: the name of the output file;
-        - name1: the name of the variable to be saved;
+        - name1: the name of the variable to be saved, with shape
+          (time,level,lat,lon);
+        - dtype: the floating point type of the variable;
 
     PROGRAMMER(S)
         Chris Slocum (2014), modified by Valerio Lembo (2018).
@@ -176,11 +207,9 @@ def pr_output_diag(var1, nc_f, fileo, name1):
             extr_lat(nc_fid, var_nc_fid, 'lat')
             extr_lon(nc_fid, var_nc_fid)
             extr_plev(nc_fid, var_nc_fid)
-        var1_nc_var = var_nc_fid.createVariable(name1, 'f8',
+        var1_nc_var = var_nc_fid.createVariable(name1, dtype,
                                                 ('time', 'plev', 'lat', 'lon'))
         varatts(var1_nc_var, name1)
-        var_nc_fid.variables[name1][:, :, :, :] = var1
-        var_nc_fid.close()  # close the new file
 
 
 def extr_lat(nc_fid, var_nc_fid, latn):
@@ -9,6 +9,7 @@ The module contains the following functions:
     - averages_comp: a script computing global mean of the output fields;
     - bsslzr: it contains the coefficients for the conversion from regular
               lonlat grid to Gaussian grid;
+    - delta: computes centered (one-sided at the boundaries) differences;
     - diagram: it is the interface between the main program and a
                class "Fluxogram", producing the flux diagram;
     - gauaw: it uses the coefficients provided in bsslzr for the lonlat to
@@ -16,8 +17,13 @@ The module contains the following functions:
     - globall_cg: it computes the global and hemispheric means at each
                   timestep;
     - init: initializes the table and ingests input fields;
+    - lec_terms: computes the reservoirs and conversion terms at each
+                 timestep;
+    - lec_year: computes the LEC for one year in a dedicated scratch
+                directory;
     - makek: computes the KE reservoirs;
     - makea: computes the APE reservoirs;
+    - map_years: applies a function to each year, in parallel if required;
     - mka2k: computes the APE->KE conversion terms;
     - mkaeaz: computes the zonal APE - eddy APE conversion terms;
     - mkkekz: computes the zonal KE - eddy KE conversion terms;
@@ -37,6 +43,7 @@ The module contains the following functions:
     - table_conv: prints the global and hemispheric mean values of the
                   conversion terms;
     - varatts: prints the attributes of a variable in a Nc file;
+    - vert_deriv: computes vertical derivatives on pressure levels;
     - weights: computes the weights for vertical integrations and meridional
                averages;
     - write_to_tab: a script for writing global and hemispheric means to table;
@@ -48,9 +55,13 @@ References.
 @author: valerio.lembo@uni-hamburg.de, Valerio Lembo, Hamburg University, 2018.
 """
 
+import logging
 import math
+import multiprocessing
 import os
 import sys
+import tempfile
+
 import numpy as np
 from cdo import Cdo
 from netCDF4 import Dataset
@@ -65,6 +76,9 @@ PS = 101100.0
 NW_1 = 3
 NW_2 = 9
 NW_3 = 21
+NTIME_CHUNK = 50
+
+logger = logging.getLogger(os.path.basename(__file__))
 
 
 def lorenz(outpath, model, year, filenc, plotfile, logfile):
@@ -83,55 +97,21 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
     """
     ta_c, ua_c, va_c, wap_c, dims, lev, lat, log = init(logfile, filenc)
     nlev = int(dims[0])
-    ntime = int(dims[1])
     nlat = int(dims[2])
     ntp = int(dims[3])
     d_s, y_l, g_w = weights(lev, nlev, lat)
     # Compute time mean
     ta_tmn = np.nanmean(ta_c, axis=1)
-    ta_ztmn, ta_gmn = averages(ta_tmn, g_w)
+    _, ta_gmn = averages(ta_tmn, g_w)
     ua_tmn = np.nanmean(ua_c, axis=1)
     va_tmn = np.nanmean(va_c, axis=1)
     wap_tmn = np.nanmean(wap_c, axis=1)
     _, wap_gmn = averages(wap_tmn, g_w)
     # Compute stability parameter
-    gam_ztmn = np.zeros([nlev, nlat])
-    for l_l in range(nlat):
-        gam_ztmn[:, l_l] = stabil(ta_ztmn[:, l_l], lev, nlev)
     gam_tmn = stabil(ta_gmn, lev, nlev)
-    e_k = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ape = np.zeros([nlev, ntime, nlat, ntp - 1])
-    a2k = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ae2az = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ke2kz = np.zeros([nlev, ntime, nlat, ntp - 1])
-    at2as = np.zeros([nlev, ntime, nlat, ntp - 1])
-    kt2ks = np.zeros([nlev, ntime, nlat, ntp - 1])
-    for t_t in range(ntime):
-        ta_tan = ta_c[:, t_t, :, :] - ta_tmn
-        ua_tan = ua_c[:, t_t, :, :] - ua_tmn
-        va_tan = va_c[:, t_t, :, :] - va_tmn
-        wap_tan = wap_c[:, t_t, :, :] - wap_tmn
-        # Compute zonal means
-        _, ta_tgan = averages(ta_tan, g_w)
-        _, wap_tgan = averages(wap_tan, g_w)
-        # Compute kinetic energy
-        e_k[:, t_t, :, :] = makek(ua_tan, va_tan)
-        # Compute available potential energy
-        ape[:, t_t, :, :] = makea(ta_tan, ta_tgan, gam_tmn)
-        # Compute conversion between kin.en. and pot.en.
-        a2k[:, t_t, :, :] = mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan, lev)
-        # Compute conversion between zonal and eddy APE
-        ae2az[:, t_t, :, :] = mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn, ta_gmn,
-                                     lev, y_l, gam_tmn, nlat, nlev)
-        # Compute conversion between zonal and eddy KE
-        ke2kz[:, t_t, :, :] = mkkekz(ua_tan, va_tan, wap_tan, ua_tmn, va_tmn,
-                                     lev, y_l, nlat, ntp, nlev)
-        # Compute conversion between stationary and transient eddy APE
-        at2as[:, t_t, :, :] = mkatas(ua_tan, va_tan, wap_tan, ta_tan, ta_ztmn,
-                                     gam_ztmn, lev, y_l, nlat, ntp, nlev)
-        # Compute conversion between stationary and transient eddy KE
-        kt2ks[:, t_t, :, :] = mkktks(ua_tan, va_tan, ua_tmn, va_tmn, y_l, nlat,
-                                     ntp, nlev)
+    e_k, ape, a2k, ae2az, ke2kz, at2as, kt2ks = lec_terms(
+        [ta_c, ua_c, va_c, wap_c], [ta_tmn, ua_tmn, va_tmn, wap_tmn], lev, y_l,
+        g_w)
     ek_tgmn = averages_comp(e_k, g_w, d_s, dims)
     table(ek_tgmn, ntp, 'TOT. KIN. EN.    ', logfile, flag=0)
     ape_tgmn = averages_comp(ape, g_w, d_s, dims)
@@ -186,11 +166,12 @@ def averages(x_c, g_w):
     """Compute time, zonal and global mean averages of initial fields.
 
     Arguments:
-    - x_c: the input field as (lev, lat, wave);
+    - x_c: the input field as (lev, lat, wave), optionally with additional
+      leading dimensions (e.g. time);
     - g_w: the Gaussian weights for meridional averaging;
     """
-    xc_ztmn = np.squeeze(np.real(x_c[:, :, 0]))
-    xc_gmn = np.nansum(xc_ztmn * g_w[np.newaxis, :], axis=1) / np.nansum(g_w)
+    xc_ztmn = np.real(x_c[..., 0])
+    xc_gmn = np.nansum(xc_ztmn * g_w[np.newaxis, :], axis=-1) / np.nansum(g_w)
     return xc_ztmn, xc_gmn
 
 
@@ -238,6 +219,23 @@ def bsslzr(kdim):
     return pbes
 
 
+def delta(fld, axis=0):
+    """Compute centered differences along an axis.
+
+    One-sided differences are used at the boundaries.
+
+    Arguments:
+    - fld: the input field;
+    - axis: the axis along which the differences are computed;
+    """
+    fld = np.moveaxis(fld, axis, 0)
+    dfld = np.empty(fld.shape, dtype=fld.dtype)
+    dfld[0] = fld[1] - fld[0]
+    dfld[-1] = fld[-1] - fld[-2]
+    dfld[1:-1] = fld[2:] - fld[:-2]
+    return np.moveaxis(dfld, 0, axis)
+
+
 def diagram(filen, listf, dims):
     """Diagram interface script.
 
@@ -468,18 +466,119 @@ def init(logfile, filep):
     return ta_c, ua_c, va_c, wap_c, dims, lev, lat, log
 
 
+def lec_year(model, y_ro, wdir, ldir, energy3_file, tas_file):
+    """Compute the LEC for one year of data.
+
+    The temporary files for the year are stored in a dedicated scratch
+    directory, so that several years can be processed at the same time. The
+    directory is removed afterwards, also if the computation fails.
+
+    Arguments:
+    - model: the model name;
+    - y_ro: the year that is considered;
+    - wdir: the working directory where the outputs are stored;
+    - ldir: the directory where tables and flux diagrams are stored;
+    - energy3_file: the file containing the preprocessed ta, ua, va, wap
+      fields;
+    - tas_file: the file containing the near-surface temperature;
+    """
+    cdo = Cdo()
+    with tempfile.TemporaryDirectory(
+            prefix='lec_{}_'.format(y_ro), dir=wdir) as sdir:
+        enfile_yr = sdir + '/inputen.nc'
+        tasfile_yr = sdir + '/tas_yr.nc'
+        tadiag_file = sdir + '/ta_filled.nc'
+        ncfile = sdir + '/fourier_coeff.nc'
+        cdo.selyear(y_ro, input=energy3_file, options='-b F32',
+                    output=enfile_yr)
+        cdo.selyear(y_ro, input=tas_file, options='-b F32',
+                    output=tasfile_yr)
+        fourier_coefficients.fourier_coeff(tadiag_file, ncfile, enfile_yr,
+                                           tasfile_yr,
+                                           ntime_chunk=NTIME_CHUNK)
+        diagfile = (ldir + '/{}_{}_lec_diagram.png'.format(model, y_ro))
+        logfile = (ldir + '/{}_{}_lec_table.txt'.format(model, y_ro))
+        lec_strength = lorenz(wdir, model, y_ro, ncfile, diagfile, logfile)
+    return lec_strength
+
+
+def lec_terms(fields, fields_tmn, lev, y_l, g_w):
+    """Compute the reservoirs and conversion terms at each timestep.
+
+    The terms are computed for chunks of NTIME_CHUNK timesteps at once.
+
+    Arguments:
+    - fields: the t, u, v and w Fourier coefficients as (lev, time, lat,
+      wave);
+    - fields_tmn: the time means of t, u, v and w as (lev, lat, wave);
+    - lev: the pressure levels;
+    - y_l: the latitudes in radians;
+    - g_w: the Gaussian weights for meridional averaging;
+    """
+    ta_c, ua_c, va_c, wap_c = fields
+    ta_tmn, ua_tmn, va_tmn, wap_tmn = fields_tmn
+    nlev, ntime, nlat, nwave = ta_c.shape
+    ntp = nwave + 1
+    ta_ztmn, ta_gmn = averages(ta_tmn, g_w)
+    gam_ztmn = stabil(ta_ztmn, lev, nlev)
+    gam_tmn = stabil(ta_gmn, lev, nlev)
+    e_k = np.zeros([nlev, ntime, nlat, ntp - 1])
+    ape = np.zeros([nlev, ntime, nlat, ntp - 1])
+    a2k = np.zeros([nlev, ntime, nlat, ntp - 1])
+    ae2az = np.zeros([nlev, ntime, nlat, ntp - 1])
+    ke2kz = np.zeros([nlev, ntime, nlat, ntp - 1])
+    at2as = np.zeros([nlev, ntime, nlat, ntp - 1])
+    kt2ks = np.zeros([nlev, ntime, nlat, ntp - 1])
+    # Process chunks of timesteps at once, fields are (time, lev, lat, wave)
+    for t_0 in range(0, ntime, NTIME_CHUNK):
+        t_t = slice(t_0, min(t_0 + NTIME_CHUNK, ntime))
+        ta_tan = np.moveaxis(ta_c[:, t_t, :, :], 1, 0) - ta_tmn
+        ua_tan = np.moveaxis(ua_c[:, t_t, :, :], 1, 0) - ua_tmn
+        va_tan = np.moveaxis(va_c[:, t_t, :, :], 1, 0) - va_tmn
+        wap_tan = np.moveaxis(wap_c[:, t_t, :, :], 1, 0) - wap_tmn
+        # Compute zonal means
+        _, ta_tgan = averages(ta_tan, g_w)
+        _, wap_tgan = averages(wap_tan, g_w)
+        # Compute kinetic energy
+        e_k[:, t_t, :, :] = np.moveaxis(makek(ua_tan, va_tan), 0, 1)
+        # Compute available potential energy
+        ape[:, t_t, :, :] = np.moveaxis(makea(ta_tan, ta_tgan, gam_tmn), 0,
+                                        1)
+        # Compute conversion between kin.en. and pot.en.
+        a2k[:, t_t, :, :] = np.moveaxis(
+            mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan, lev), 0, 1)
+        # Compute conversion between zonal and eddy APE
+        ae2az[:, t_t, :, :] = np.moveaxis(
+            mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn, ta_gmn, lev, y_l, gam_tmn,
+                   nlat, nlev), 0, 1)
+        # Compute conversion between zonal and eddy KE
+        ke2kz[:, t_t, :, :] = np.moveaxis(
+            mkkekz(ua_tan, va_tan, wap_tan, ua_tmn, va_tmn, lev, y_l, nlat,
+                   ntp, nlev), 0, 1)
+        # Compute conversion between stationary and transient eddy APE
+        at2as[:, t_t, :, :] = np.moveaxis(
+            mkatas(ua_tan, va_tan, wap_tan, ta_tan, ta_ztmn, gam_ztmn, lev,
+                   y_l, nlat, ntp, nlev), 0, 1)
+        # Compute conversion between stationary and transient eddy KE
+        kt2ks[:, t_t, :, :] = np.moveaxis(
+            mkktks(ua_tan, va_tan, ua_tmn, va_tmn, y_l, nlat, ntp, nlev), 0,
+            1)
+    return e_k, ape, a2k, ae2az, ke2kz, at2as, kt2ks
+
+
 def makek(u_t, v_t):
     """Compute the kinetic energy reservoirs from u and v.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
+    - u_t: a 3D zonal velocity field, optionally with additional leading
+      dimensions (e.g. time);
     - v_t: a 3D meridional velocity field;
     """
     ck1 = u_t * np.conj(u_t)
     ck2 = v_t * np.conj(v_t)
     e_k = np.real(ck1 + ck2)
-    e_k[:, :, 0] = 0.5 * np.real(u_t[:, :, 0] * u_t[:, :, 0] +
-                                 v_t[:, :, 0] * v_t[:, :, 0])
+    e_k[..., 0] = 0.5 * np.real(u_t[..., 0] * u_t[..., 0] +
+                                v_t[..., 0] * v_t[..., 0])
     return e_k
 
 
@@ -487,32 +586,61 @@ def makea(t_t, t_g, gam):
     """Compute the kinetic energy reservoirs from t.
 
     Arguments:
-    - t_t_ a 3D temperature field;
-    - t_g: a temperature vertical profile;
+    - t_t_ a 3D temperature field, optionally with additional leading
+      dimensions (e.g. time);
+    - t_g: a temperature vertical profile (with the same leading dimensions);
     - gam: a vertical profile of the stability parameter;
     """
     ape = gam[:, np.newaxis, np.newaxis] * np.real(t_t * np.conj(t_t))
-    ape[:, :, 0] = (gam[:, np.newaxis] * 0.5 * np.real(
-        (t_t[:, :, 0] - t_g[:, np.newaxis]) *
-        (t_t[:, :, 0] - t_g[:, np.newaxis])))
+    ape[..., 0] = (gam[:, np.newaxis] * 0.5 * np.real(
+        (t_t[..., 0] - t_g[..., np.newaxis]) *
+        (t_t[..., 0] - t_g[..., np.newaxis])))
     return ape
 
 
+def map_years(function, args_list, n_workers=1):
+    """Apply a function to the arguments of each year.
+
+    If n_workers > 1, the years are distributed over a pool of spawned
+    processes, so that the workers do not inherit the state (e.g. the dask
+    thread pool) of the calling process. Pool workers are daemonic and
+    cannot start processes themselves: if this function is called from such
+    a worker (e.g. when the models are processed in parallel), the years are
+    processed serially.
+
+    Arguments:
+    - function: the function computing one year;
+    - args_list: a list with the arguments of the function for each year;
+    - n_workers: the number of processes used;
+    """
+    if n_workers > 1 and multiprocessing.current_process().daemon:
+        logger.warning('Cannot process years in parallel from a daemonic '
+                       'process, processing them serially instead')
+        n_workers = 1
+    if n_workers > 1:
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(n_workers) as pool:
+            return pool.starmap(function, args_list, chunksize=1)
+    return [function(*args) for args in args_list]
+
+
 def mka2k(wap, t_t, w_g, t_g, p_l):
     """Compute the KE to APE energy conversions from t and w.
 
     Arguments:
-    - wap: a 3D vertical velocity field;
+    - wap: a 3D vertical velocity field, optionally with additional leading
+      dimensions (e.g. time);
     - t_t: a 3D temperature field;
-    - w_g: a vertical velocity vertical profile;
-    - t_g: a temperature vertical profile;
+    - w_g: a vertical velocity vertical profile (with the same leading
+      dimensions);
+    - t_g: a temperature vertical profile (with the same leading dimensions);
     - p_l: the pressure levels;
     """
     a2k = -(R / p_l[:, np.newaxis, np.newaxis] *
             (t_t * np.conj(wap) + np.conj(t_t) * wap))
-    a2k[:, :, 0] = -(R / p_l[:, np.newaxis] *
-                     (t_t[:, :, 0] - t_g[:, np.newaxis]) *
-                     (wap[:, :, 0] - w_g[:, np.newaxis]))
+    a2k[..., 0] = -(R / p_l[:, np.newaxis] *
+                    (t_t[..., 0] - t_g[..., np.newaxis]) *
+                    (wap[..., 0] - w_g[..., np.newaxis]))
     return a2k
 
 
@@ -520,7 +648,8 @@ def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
     """Compute the zonal mean - eddy APE conversions from t and v.
 
     Arguments:
-    - v_t: a 3D meridional velocity field;
+    - v_t: a 3D meridional velocity field, optionally with additional leading
+      dimensions (e.g. time);
     - wap: a 3D vertical velocity field;
     - t_t: a 3D temperature field;
     - ttt: a climatological mean 3D temperature field;
@@ -530,48 +659,16 @@ def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
     - nlat: the number of latitudes;
     - nlev: the number of levels;
     """
-    dtdp = np.zeros([nlev, nlat])
-    dtdy = np.zeros([nlev, nlat])
-    for l_l in np.arange(nlev):
-        if l_l == 0:
-            t_1 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
-            t_2 = np.real(ttt[l_l + 1, :, 0]) - ttg[l_l + 1]
-            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
-        elif l_l == nlev - 1:
-            t_1 = np.real(ttt[l_l - 1, :, 0]) - ttg[l_l - 1]
-            t_2 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
-            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
-        else:
-            t_1 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
-            t_2 = np.real(ttt[l_l + 1, :, 0]) - ttg[l_l + 1]
-            dtdp1 = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
-            t_2 = t_1
-            t_1 = np.real(ttt[l_l - 1, :, 0]) - ttg[l_l - 1]
-            dtdp2 = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
-            dtdp[l_l, :] = (
-                (dtdp1 * (p_l[l_l] - p_l[l_l - 1]) + dtdp2 *
-                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
-        dtdp[l_l, :] = dtdp[l_l, :] - (R / (CP * p_l[l_l]) *
-                                       (ttt[l_l, :, 0] - ttg[l_l]))
-    for i_l in np.arange(nlat):
-        if i_l == 0:
-            t_1 = np.real(ttt[:, i_l, 0])
-            t_2 = np.real(ttt[:, i_l + 1, 0])
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l])
-        elif i_l == nlat - 1:
-            t_1 = np.real(ttt[:, i_l - 1, 0])
-            t_2 = np.real(ttt[:, i_l, 0])
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l] - lat[i_l - 1])
-        else:
-            t_1 = np.real(ttt[:, i_l - 1, 0])
-            t_2 = np.real(ttt[:, i_l + 1, 0])
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l - 1])
+    dtdp = vert_deriv(np.real(ttt[:, :, 0]) - ttg[:, np.newaxis], p_l)
+    dtdp = dtdp - (R / (CP * p_l[:, np.newaxis]) *
+                   (np.real(ttt[:, :, 0]) - ttg[:, np.newaxis]))
+    dtdy = delta(np.real(ttt[:, :, 0]), axis=1) / delta(lat)
     dtdy = dtdy / AA
     c_1 = np.real(v_t * np.conj(t_t) + t_t * np.conj(v_t))
     c_2 = np.real(wap * np.conj(t_t) + t_t * np.conj(wap))
     ae2az = (gam[:, np.newaxis, np.newaxis] *
              (dtdy[:, :, np.newaxis] * c_1 + dtdp[:, :, np.newaxis] * c_2))
-    ae2az[:, :, 0] = 0.
+    ae2az[..., 0] = 0.
     return ae2az
 
 
@@ -579,7 +676,8 @@ def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
     """Compute the zonal mean - eddy KE conversions from u and v.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
+    - u_t: a 3D zonal velocity field, optionally with additional leading
+      dimensions (e.g. time);
     - v_t: a 3D meridional velocity field;
     - wap: a 3D vertical velocity field;
     - utt: a climatological mean 3D zonal velocity field;
@@ -590,77 +688,29 @@ def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
     - ntp: the number of wavenumbers;
     - nlev: the number of vertical levels;
     """
-    dudp = np.zeros([nlev, nlat])
-    dvdp = np.zeros([nlev, nlat])
-    dudy = np.zeros([nlev, nlat])
-    dvdy = np.zeros([nlev, nlat])
-    for l_l in np.arange(nlev):
-        if l_l == 0:
-            dudp[l_l, :] = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
-                            (p_l[l_l + 1] - p_l[l_l]))
-            dvdp[l_l, :] = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
-                            (p_l[l_l + 1] - p_l[l_l]))
-        elif l_l == nlev - 1:
-            dudp[l_l, :] = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
-                            (p_l[l_l] - p_l[l_l - 1]))
-            dvdp[l_l, :] = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
-                            (p_l[l_l] - p_l[l_l - 1]))
-        else:
-            dudp1 = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
-                     (p_l[l_l + 1] - p_l[l_l]))
-            dvdp1 = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
-                     (p_l[l_l + 1] - p_l[l_l]))
-            dudp2 = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
-                     (p_l[l_l] - p_l[l_l - 1]))
-            dvdp2 = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
-                     (p_l[l_l] - p_l[l_l - 1]))
-            dudp[l_l, :] = (
-                (dudp1 * (p_l[l_l] - p_l[l_l - 1]) + dudp2 *
-                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
-            dvdp[l_l, :] = (
-                (dvdp1 * (p_l[l_l] - p_l[l_l - 1]) + dvdp2 *
-                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
-    for i_l in np.arange(nlat):
-        if i_l == 0:
-            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l, 0])) /
-                            (lat[i_l + 1] - lat[i_l]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l, 0])) /
-                            (lat[i_l + 1] - lat[i_l]))
-        elif i_l == nlat - 1:
-            dudy[:, i_l] = ((np.real(utt[:, i_l, 0] - utt[:, i_l - 1, 0])) /
-                            (lat[i_l] - lat[i_l - 1]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l, 0] - vtt[:, i_l - 1, 0])) /
-                            (lat[i_l] - lat[i_l - 1]))
-        else:
-            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l - 1, 0]))
-                            / (lat[i_l + 1] - lat[i_l - 1]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l - 1, 0]))
-                            / (lat[i_l + 1] - lat[i_l - 1]))
+    utt_z = np.real(utt[:, :, 0])
+    vtt_z = np.real(vtt[:, :, 0])
+    dudp = vert_deriv(utt_z, p_l)
+    dvdp = vert_deriv(vtt_z, p_l)
+    dudy = delta(utt_z, axis=1) / delta(lat)
+    dvdy = delta(vtt_z, axis=1) / delta(lat)
     dudy = dudy / AA
     dvdy = dvdy / AA
-    c_1 = np.zeros([nlev, nlat, ntp - 1])
-    c_2 = np.zeros([nlev, nlat, ntp - 1])
-    c_3 = np.zeros([nlev, nlat, ntp - 1])
-    c_4 = np.zeros([nlev, nlat, ntp - 1])
-    c_5 = np.zeros([nlev, nlat, ntp - 1])
-    c_6 = np.zeros([nlev, nlat, ntp - 1])
     u_u = u_t * np.conj(u_t) + u_t * np.conj(u_t)
     u_v = u_t * np.conj(v_t) + v_t * np.conj(u_t)
     v_v = v_t * np.conj(v_t) + v_t * np.conj(v_t)
     u_w = u_t * np.conj(wap) + wap * np.conj(u_t)
     v_w = v_t * np.conj(wap) + wap * np.conj(v_t)
-    for i_l in np.arange(nlat):
-        c_1[:, i_l, :] = dudy[:, i_l][:, np.newaxis] * u_v[:, i_l, :]
-        c_2[:, i_l, :] = dvdy[:, i_l][:, np.newaxis] * v_v[:, i_l, :]
-        c_5[:, i_l, :] = (np.tan(lat[i_l]) / AA * np.real(
-            utt[:, i_l, 0])[:, np.newaxis] * (u_v[:, i_l, :]))
-        c_6[:, i_l, :] = -(np.tan(lat[i_l]) / AA * np.real(
-            vtt[:, i_l, 0])[:, np.newaxis] * (u_u[:, i_l, :]))
-    for l_l in np.arange(nlev):
-        c_3[l_l, :, :] = dudp[l_l, :][:, np.newaxis] * u_w[l_l, :, :]
-        c_4[l_l, :, :] = dvdp[l_l, :][:, np.newaxis] * v_w[l_l, :, :]
+    c_1 = np.real(dudy[:, :, np.newaxis] * u_v)
+    c_2 = np.real(dvdy[:, :, np.newaxis] * v_v)
+    c_3 = np.real(dudp[:, :, np.newaxis] * u_w)
+    c_4 = np.real(dvdp[:, :, np.newaxis] * v_w)
+    c_5 = np.real(
+        np.tan(lat)[:, np.newaxis] / AA * utt_z[:, :, np.newaxis] * (u_v))
+    c_6 = -np.real(
+        np.tan(lat)[:, np.newaxis] / AA * vtt_z[:, :, np.newaxis] * (u_u))
     ke2kz = (c_1 + c_2 + c_3 + c_4 + c_5 + c_6)
-    ke2kz[:, :, 0] = 0.
+    ke2kz[..., 0] = 0.
     return ke2kz
 
 
@@ -668,7 +718,8 @@ def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
     """Compute the stat.-trans. eddy APE conversions from u, v, wap and t.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
+    - u_t: a 3D zonal velocity field, optionally with additional leading
+      dimensions (e.g. time);
     - v_t: a 3D meridional velocity field;
     - wap: a 3D vertical velocity field;
     - t_t: a 3D temperature field;
@@ -680,63 +731,25 @@ def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
     - ntp: the number of wavenumbers;
     - nlev: the number of vertical levels;
     """
-    t_r = np.fft.ifft(t_t, axis=2)
-    u_r = np.fft.ifft(u_t, axis=2)
-    v_r = np.fft.ifft(v_t, axis=2)
-    w_r = np.fft.ifft(wap, axis=2)
+    t_r = np.fft.ifft(t_t, axis=-1)
+    u_r = np.fft.ifft(u_t, axis=-1)
+    v_r = np.fft.ifft(v_t, axis=-1)
+    w_r = np.fft.ifft(wap, axis=-1)
     tur = t_r * u_r
     tvr = t_r * v_r
     twr = t_r * w_r
-    t_u = np.fft.fft(tur, axis=2)
-    t_v = np.fft.fft(tvr, axis=2)
-    t_w = np.fft.fft(twr, axis=2)
+    t_u = np.fft.fft(tur, axis=-1)
+    t_v = np.fft.fft(tvr, axis=-1)
+    t_w = np.fft.fft(twr, axis=-1)
     c_1 = (t_u * np.conj(ttt[:, :, np.newaxis]) -
            ttt[:, :, np.newaxis] * np.conj(t_u))
     c_6 = (t_w * np.conj(ttt[:, :, np.newaxis]) -
            ttt[:, :, np.newaxis] * np.conj(t_w))
-    c_2 = np.zeros([nlev, nlat, ntp - 1])
-    c_3 = np.zeros([nlev, nlat, ntp - 1])
-    c_5 = np.zeros([nlev, nlat, ntp - 1])
-    for i_l in range(nlat):
-        if i_l == 0:
-            c_2[:, i_l, :] = (
-                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l])) *
-                np.conj(ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
-            c_3[:, i_l, :] = (
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l])) *
-                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
-        elif i_l == nlat - 1:
-            c_2[:, i_l, :] = (
-                t_v[:, i_l, :] / (AA * (lat[i_l] - lat[i_l - 1])) *
-                np.conj(ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-            c_3[:, i_l, :] = (
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l] - lat[i_l - 1])) *
-                (ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-        else:
-            c_2[:, i_l, :] = (
-                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l - 1])) *
-                np.conj(ttt[:, i_l + 1, np.newaxis] -
-                        ttt[:, i_l - 1, np.newaxis]))
-            c_3[:, i_l, :] = (
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l - 1]))
-                * (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-    for l_l in range(nlev):
-        if l_l == 0:
-            c_5[l_l, :, :] = (
-                (ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
-                (p_l[l_l + 1] - p_l[l_l]))
-        elif l_l == nlev - 1:
-            c_5[l_l, :, :] = (
-                (ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
-                (p_l[l_l] - p_l[l_l - 1]))
-        else:
-            c51 = ((ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
-                   (p_l[l_l + 1] - p_l[l_l]))
-            c52 = ((ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
-                   (p_l[l_l] - p_l[l_l - 1]))
-            c_5[l_l, :, :] = (
-                (c51 * (p_l[l_l] - p_l[l_l - 1]) + c52 *
-                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
+    dlat = delta(lat)[:, np.newaxis]
+    dttt = delta(ttt, axis=1)[:, :, np.newaxis]
+    c_2 = np.real(t_v / (AA * dlat) * np.conj(dttt))
+    c_3 = np.real(np.conj(t_v) / (AA * dlat) * dttt)
+    c_5 = vert_deriv(ttt, p_l)[:, :, np.newaxis]
     k_k = np.arange(0, ntp - 1)
     at2as = (
         ((k_k - 1)[np.newaxis, np.newaxis, :] * np.imag(c_1) /
@@ -744,7 +757,7 @@ def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
          np.real(t_w * np.conj(c_5) + np.conj(t_w) * c_5) + np.real(c_2 + c_3)
          + R / (CP * p_l[:, np.newaxis, np.newaxis]) * np.real(c_6)) *
         g_w[:, :, np.newaxis])
-    at2as[:, :, 0] = 0.
+    at2as[..., 0] = 0.
     return at2as
 
 
@@ -752,7 +765,8 @@ def mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
     """Compute the stat.-trans. eddy KE conversions from u, v and t.
 
     Arguments:
-    - u_t: a 3D zonal velocity field;
+    - u_t: a 3D zonal velocity field, optionally with additional leading
+      dimensions (e.g. time);
     - v_t: a 3D meridional velocity field;
     - utt: a climatological mean 3D zonal velocity field;
     - vtt: a climatological mean 3D meridional velocity field;
@@ -761,34 +775,21 @@ def mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
     - ntp: the number of wavenumbers;
     - nlev: the number of vertical levels;
     """
-    dut = np.zeros([nlev, nlat, ntp - 1])
-    dvt = np.zeros([nlev, nlat, ntp - 1])
-    dlat = np.zeros([nlat])
-    u_r = np.fft.irfft(u_t, axis=2)
-    v_r = np.fft.irfft(v_t, axis=2)
+    u_r = np.fft.irfft(u_t, axis=-1)
+    v_r = np.fft.irfft(v_t, axis=-1)
     uur = u_r * u_r
     uvr = u_r * v_r
     vvr = v_r * v_r
-    u_u = np.fft.rfft(uur, axis=2)
-    v_v = np.fft.rfft(vvr, axis=2)
-    u_v = np.fft.rfft(uvr, axis=2)
+    u_u = np.fft.rfft(uur, axis=-1)
+    v_v = np.fft.rfft(vvr, axis=-1)
+    u_v = np.fft.rfft(uvr, axis=-1)
     c_1 = u_u * np.conj(u_t) - u_t * np.conj(u_u)
     # c_3 = u_v * np.conj(u_t) + u_t * np.conj(u_v)
     c_5 = u_u * np.conj(v_t) + v_t * np.conj(u_u)
     c_6 = u_v * np.conj(v_t) - v_t * np.conj(u_v)
-    for i_l in range(nlat):
-        if i_l == 0:
-            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l, :])
-            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l, :])
-            dlat[i_l] = (lat[i_l + 1] - lat[i_l])
-        elif i_l == nlat - 1:
-            dut[:, i_l, :] = (utt[:, i_l, :] - utt[:, i_l - 1, :])
-            dvt[:, i_l, :] = (vtt[:, i_l, :] - vtt[:, i_l - 1, :])
-            dlat[i_l] = (lat[i_l] - lat[i_l - 1])
-        else:
-            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l - 1, :])
-            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l - 1, :])
-            dlat[i_l] = (lat[i_l + 1] - lat[i_l - 1])
+    dut = np.real(delta(utt, axis=1))
+    dvt = np.real(delta(vtt, axis=1))
+    dlat = delta(lat)
     c21 = np.conj(u_u) * dut / dlat[np.newaxis, :, np.newaxis]
     c22 = u_u * np.conj(dut) / dlat[np.newaxis, :, np.newaxis]
     c41 = np.conj(v_v) * dvt / dlat[np.newaxis, :, np.newaxis]
@@ -798,7 +799,7 @@ def mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
              np.tan(lat)[np.newaxis, :, np.newaxis] * np.real(c_1 - c_5) / AA +
              np.imag(c_1 + c_6) * (k_k - 1)[np.newaxis, np.newaxis, :] /
              (AA * np.cos(lat)[np.newaxis, :, np.newaxis]))
-    kt2ks[:, :, 0] = 0
+    kt2ks[..., 0] = 0
     return kt2ks
 
 
@@ -863,14 +864,15 @@ def removeif(filename):
         pass
 
 
-def preproc_lec(model, wdir, pdir, filelist):
+def preproc_lec(model, wdir, pdir, filelist, n_workers=1):
     """Preprocess fields for LEC computations and send it to lorenz program.
 
     This function computes the interpolation of ta, ua, va, wap daily fields to
     fill gaps using near-surface data, then computes the Fourier coefficients
     and performs the LEC computations. For every year, (lev,lat,wave) fields,
     global and hemispheric time series of each conversion and reservoir term
-    of the LEC is provided.
+    of the LEC is provided. Years are processed independently (in parallel if
+    n_workers > 1), each of them in its own scratch directory.
 
     Arguments:
     - model: the model name;
@@ -879,9 +881,10 @@ def preproc_lec(model, wdir, pdir, filelist):
       to store tables of conversion/reservoir terms and the flux diagram for
       year;
     - filelist: a list of file names containing the input fields;
+    - n_workers: the number of processes used to compute the LEC for
+      different years in parallel (see map_years);
     """
     cdo = Cdo()
-    fourc = fourier_coefficients
     ta_file = filelist[13]
     tas_file = filelist[14]
     ua_file = filelist[16]
@@ -922,8 +925,7 @@ def preproc_lec(model, wdir, pdir, filelist):
     yrs = cdo.showyear(input=energy3_file)
     yrs = str(yrs)
     yrs2 = yrs.split()
-    y_i = 0
-    lect = np.zeros(len(yrs2))
+    y_ros = []
     for y_r in yrs2:
         y_rl = [y_n for y_n in y_r]
         y_ro = ''
@@ -931,23 +933,10 @@ def preproc_lec(model, wdir, pdir, filelist):
             e_l = str(e_l)
             if e_l.isdigit() is True:
                 y_ro += e_l
-        # print(filter(str.isdigit, str(y_r)))
-        enfile_yr = wdir + '/inputen.nc'
-        tasfile_yr = wdir + '/tas_yr.nc'
-        tadiag_file = wdir + '/ta_filled.nc'
-        ncfile = wdir + '/fourier_coeff.nc'
-        cdo.selyear(
-            y_ro, input=energy3_file, options='-b F32', output=enfile_yr)
-        cdo.selyear(y_ro, input=tas_file, options='-b F32', output=tasfile_yr)
-        fourc.fourier_coeff(tadiag_file, ncfile, enfile_yr, tasfile_yr)
-        diagfile = (ldir + '/{}_{}_lec_diagram.png'.format(model, y_ro))
-        logfile = (ldir + '/{}_{}_lec_table.txt'.format(model, y_ro))
-        lect[y_i] = lorenz(wdir, model, y_ro, ncfile, diagfile, logfile)
-        y_i = y_i + 1
-        os.remove(enfile_yr)
-        os.remove(tasfile_yr)
-        os.remove(tadiag_file)
-        os.remove(ncfile)
+        y_ros.append(y_ro)
+    lec_args = [[model, y_ro, wdir, ldir, energy3_file, tas_file]
+                for y_ro in y_ros]
+    lect = np.array(map_years(lec_year, lec_args, n_workers))
     os.remove(maskorog)
     os.remove(ua_file_mask)
     os.remove(va_file_mask)
@@ -959,25 +948,16 @@ def stabil(ta_gmn, p_l, nlev):
     """Compute the stability parameter from temp. and pressure levels.
 
     Arguments
-    - ta_gmn: a temperature vertical profile;
+    - ta_gmn: a temperature vertical profile (or several profiles as
+      (lev, ...));
     - p_l: the vertical levels;
     - nlev: the number of vertical levels;
     """
     cpdr = CP / R
     t_g = ta_gmn
-    g_s = np.zeros(nlev)
-    for i_l in range(nlev):
-        if i_l == 0:
-            dtdp = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
-        elif i_l == nlev - 1:
-            dtdp = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
-        else:
-            dtdp1 = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
-            dtdp2 = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
-            dtdp = (
-                (dtdp1 * (p_l[i_l] - p_l[i_l - 1]) + dtdp2 *
-                 (p_l[i_l + 1] - p_l[i_l])) / (p_l[i_l + 1] - p_l[i_l - 1]))
-        g_s[i_l] = CP / (t_g[i_l] - p_l[i_l] * dtdp * cpdr)
+    dtdp = vert_deriv(t_g, p_l)
+    p_l = np.reshape(p_l, (nlev, ) + (1, ) * (np.ndim(t_g) - 1))
+    g_s = CP / (t_g - p_l * dtdp * cpdr)
     return g_s
 
 
@@ -1056,6 +1036,27 @@ def varatts(w_nc_var, varname, tres, vres):
         })
 
 
+def vert_deriv(fld, p_l):
+    """Compute the vertical derivative of a field on pressure levels.
+
+    One-sided derivatives are used at the boundaries, weighted averages of
+    the upper and lower derivatives elsewhere.
+
+    Arguments:
+    - fld: the input field as (lev, ...);
+    - p_l: the pressure levels;
+    """
+    p_l = np.reshape(p_l, (-1, ) + (1, ) * (np.ndim(fld) - 1))
+    deriv = np.empty(np.shape(fld), dtype=np.result_type(fld, p_l))
+    deriv[0] = (fld[1] - fld[0]) / (p_l[1] - p_l[0])
+    deriv[-1] = (fld[-1] - fld[-2]) / (p_l[-1] - p_l[-2])
+    deriv_1 = (fld[2:] - fld[1:-1]) / (p_l[2:] - p_l[1:-1])
+    deriv_2 = (fld[1:-1] - fld[:-2]) / (p_l[1:-1] - p_l[:-2])
+    deriv[1:-1] = ((deriv_1 * (p_l[1:-1] - p_l[:-2]) + deriv_2 *
+                    (p_l[2:] - p_l[1:-1])) / (p_l[2:] - p_l[:-2]))
+    return deriv
+
+
 def weights(lev, nlev, lat):
     """Compute weigths for vertical integration and meridional averages.
 
@@ -29,7 +29,8 @@ import numpy as np
 from cdo import Cdo
 from netCDF4 import Dataset
 
-from esmvaltool.diag_scripts.thermodyn_diagtool import fourier_coefficients
+from esmvaltool.diag_scripts.thermodyn_diagtool import computations_xr, \
+    fourier_coefficients
 
 ALV = 2.5008e6  # Latent heat of vaporization
 G_0 = 9.81  # Gravity acceleration
@@ -57,7 +58,9 @@ def init_mkthe(model, wdir, filelist, flags):
     - flags: (wat: a flag for the water mass budget module (y or n),
               entr: a flag for the material entropy production (y or n);
               met: a flag for the material entropy production method
-              (1: indirect, 2, direct, 3: both));
+              (1: indirect, 2, direct, 3: both);
+              in_memory: a flag for computing the boundary layer fields in
+              chunks with computations_xr.mkthe_main (True or False));
 
     Author:
     Valerio Lembo, University of Hamburg (2019).
@@ -66,6 +69,7 @@ def init_mkthe(model, wdir, filelist, flags):
     wat = flags[0]
     entr = flags[1]
     met = flags[2]
+    in_memory = flags[3]
     hfss_file = filelist[1]
     hus_file = filelist[2]
     ps_file = filelist[5]
@@ -120,7 +124,12 @@ def init_mkthe(model, wdir, filelist, flags):
                 ts_file, hus_file, ps_file, uasmn_file, vasmn_file, hfss_file,
                 te_file
             ]
-            htop_file, tabl_file, tlcl_file = mkthe_main(wdir, mk_list, model)
+            if in_memory == 'True':
+                htop_file, tabl_file, tlcl_file = computations_xr.mkthe_main(
+                    wdir, mk_list, model)
+            else:
+                htop_file, tabl_file, tlcl_file = mkthe_main(
+                    wdir, mk_list, model)
             # Working temperatures for the hydrological cycle
             tcloud_file = (wdir + '/{}_tcloud.nc'.format(model))
             removeif(tcloud_file)
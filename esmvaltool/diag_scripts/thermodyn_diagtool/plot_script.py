@@ -89,13 +89,14 @@ def balances(cfg, wdir, plotpath, filena, name, model):
             lat_model = 'lat_{}'.format(model)
             pr_output(transp_mean[i, :], filename, nc_f, nameout, lat_model)
             name_model = '{}_{}'.format(nameout, model)
+            aux_file = wdir + '/aux_{}.nc'.format(model)
             cdo.chname(
                 '{},{}'.format(nameout, name_model),
                 input=nc_f,
-                output='aux.nc')
-            move('aux.nc', nc_f)
-            cdo.chname('lat,{}'.format(lat_model), input=nc_f, output='aux.nc')
-            move('aux.nc', nc_f)
+                output=aux_file)
+            move(aux_file, nc_f)
+            cdo.chname('lat,{}'.format(lat_model), input=nc_f, output=aux_file)
+            move(aux_file, nc_f)
             attr = ['{} meridional enthalpy transports'.format(nameout), model]
             provrec = provenance_meta.get_prov_transp(attr, filename,
                                                       plotentname)
@@ -244,13 +245,11 @@ def global_averages(nsub, filena, name):
     vary = np.nanmean(var_r, axis=2)
     zmean = np.nanmean(vary, axis=3)
     tmean = np.nanmean(vary, axis=1)
-    timeser = np.zeros([nsub, yr_0, 3])
-    for i_f in np.arange(nsub):
-        zmean_w = latwgt(lats, zmean[i_f, :, :])
-        gmean = np.nansum(zmean_w, axis=1)
-        shmean = hemean(0, lats, zmean[i_f, :, :])
-        nhmean = hemean(1, lats, zmean[i_f, :, :])
-        timeser[i_f, :, :] = np.column_stack((gmean, shmean, nhmean))
+    zmean_w = latwgt(lats, zmean)
+    gmean = np.nansum(zmean_w, axis=-1)
+    shmean = hemean(0, lats, zmean)
+    nhmean = hemean(1, lats, zmean)
+    timeser = np.stack((gmean, shmean, nhmean), axis=-1)
     return dims, ndims, tmean, zmean, timeser
 
 
@@ -260,21 +259,22 @@ def hemean(hem, lat, inp):
     Arguments:
     - hem: a parameter for the choice of the hemisphere (1 stands for SH);
     - lat: latitude (in degrees);
-    - inp: input field;
+    - inp: input field (...,lat);
     """
-    j_end = np.shape(inp)[1]
+    j_end = np.shape(inp)[-1]
     zmn = latwgt(lat, inp)
     hmean = []
     if hem == 1:
         if j_end % 2 == 0:
-            hmean = 2 * np.nansum(zmn[:, int(j_end / 2):j_end], axis=1)
+            hmean = 2 * np.nansum(zmn[..., int(j_end / 2):j_end], axis=-1)
         else:
-            hmean = 2 * np.nansum(zmn[:, int((j_end + 1) / 2):j_end], axis=1)
+            hmean = 2 * np.nansum(zmn[..., int((j_end + 1) / 2):j_end],
+                                  axis=-1)
     else:
         if j_end % 2 == 0:
-            hmean = 2 * np.nansum(zmn[:, 1:int(j_end / 2)], axis=1)
+            hmean = 2 * np.nansum(zmn[..., 1:int(j_end / 2)], axis=-1)
         else:
-            hmean = 2 * np.nansum(zmn[:, 1:int((j_end - 1) / 2)], axis=1)
+            hmean = 2 * np.nansum(zmn[..., 1:int((j_end - 1) / 2)], axis=-1)
     return hmean
 
 
@@ -303,20 +303,26 @@ def latwgt(lat, t_r):
 
     Arguments:
     - lat: latitude (in degrees);
-    - tr: the field to be averaged (time,lat);
+    - tr: the field to be averaged (...,lat);
     """
     p_i = math.pi
     conv = 2 * p_i / 360
-    dlat = np.zeros(len(lat))
-    for i in range(len(lat) - 1):
-        dlat[i] = abs(lat[i + 1] - lat[i])
-    dlat[len(lat) - 1] = dlat[len(lat) - 2]
-    latr = conv * lat
+    dlat = latspacing(lat)
+    latr = conv * np.asarray(lat)
     dlatr = conv * dlat
-    tr2 = np.zeros((np.shape(t_r)[0], np.shape(t_r)[1]))
-    for j in range(len(lat)):
-        tr2[:, j] = t_r[:, j] * np.cos(latr[j]) * dlatr[j] / 2
-    return tr2
+    return t_r * np.cos(latr) * dlatr / 2
+
+
+def latspacing(lat):
+    """Compute the spacing of the latitudes.
+
+    The spacing of the last latitude is the one of the previous latitude.
+
+    Arguments:
+    - lat: latitude (in degrees);
+    """
+    dlat = np.abs(np.diff(np.asarray(lat, dtype=float)))
+    return np.append(dlat, dlat[-1])
 
 
 def plot_climap_eb(model, pdir, coords, tmean, ext_name):
@@ -809,26 +815,20 @@ def removeif(filename):
 def transport(zmean, gmean, lat):
     """Integrate the energy/water mass budgets to obtain meridional transp.
 
+    The budgets are integrated from each latitude to the last one, for all
+    years at once, with a cumulative sum along the latitudes.
+
     Arguments:
-    - zmean: zonal mean input fields;
-    - gmean: the global mean of the input fields;
+    - zmean: zonal mean input fields (...,lat);
+    - gmean: the global mean of the input fields (...);
     - lat: a latitudinal array (in degrees of latitude);
     """
     p_i = math.pi
-    dlat = np.zeros(len(lat))
-    for i in range(len(lat) - 1):
-        dlat[i] = abs(lat[i + 1] - lat[i])
-    dlat[len(lat) - 1] = dlat[len(lat) - 2]
-    zmn_ub = np.zeros((np.shape(zmean)[0], np.shape(zmean)[1]))
-    for index, value in enumerate(gmean):
-        for j_l in range(np.shape(zmean)[1]):
-            zmn_ub[index, j_l] = zmean[index, j_l] - value
+    zmn_ub = zmean - np.asarray(gmean)[..., np.newaxis]
     zmn_ub[np.isnan(zmn_ub)] = 0
-    cumb = np.zeros((np.shape(zmean)[0], np.shape(zmean)[1]))
-    transp = np.zeros((np.shape(zmean)[0], np.shape(zmean)[1]))
-    for j_l in range(len(lat) - 1):
-        cumb[:, j_l] = (-2 * np.nansum(
-            latwgt(lat[j_l:len(lat)], zmn_ub[:, j_l:len(lat)]), axis=1))
+    zmn_w = latwgt(lat, zmn_ub)
+    cumb = -2 * np.cumsum(zmn_w[..., ::-1], axis=-1)[..., ::-1]
+    cumb[..., -1] = 0
     r_earth = 6.371 * 10**6
     transp = 2 * p_i * cumb * r_earth * r_earth
     return [zmn_ub, transp]
@@ -837,32 +837,43 @@ def transport(zmean, gmean, lat):
 def transp_max(lat, transp, lim):
     """Obtain transport peak magnitude and location from interpolation.
 
+    The first two peaks (in order of latitude) within the range (-lim,lim) are
+    retrieved for all the transports at once. Missing peaks are set to 0.
+
     Arguments:
     - lat: a latitudinal array;
-    - transp: the meridional transport a 1D array (lat);
+    - transp: the meridional transports as an array (...,lat);
     - lim: limits to constrain the peak search in
     (necessary for ocean transp.)
     """
-    deriv = np.gradient(transp)
-    x_c = zerocross1d(lat, deriv)
-    y_i = np.zeros(2)
-    xc_cut = np.zeros(2)
-    j_p = 0
-    for value in x_c:
-        if abs(value) <= lim:
-            xc_cut[j_p] = value
-            y_i[j_p] = interpolate.interp1d(lat, transp, kind='cubic')(value)
-            j_p = j_p + 1
-            if j_p == 2:
-                break
+    transp = np.asarray(transp)
+    lat = np.asarray(lat)
+    deriv = np.gradient(transp, axis=-1)
+    x_c = zerocross(lat, deriv)
+    with np.errstate(invalid='ignore'):
+        x_c = np.where(np.abs(x_c) <= lim, x_c, np.nan)
+    x_c = np.sort(x_c, axis=-1)[..., :2]
+    valid = ~np.isnan(x_c)
+    xc_cut = np.where(valid, x_c, 0.)
+    # Cubic splines for all transports, each one evaluated at its own peaks
+    order = np.argsort(lat)
+    transp_2d = np.reshape(transp, (-1, len(lat)))[:, order]
+    x_2d = np.reshape(np.where(valid, x_c, lat[0]), (-1, 2))
+    spline = interpolate.CubicSpline(lat[order], transp_2d, axis=-1)
+    interval = np.searchsorted(spline.x, x_2d) - 1
+    interval = np.clip(interval, 0, len(spline.x) - 2)
+    d_x = x_2d - spline.x[interval]
+    coeffs = spline.c[:, interval, np.arange(len(transp_2d))[:, np.newaxis]]
+    y_i = ((coeffs[0] * d_x + coeffs[1]) * d_x + coeffs[2]) * d_x + coeffs[3]
+    y_i = np.where(valid, np.reshape(y_i, np.shape(x_c)), 0.)
     return [xc_cut, y_i]
 
 
 def transports_preproc(lats, yrs, lim, transp):
     """Compute the peaks magnitude and locations of a meridional transport.
 
-    This function computes the peaks magnitudes and locations recursively at
-    each time through the function transp_max and stores them in a list.
+    This function computes the peaks magnitudes and locations at each time
+    through the function transp_max and stores them in a list.
 
     Arguments:
     - lats: a latitudinal array;
@@ -873,19 +884,8 @@ def transports_preproc(lats, yrs, lim, transp):
     """
     transpp = transp[1]
     transp_mean = np.nanmean(transpp, axis=0)
-    yr_ext = []
-    lat_maxm = np.zeros([2, yrs])
-    tr_maxm = np.zeros([2, yrs])
-    lat_max = list()
-    tr_max = list()
-    for t_t in np.arange(int(yrs)):
-        yr_ext = transp_max(lats, transpp[t_t, :], lim)
-        lat_max.append(yr_ext[0])
-        tr_max.append(yr_ext[1])
-    for t_t in np.arange(int(yrs)):
-        lat_maxm[:, t_t] = lat_max[t_t]
-        tr_maxm[:, t_t] = tr_max[t_t]
-    list_peak = [lat_maxm, tr_maxm]
+    lat_max, tr_max = transp_max(lats, transpp[:int(yrs), :], lim)
+    list_peak = [lat_max.T, tr_max.T]
     return transp_mean, list_peak
 
 
@@ -929,7 +929,7 @@ def varatts(w_nc_var, varname):
         })
 
 
-def zerocross1d(x_x, y_y):
+def zerocross(x_x, y_y):
     """Find the zero crossing points in 1d data.
 
     Find the zero crossing events in a discrete data set. Linear interpolation
@@ -939,8 +939,11 @@ def zerocross1d(x_x, y_y):
     Note that the first and last data point will not be considered whether
     or not they are zero.
 
+    The data sets along the last dimension of y_y are processed at once. The
+    zero crossings of each of them are sorted and padded with NaN.
+
     Arguments:
-    x_x, y_y : arrays. Ordinate and abscissa data values.
+    x_x, y_y : arrays. Ordinate (lat) and abscissa (...,lat) data values.
 
     Credits:
     The PyA group (https://github.com/sczesla/PyAstronomy).
@@ -949,15 +952,11 @@ def zerocross1d(x_x, y_y):
     License:
     Copyright (c) 2011, PyA group.
     """
-    indi = np.where(y_y[1:] * y_y[0:-1] < 0.0)[0]
-    d_x = x_x[indi + 1] - x_x[indi]
-    d_y = y_y[indi + 1] - y_y[indi]
-    z_c = -y_y[indi] * (d_x / d_y) + x_x[indi]
-    z_i = np.where(y_y == 0.0)[0]
-    z_i = z_i[np.where((z_i > 0) & (z_i < x_x.size - 1))]
-    z_i = z_i[np.where(y_y[z_i - 1] * y_y[z_i + 1] < 0.0)]
-    zzindi = np.concatenate((indi, z_i))
-    z_z = np.concatenate((z_c, x_x[z_i]))
-    sind = np.argsort(z_z)
-    z_z, zzindi = z_z[sind], zzindi[sind]
-    return z_z
+    d_x = x_x[1:] - x_x[:-1]
+    d_y = y_y[..., 1:] - y_y[..., :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_c = -y_y[..., :-1] * (d_x / d_y) + x_x[:-1]
+    z_c = np.where(y_y[..., 1:] * y_y[..., :-1] < 0.0, z_c, np.nan)
+    z_i = np.where((y_y[..., 1:-1] == 0.0) &
+                   (y_y[..., :-2] * y_y[..., 2:] < 0.0), x_x[1:-1], np.nan)
+    return np.sort(np.concatenate((z_c, z_i), axis=-1), axis=-1)
@@ -115,6 +115,17 @@ USAGE
               latent energy budget,
        - lec: if set to true, the program will compute the Lorenz Energy Cycle
               (LEC) averaged on each year;
+       - lec_workers: (optional) the number of years for which the LEC is
+                      computed in parallel (default: 1);
+       - in_memory: (optional) if set to true, the energy and water mass
+                    budgets, the baroclinic efficiency, the material
+                    entropy production with the indirect method and the
+                    boundary layer fields for the direct method are computed
+                    in memory with xarray, instead of with CDO (default:
+                    false);
+       - n_workers: (optional) the number of models that are processed in
+                    parallel, each in its own work directory; lec_workers
+                    is ignored if n_workers > 1 (default: 1);
        - entr: if set to true, the program will compute the material entropy
                production (MEP);
        - met: if set to 1, the program will compute the MEP with the indirect
@@ -239,7 +250,10 @@ for immediate model intercomparison.
 
 # New packages for version 2.0 of ESMValTool
 import logging
+import multiprocessing
 import os
+import shutil
+import time
 import warnings
 
 import numpy as np
@@ -248,11 +262,325 @@ import esmvaltool.diag_scripts.shared as e
 from esmvaltool.diag_scripts.shared import ProvenanceLogger
 
 from esmvaltool.diag_scripts.thermodyn_diagtool import computations, \
-    lorenz_cycle, mkthe, plot_script, provenance_meta
+    computations_xr, lorenz_cycle, mkthe, plot_script, provenance_meta
 
 warnings.filterwarnings("ignore", message="numpy.dtype size changed")
 logger = logging.getLogger(os.path.basename(__file__))
 
+# Shapes of the per-model quantities collected for the multi-model plots
+SUMMARY_SHAPES = {
+    'te': (),
+    'toab': (2, ),
+    'toab_oc': (),
+    'toab_la': (),
+    'atmb': (2, ),
+    'atmb_oc': (),
+    'atmb_la': (),
+    'surb': (2, ),
+    'surb_oc': (),
+    'surb_la': (),
+    'wmb': (2, ),
+    'wmb_oc': (),
+    'wmb_la': (),
+    'latent': (2, ),
+    'latent_oc': (),
+    'latent_la': (),
+    'baroc_eff': (),
+    'lec': (2, ),
+    'horzentr': (2, ),
+    'vertentr': (2, ),
+    'matentr': (2, ),
+    'irrevers': (),
+    'diffentr': (2, ),
+}
+
+
+def compute_model(cfg, model, filenames):
+    """Run the diagnostic tool for a single model.
+
+    Return a dictionary with the global mean quantities used for the
+    multi-model summary plots (see SUMMARY_SHAPES).
+    """
+    provlog = ProvenanceLogger(cfg)
+    lorenz = lorenz_cycle
+    comp = computations
+    plotsmod = plot_script
+    # Load paths to individual models output and plotting directories
+    wdir_up = cfg['work_dir']
+    wdir = os.path.join(wdir_up, model)
+    pdir = os.path.join(cfg['plot_dir'], model)
+    os.makedirs(wdir)
+    os.makedirs(pdir)
+    # load user-defined options
+    lsm = str(cfg['lsm'])
+    wat = str(cfg['wat'])
+    lec = str(cfg['lec'])
+    entr = str(cfg['entr'])
+    met = str(cfg['met'])
+    lec_workers = int(cfg.get('lec_workers', 1))
+    in_memory = str(cfg.get('in_memory', False))
+    if in_memory == 'True':
+        comp_mem = computations_xr
+    else:
+        comp_mem = computations
+    flags = [wat, entr, met, in_memory]
+    summary = {key: np.zeros(shape) for key, shape in SUMMARY_SHAPES.items()}
+    logger.info('Processing model: %s \n', model)
+    rlds_file = filenames[6]
+    rlus_file = filenames[7]
+    rsds_file = filenames[9]
+    rsus_file = filenames[11]
+    ta_file = filenames[13]
+    ts_file = filenames[15]
+    # Read path to land-sea mask
+    for filename, attributes in cfg['input_data'].items():
+        if filename == ta_file:
+            sftlf_fx = attributes['fx_files']['sftlf']
+    aux_file = wdir + '/aux.nc'
+    te_ymm_file, te_gmean_constant, _, _ = mkthe.init_mkthe(
+        model, wdir, filenames, flags)
+    summary['te'] = te_gmean_constant
+    logger.info('Computing energy budgets\n')
+    eb_gmean, eb_file, toab_ymm_file = comp_mem.budgets(
+        model, wdir, aux_file, filenames)
+    prov_rec = provenance_meta.get_prov_map(
+        ['TOA energy budgets', model],
+        [filenames[10], filenames[12], filenames[8]])
+    provlog.log(eb_file[0], prov_rec)
+    prov_rec = provenance_meta.get_prov_map(
+        ['atmospheric energy budgets', model], [
+            filenames[1], filenames[6], filenames[7], filenames[8],
+            filenames[9], filenames[10], filenames[11], filenames[12]
+        ])
+    provlog.log(eb_file[1], prov_rec)
+    prov_rec = provenance_meta.get_prov_map(
+        ['surface energy budgets', model], [
+            filenames[1], filenames[6], filenames[7], filenames[9],
+            filenames[11]
+        ])
+    provlog.log(eb_file[2], prov_rec)
+    summary['toab'][0] = np.nanmean(eb_gmean[0])
+    summary['toab'][1] = np.nanstd(eb_gmean[0])
+    summary['atmb'][0] = np.nanmean(eb_gmean[1])
+    summary['atmb'][1] = np.nanstd(eb_gmean[1])
+    summary['surb'][0] = np.nanmean(eb_gmean[2])
+    summary['surb'][1] = np.nanstd(eb_gmean[2])
+    logger.info('Global mean emission temperature: %s\n',
+                te_gmean_constant)
+    logger.info('TOA energy budget: %s\n', summary['toab'][0])
+    logger.info('Atmospheric energy budget: %s\n', summary['atmb'][0])
+    logger.info('Surface energy budget: %s\n', summary['surb'][0])
+    logger.info('Done\n')
+    summary['baroc_eff'] = comp_mem.baroceff(model, wdir, aux_file,
+                                             toab_ymm_file, te_ymm_file)
+    logger.info('Baroclinic efficiency (Lucarini et al., 2011): %s\n',
+                summary['baroc_eff'])
+    logger.info('Running the plotting module for the budgets\n')
+    plotsmod.balances(cfg, wdir_up, pdir,
+                      [eb_file[0], eb_file[1], eb_file[2]],
+                      ['toab', 'atmb', 'surb'], model)
+    logger.info('Done\n')
+    # Water mass budget
+    if wat == 'True':
+        logger.info('Computing water mass and latent energy budgets\n')
+        _, _, _, aux_list = mkthe.init_mkthe(model, wdir, filenames, flags)
+        wm_gmean, wm_file = comp_mem.wmbudg(model, wdir, aux_file,
+                                            filenames, aux_list)
+        summary['wmb'][0] = np.nanmean(wm_gmean[0])
+        summary['wmb'][1] = np.nanstd(wm_gmean[0])
+        logger.info('Water mass budget: %s\n', summary['wmb'][0])
+        summary['latent'][0] = np.nanmean(wm_gmean[1])
+        summary['latent'][1] = np.nanstd(wm_gmean[1])
+        logger.info('Latent energy budget: %s\n', summary['latent'][0])
+        logger.info('Done\n')
+        logger.info('Plotting the water mass and latent energy budgets\n')
+        plotsmod.balances(cfg, wdir_up, pdir, [wm_file[0], wm_file[1]],
+                          ['wmb', 'latent'], model)
+        logger.info('Done\n')
+        for filen in aux_list:
+            os.remove(filen)
+    if lsm == 'True':
+        logger.info('Computing energy budgets over land and oceans\n')
+        toab_oc_gmean, toab_la_gmean = comp_mem.landoc_budg(
+            model, wdir, eb_file[0], sftlf_fx, 'toab')
+        summary['toab_oc'] = toab_oc_gmean
+        summary['toab_la'] = toab_la_gmean
+        logger.info('TOA energy budget over oceans: %s\n', toab_oc_gmean)
+        logger.info('TOA energy budget over land: %s\n', toab_la_gmean)
+        atmb_oc_gmean, atmb_la_gmean = comp_mem.landoc_budg(
+            model, wdir, eb_file[1], sftlf_fx, 'atmb')
+        summary['atmb_oc'] = atmb_oc_gmean
+        summary['atmb_la'] = atmb_la_gmean
+        logger.info('Atmospheric energy budget over oceans: %s\n',
+                    atmb_oc_gmean)
+        logger.info('Atmospheric energy budget over land: %s\n',
+                    atmb_la_gmean)
+        surb_oc_gmean, surb_la_gmean = comp_mem.landoc_budg(
+            model, wdir, eb_file[2], sftlf_fx, 'surb')
+        summary['surb_oc'] = surb_oc_gmean
+        summary['surb_la'] = surb_la_gmean
+        logger.info('Surface energy budget over oceans: %s\n',
+                    surb_oc_gmean)
+        logger.info('Surface energy budget over land: %s\n', surb_la_gmean)
+        logger.info('Done\n')
+        if wat == 'True':
+            logger.info('Computing water mass and latent energy'
+                        ' budgets over land and oceans\n')
+            wmb_oc_gmean, wmb_la_gmean = comp_mem.landoc_budg(
+                model, wdir, wm_file[0], sftlf_fx, 'wmb')
+            summary['wmb_oc'] = wmb_oc_gmean
+            summary['wmb_la'] = wmb_la_gmean
+            logger.info('Water mass budget over oceans: %s\n',
+                        wmb_oc_gmean)
+            logger.info('Water mass budget over land: %s\n', wmb_la_gmean)
+            latent_oc_gmean, latent_la_gmean = comp_mem.landoc_budg(
+                model, wdir, wm_file[1], sftlf_fx, 'latent')
+            summary['latent_oc'] = latent_oc_gmean
+            summary['latent_la'] = latent_la_gmean
+            logger.info('Latent energy budget over oceans: %s\n',
+                        latent_oc_gmean)
+            logger.info('Latent energy budget over land: %s\n',
+                        latent_la_gmean)
+            logger.info('Done\n')
+    if lec == 'True':
+        logger.info('Computation of the Lorenz Energy '
+                    'Cycle (year by year)\n')
+        lect = lorenz.preproc_lec(model, wdir, pdir, filenames,
+                                  lec_workers)
+        summary['lec'][0] = np.nanmean(lect)
+        summary['lec'][1] = np.nanstd(lect)
+        logger.info(
+            'Intensity of the annual mean Lorenz Energy '
+            'Cycle: %s\n', summary['lec'][0])
+        logger.info('Done\n')
+    else:
+        lect = np.repeat(2.0, len(eb_gmean[0]))
+        summary['lec'][0] = 2.0
+        summary['lec'][1] = 0.2
+    if entr == 'True':
+        if met in {'1', '3'}:
+            _, _, te_file, _ = mkthe.init_mkthe(model, wdir, filenames,
+                                                flags)
+            logger.info('Computation of the material entropy production '
+                        'with the indirect method\n')
+            indentr_list = [
+                rlds_file, rlus_file, rsds_file, rsus_file, te_file,
+                eb_file[0], ts_file
+            ]
+            (horz_mn, vert_mn, horzentr_file,
+             vertentr_file) = comp_mem.indentr(model, wdir, indentr_list,
+                                               aux_file, eb_gmean[0])
+            listind = [horzentr_file, vertentr_file]
+            provenance_meta.meta_indentr(cfg, model, filenames, listind)
+            summary['horzentr'][0] = np.nanmean(horz_mn)
+            summary['horzentr'][1] = np.nanstd(horz_mn)
+            summary['vertentr'][0] = np.nanmean(vert_mn)
+            summary['vertentr'][1] = np.nanstd(vert_mn)
+            logger.info(
+                'Horizontal component of the material entropy '
+                'production: %s\n', summary['horzentr'][0])
+            logger.info(
+                'Vertical component of the material entropy '
+                'production: %s\n', summary['vertentr'][0])
+            logger.info('Done\n')
+            logger.info('Running the plotting module for the material '
+                        'entropy production (indirect method)\n')
+            plotsmod.entropy(pdir, vertentr_file, 'sver',
+                             'Vertical entropy production', model)
+            os.remove(te_file)
+            logger.info('Done\n')
+        if met in {'2', '3'}:
+            matentr, irrevers, entr_list = comp.direntr(
+                logger, model, wdir, filenames, aux_file, lect, lec, flags)
+            provenance_meta.meta_direntr(cfg, model, filenames, entr_list)
+            summary['matentr'][0] = matentr
+            if met in {'3'}:
+                diffentr = (float(np.nanmean(vert_mn)) + float(
+                    np.nanmean(horz_mn)) - matentr)
+                logger.info('Difference between the two '
+                            'methods: %s\n', diffentr)
+                summary['diffentr'][0] = diffentr
+            logger.info('Degree of irreversibility of the '
+                        'system: %s\n', irrevers)
+            summary['irrevers'] = irrevers
+            logger.info('Running the plotting module for the material '
+                        'entropy production (direct method)\n')
+            plotsmod.init_plotentr(model, pdir, entr_list)
+            logger.info('Done\n')
+    os.remove(te_ymm_file)
+    logger.info('Done for model: %s \n', model)
+    return summary
+
+
+def get_model_cfg(cfg, model):
+    """Get a copy of cfg with a run directory specific to the model.
+
+    Each model running in a separate process logs its provenance records in
+    its own file, so that concurrent writes do not overwrite each other.
+    The LEC years of the model are computed serially, since the pool
+    workers cannot start processes themselves.
+    """
+    model_cfg = dict(cfg)
+    model_cfg['run_dir'] = os.path.join(cfg['run_dir'], model)
+    model_cfg['lec_workers'] = 1
+    os.makedirs(model_cfg['run_dir'], exist_ok=True)
+    return model_cfg
+
+
+def merge_provenance(cfg, model_cfgs):
+    """Merge the provenance records of the models into the main log file."""
+    with ProvenanceLogger(cfg) as provlog:
+        for model_cfg in model_cfgs:
+            model_provlog = ProvenanceLogger(model_cfg)
+            for filename, record in model_provlog.table.items():
+                provlog.log(filename, record)
+            shutil.rmtree(model_cfg['run_dir'])
+
+
+def _init_model_worker(log_level):
+    """Set up the logging of a worker process like run_diagnostic does."""
+    logging.basicConfig(format="%(asctime)s [%(process)d] %(levelname)-8s "
+                        "%(name)s,%(lineno)s\t%(message)s")
+    logging.Formatter.converter = time.gmtime
+    logging.captureWarnings(True)
+    logging.getLogger().setLevel(log_level.upper())
+
+
+def compute_models(cfg, model_names, filenames):
+    """Run the diagnostic tool for all models.
+
+    If n_workers > 1, the models are distributed over a pool of spawned
+    processes, so that the workers do not inherit the state (e.g. the dask
+    thread pool) of the main process. In this case the LEC years of each
+    model are computed serially, i.e. lec_workers is ignored.
+
+    Return a dictionary with the multi-model arrays of the global mean
+    quantities (see SUMMARY_SHAPES).
+    """
+    n_workers = int(cfg.get('n_workers', 1))
+    if n_workers > 1:
+        if int(cfg.get('lec_workers', 1)) > 1:
+            logger.warning('Ignoring lec_workers, because the models are '
+                           'processed in parallel (n_workers > 1)')
+        model_cfgs = [get_model_cfg(cfg, model) for model in model_names]
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(n_workers,
+                          initializer=_init_model_worker,
+                          initargs=(cfg.get('log_level', 'info'), )) as pool:
+            summaries = pool.starmap(compute_model,
+                                     zip(model_cfgs, model_names, filenames),
+                                     chunksize=1)
+        merge_provenance(cfg, model_cfgs)
+    else:
+        summaries = [
+            compute_model(cfg, model, model_files)
+            for model, model_files in zip(model_names, filenames)
+        ]
+    return {
+        key: np.array([summary[key] for summary in summaries])
+        for key in SUMMARY_SHAPES
+    }
+
 
 def main(cfg):
     """Execute the program.
@@ -260,9 +588,6 @@ def main(cfg):
     Argument cfg, containing directory paths, preprocessed input dataset
     filenames and user-defined options, is passed by ESMValTool preprocessor.
     """
-    provlog = ProvenanceLogger(cfg)
-    lorenz = lorenz_cycle
-    comp = computations
     logger.info('Entering the diagnostic tool')
     # Load paths
     wdir_up = cfg['work_dir']
@@ -279,243 +604,26 @@ def main(cfg):
     varnames = data.get_info_list('short_name')
     curr_vars = list(set(varnames))
     logger.debug(curr_vars)
-    # load user-defined options
-    lsm = str(cfg['lsm'])
-    wat = str(cfg['wat'])
-    lec = str(cfg['lec'])
-    entr = str(cfg['entr'])
-    met = str(cfg['met'])
-    flags = [wat, entr, met]
-    # Initialize multi-model arrays
-    modnum = len(model_names)
-    te_all = np.zeros(modnum)
-    toab_all = np.zeros([modnum, 2])
-    toab_oc_all = np.zeros(modnum)
-    toab_la_all = np.zeros(modnum)
-    atmb_all = np.zeros([modnum, 2])
-    atmb_oc_all = np.zeros(modnum)
-    atmb_la_all = np.zeros(modnum)
-    surb_all = np.zeros([modnum, 2])
-    surb_oc_all = np.zeros(modnum)
-    surb_la_all = np.zeros(modnum)
-    wmb_all = np.zeros([modnum, 2])
-    wmb_oc_all = np.zeros(modnum)
-    wmb_la_all = np.zeros(modnum)
-    latent_all = np.zeros([modnum, 2])
-    latent_oc_all = np.zeros(modnum)
-    latent_la_all = np.zeros(modnum)
-    baroc_eff_all = np.zeros(modnum)
-    lec_all = np.zeros([modnum, 2])
-    horzentr_all = np.zeros([modnum, 2])
-    vertentr_all = np.zeros([modnum, 2])
-    matentr_all = np.zeros([modnum, 2])
-    irrevers_all = np.zeros(modnum)
-    diffentr_all = np.zeros([modnum, 2])
+    # Reading file names for the specific models
+    filenames = [
+        data.get_info_list('filename', dataset=model) for model in model_names
+    ]
     logger.info("Entering main loop\n")
-    i_m = 0
-    for model in model_names:
-        # Load paths to individual models output and plotting directories
-        wdir = os.path.join(wdir_up, model)
-        pdir = os.path.join(pdir_up, model)
-        os.makedirs(wdir)
-        os.makedirs(pdir)
-        # Reading file names for the specific model
-        filenames = data.get_info_list('filename', dataset=model)
-        logger.info('Processing model: %s \n', model)
-        rlds_file = filenames[6]
-        rlus_file = filenames[7]
-        rsds_file = filenames[9]
-        rsus_file = filenames[11]
-        ta_file = filenames[13]
-        ts_file = filenames[15]
-        # Read path to land-sea mask
-        for filename, attributes in cfg['input_data'].items():
-            if filename == ta_file:
-                sftlf_fx = attributes['fx_files']['sftlf']
-        aux_file = wdir + '/aux.nc'
-        te_ymm_file, te_gmean_constant, _, _ = mkthe.init_mkthe(
-            model, wdir, filenames, flags)
-        te_all[i_m] = te_gmean_constant
-        logger.info('Computing energy budgets\n')
-        eb_gmean, eb_file, toab_ymm_file = comp.budgets(
-            model, wdir, aux_file, filenames)
-        prov_rec = provenance_meta.get_prov_map(
-            ['TOA energy budgets', model],
-            [filenames[10], filenames[12], filenames[8]])
-        provlog.log(eb_file[0], prov_rec)
-        prov_rec = provenance_meta.get_prov_map(
-            ['atmospheric energy budgets', model], [
-                filenames[1], filenames[6], filenames[7], filenames[8],
-                filenames[9], filenames[10], filenames[11], filenames[12]
-            ])
-        provlog.log(eb_file[1], prov_rec)
-        prov_rec = provenance_meta.get_prov_map(
-            ['surface energy budgets', model], [
-                filenames[1], filenames[6], filenames[7], filenames[9],
-                filenames[11]
-            ])
-        provlog.log(eb_file[2], prov_rec)
-        toab_all[i_m, 0] = np.nanmean(eb_gmean[0])
-        toab_all[i_m, 1] = np.nanstd(eb_gmean[0])
-        atmb_all[i_m, 0] = np.nanmean(eb_gmean[1])
-        atmb_all[i_m, 1] = np.nanstd(eb_gmean[1])
-        surb_all[i_m, 0] = np.nanmean(eb_gmean[2])
-        surb_all[i_m, 1] = np.nanstd(eb_gmean[2])
-        logger.info('Global mean emission temperature: %s\n',
-                    te_gmean_constant)
-        logger.info('TOA energy budget: %s\n', toab_all[i_m, 0])
-        logger.info('Atmospheric energy budget: %s\n', atmb_all[i_m, 0])
-        logger.info('Surface energy budget: %s\n', surb_all[i_m, 0])
-        logger.info('Done\n')
-        baroc_eff_all[i_m] = comp.baroceff(model, wdir, aux_file,
-                                           toab_ymm_file, te_ymm_file)
-        logger.info('Baroclinic efficiency (Lucarini et al., 2011): %s\n',
-                    baroc_eff_all[i_m])
-        logger.info('Running the plotting module for the budgets\n')
-        plotsmod.balances(cfg, wdir_up, pdir,
-                          [eb_file[0], eb_file[1], eb_file[2]],
-                          ['toab', 'atmb', 'surb'], model)
-        logger.info('Done\n')
-        # Water mass budget
-        if wat == 'True':
-            logger.info('Computing water mass and latent energy budgets\n')
-            _, _, _, aux_list = mkthe.init_mkthe(model, wdir, filenames, flags)
-            wm_gmean, wm_file = comp.wmbudg(model, wdir, aux_file, filenames,
-                                            aux_list)
-            wmb_all[i_m, 0] = np.nanmean(wm_gmean[0])
-            wmb_all[i_m, 1] = np.nanstd(wm_gmean[0])
-            logger.info('Water mass budget: %s\n', wmb_all[i_m, 0])
-            latent_all[i_m, 0] = np.nanmean(wm_gmean[1])
-            latent_all[i_m, 1] = np.nanstd(wm_gmean[1])
-            logger.info('Latent energy budget: %s\n', latent_all[i_m, 0])
-            logger.info('Done\n')
-            logger.info('Plotting the water mass and latent energy budgets\n')
-            plotsmod.balances(cfg, wdir_up, pdir, [wm_file[0], wm_file[1]],
-                              ['wmb', 'latent'], model)
-            logger.info('Done\n')
-            for filen in aux_list:
-                os.remove(filen)
-        if lsm == 'True':
-            logger.info('Computing energy budgets over land and oceans\n')
-            toab_oc_gmean, toab_la_gmean = comp.landoc_budg(
-                model, wdir, eb_file[0], sftlf_fx, 'toab')
-            toab_oc_all[i_m] = toab_oc_gmean
-            toab_la_all[i_m] = toab_la_gmean
-            logger.info('TOA energy budget over oceans: %s\n', toab_oc_gmean)
-            logger.info('TOA energy budget over land: %s\n', toab_la_gmean)
-            atmb_oc_gmean, atmb_la_gmean = comp.landoc_budg(
-                model, wdir, eb_file[1], sftlf_fx, 'atmb')
-            atmb_oc_all[i_m] = atmb_oc_gmean
-            atmb_la_all[i_m] = atmb_la_gmean
-            logger.info('Atmospheric energy budget over oceans: %s\n',
-                        atmb_oc_gmean)
-            logger.info('Atmospheric energy budget over land: %s\n',
-                        atmb_la_gmean)
-            surb_oc_gmean, surb_la_gmean = comp.landoc_budg(
-                model, wdir, eb_file[2], sftlf_fx, 'surb')
-            surb_oc_all[i_m] = surb_oc_gmean
-            surb_la_all[i_m] = surb_la_gmean
-            logger.info('Surface energy budget over oceans: %s\n',
-                        surb_oc_gmean)
-            logger.info('Surface energy budget over land: %s\n', surb_la_gmean)
-            logger.info('Done\n')
-            if wat == 'True':
-                logger.info('Computing water mass and latent energy'
-                            ' budgets over land and oceans\n')
-                wmb_oc_gmean, wmb_la_gmean = comp.landoc_budg(
-                    model, wdir, wm_file[0], sftlf_fx, 'wmb')
-                wmb_oc_all[i_m] = wmb_oc_gmean
-                wmb_la_all[i_m] = wmb_la_gmean
-                logger.info('Water mass budget over oceans: %s\n',
-                            wmb_oc_gmean)
-                logger.info('Water mass budget over land: %s\n', wmb_la_gmean)
-                latent_oc_gmean, latent_la_gmean = comp.landoc_budg(
-                    model, wdir, wm_file[1], sftlf_fx, 'latent')
-                latent_oc_all[i_m] = latent_oc_gmean
-                latent_la_all[i_m] = latent_la_gmean
-                logger.info('Latent energy budget over oceans: %s\n',
-                            latent_oc_gmean)
-                logger.info('Latent energy budget over land: %s\n',
-                            latent_la_gmean)
-                logger.info('Done\n')
-        if lec == 'True':
-            logger.info('Computation of the Lorenz Energy '
-                        'Cycle (year by year)\n')
-            lect = lorenz.preproc_lec(model, wdir, pdir, filenames)
-            lec_all[i_m, 0] = np.nanmean(lect)
-            lec_all[i_m, 1] = np.nanstd(lect)
-            logger.info(
-                'Intensity of the annual mean Lorenz Energy '
-                'Cycle: %s\n', lec_all[i_m, 0])
-            logger.info('Done\n')
-        else:
-            lect = np.repeat(2.0, len(eb_gmean[0]))
-            lec_all[i_m, 0] = 2.0
-            lec_all[i_m, 1] = 0.2
-        if entr == 'True':
-            if met in {'1', '3'}:
-                _, _, te_file, _ = mkthe.init_mkthe(model, wdir, filenames,
-                                                    flags)
-                logger.info('Computation of the material entropy production '
-                            'with the indirect method\n')
-                indentr_list = [
-                    rlds_file, rlus_file, rsds_file, rsus_file, te_file,
-                    eb_file[0], ts_file
-                ]
-                horz_mn, vert_mn, horzentr_file, vertentr_file = comp.indentr(
-                    model, wdir, indentr_list, aux_file, eb_gmean[0])
-                listind = [horzentr_file, vertentr_file]
-                provenance_meta.meta_indentr(cfg, model, filenames, listind)
-                horzentr_all[i_m, 0] = np.nanmean(horz_mn)
-                horzentr_all[i_m, 1] = np.nanstd(horz_mn)
-                vertentr_all[i_m, 0] = np.nanmean(vert_mn)
-                vertentr_all[i_m, 1] = np.nanstd(vert_mn)
-                logger.info(
-                    'Horizontal component of the material entropy '
-                    'production: %s\n', horzentr_all[i_m, 0])
-                logger.info(
-                    'Vertical component of the material entropy '
-                    'production: %s\n', vertentr_all[i_m, 0])
-                logger.info('Done\n')
-                logger.info('Running the plotting module for the material '
-                            'entropy production (indirect method)\n')
-                plotsmod.entropy(pdir, vertentr_file, 'sver',
-                                 'Vertical entropy production', model)
-                os.remove(te_file)
-                logger.info('Done\n')
-            if met in {'2', '3'}:
-                matentr, irrevers, entr_list = comp.direntr(
-                    logger, model, wdir, filenames, aux_file, lect, lec, flags)
-                provenance_meta.meta_direntr(cfg, model, filenames, entr_list)
-                matentr_all[i_m, 0] = matentr
-                if met in {'3'}:
-                    diffentr = (float(np.nanmean(vert_mn)) + float(
-                        np.nanmean(horz_mn)) - matentr)
-                    logger.info('Difference between the two '
-                                'methods: %s\n', diffentr)
-                    diffentr_all[i_m, 0] = diffentr
-                logger.info('Degree of irreversibility of the '
-                            'system: %s\n', irrevers)
-                irrevers_all[i_m] = irrevers
-                logger.info('Running the plotting module for the material '
-                            'entropy production (direct method)\n')
-                plotsmod.init_plotentr(model, pdir, entr_list)
-                logger.info('Done\n')
-        os.remove(te_ymm_file)
-        logger.info('Done for model: %s \n', model)
-        i_m = i_m + 1
+    summary_all = compute_models(cfg, model_names, filenames)
     logger.info('I will now start multi-model plots')
     logger.info('Meridional heat transports\n')
     plotsmod.plot_mm_transp(model_names, wdir_up, pdir_up)
     logger.info('Scatter plots')
     summary_varlist = [
-        atmb_all, baroc_eff_all, horzentr_all, lec_all, matentr_all, te_all,
-        toab_all, vertentr_all
+        summary_all[key] for key in [
+            'atmb', 'baroc_eff', 'horzentr', 'lec', 'matentr', 'te', 'toab',
+            'vertentr'
+        ]
     ]
     plotsmod.plot_mm_summaryscat(pdir_up, summary_varlist)
     logger.info('Scatter plots for inter-annual variability of'
                 ' some quantities')
-    eb_list = [toab_all, atmb_all, surb_all]
+    eb_list = [summary_all['toab'], summary_all['atmb'], summary_all['surb']]
     plotsmod.plot_mm_ebscatter(pdir_up, eb_list)
     logger.info("The diagnostic has finished. Now closing...\n")
 
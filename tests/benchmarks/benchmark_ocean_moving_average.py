@@ -0,0 +1,70 @@
+"""Benchmark of the moving average of the ocean time series diagnostic.
+
+Compare :func:`esmvaltool.diag_scripts.ocean.diagnostic_timeseries.
+moving_average` with the previous implementation, which masked the whole
+time series for each time point. Run with::
+
+    python tests/benchmarks/benchmark_ocean_moving_average.py
+
+"""
+import timeit
+
+import iris
+import numpy as np
+from cf_units import Unit
+
+from esmvaltool.diag_scripts.ocean import diagnostic_timeseries as dts
+from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
+
+
+def moving_average_reference(cube, window):
+    """Calculate a moving average as the previous implementation."""
+    window = window.split()
+    window_len = int(window[0]) / 2.
+    times = cube.coord('time').units.num2date(cube.coord('time').points)
+    datetime = diagtools.guess_calendar_datetime(cube)
+    output = []
+    times = np.array([
+        datetime(time_itr.year, time_itr.month, time_itr.day, time_itr.hour,
+                 time_itr.minute) for time_itr in times
+    ])
+    for time_itr in times:
+        tmin = datetime(time_itr.year - window_len, time_itr.month,
+                        time_itr.day, time_itr.hour, time_itr.minute)
+        tmax = datetime(time_itr.year + window_len, time_itr.month,
+                        time_itr.day, time_itr.hour, time_itr.minute)
+        arr = np.ma.masked_where((times < tmin) + (times > tmax), cube.data)
+        output.append(arr.mean())
+    cube.data = np.array(output)
+    return cube
+
+
+def get_cube(nyears):
+    """Get a monthly time series in the 360 day calendar."""
+    ntime = 12 * nyears
+    time = iris.coords.DimCoord(
+        np.arange(ntime) * 30. + 15.,
+        standard_name='time',
+        units=Unit('days since 1850-01-01', calendar='360_day'))
+    return iris.cube.Cube(
+        np.random.RandomState(0).normal(size=ntime),
+        dim_coords_and_dims=[(time, 0)])
+
+
+def main():
+    """Print the run times of both implementations."""
+    print('{:>8} {:>12} {:>12}'.format('years', 'previous', 'current'))
+    for nyears in [50, 100, 200, 500]:
+        cube = get_cube(nyears)
+        times = []
+        results = []
+        for func in (moving_average_reference, dts.moving_average):
+            start = timeit.default_timer()
+            results.append(func(cube.copy(), '6 years').data)
+            times.append(timeit.default_timer() - start)
+        np.testing.assert_allclose(results[1], results[0])
+        print('{:>8} {:>11.4f}s {:>11.4f}s'.format(nyears, *times))
+
+
+if __name__ == '__main__':
+    main()
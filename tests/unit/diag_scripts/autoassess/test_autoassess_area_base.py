@@ -0,0 +1,105 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.autoassess.autoassess_area_base`."""  # noqa
+import logging
+import os
+
+import iris
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.autoassess import autoassess_area_base
+
+
+def _write_files(tmpdir):
+    """Write two single variable files."""
+    filelist = []
+    for name in ('ta', 'ua'):
+        cube = iris.cube.Cube(np.arange(4.), var_name=name, units='1')
+        filename = str(tmpdir.join(name + '.nc'))
+        iris.save(cube, filename)
+        filelist.append(filename)
+    return filelist
+
+
+def test_process_metrics_data(tmpdir):
+    """Test that the cubeList is written once and linked for supermeans."""
+    filelist = _write_files(tmpdir)
+    suites = {'exp_model': str(tmpdir.mkdir('exp'))}
+    smeans = {'exp_model': str(tmpdir.mkdir('exp_supermeans'))}
+    paths = autoassess_area_base._process_metrics_data(
+        {'exp_model': filelist, 'control_model': []}, suites, smeans)
+    assert paths == [os.path.join(suites['exp_model'], 'cubeList.nc')]
+    smean_path = os.path.join(smeans['exp_model'], 'cubeList.nc')
+    assert os.path.samefile(paths[0], smean_path)
+    cubes = iris.load(smean_path)
+    assert sorted(cube.var_name for cube in cubes) == ['ta', 'ua']
+    assert os.path.exists(
+        os.path.join(suites['exp_model'], 'cubeList_manifest.yml'))
+
+
+def test_save_cubelist_reuse(tmpdir, monkeypatch):
+    """Test that unchanged inputs are not concatenated again."""
+    filelist = _write_files(tmpdir)
+    path = str(tmpdir.join('cubeList.nc'))
+    loaded = []
+    load = iris.load
+
+    def _load(*args):
+        loaded.append(args)
+        return load(*args)
+
+    monkeypatch.setattr(autoassess_area_base.iris, 'load', _load)
+    for reuse in (True, True, False):
+        autoassess_area_base._save_cubelist(filelist, path, reuse=reuse)
+    assert len(loaded) == 2
+    os.utime(filelist[0], (0., 0.))
+    autoassess_area_base._save_cubelist(filelist, path, reuse=True)
+    assert len(loaded) == 3
+    assert autoassess_area_base._get_manifest(filelist)[filelist[0]][1] == 0.
+
+
+def _metric_a(run):
+    """Return a metric of the suite."""
+    return {'b': run['runid'], 'a': 1.}
+
+
+def _metric_b(_):
+    """Return another metric."""
+    return {'c': 2.}
+
+
+def test_calculate_suite_metrics(tmpdir, monkeypatch):
+    """Test that the metrics are collected in order and timed."""
+    area_package = type('area', (), {})
+    area_package.metrics_functions = [_metric_a, _metric_b]
+    monkeypatch.setattr(autoassess_area_base, '_import_package',
+                        lambda area: area_package)
+    metrics, timings = autoassess_area_base._calculate_suite_metrics({
+        '_area': 'stratosphere',
+        'runid': 'suite'
+    })
+    assert list(metrics.items()) == [('b', 'suite'), ('a', 1.), ('c', 2.)]
+    assert [name for name, _ in timings] == ['_metric_a', '_metric_b']
+    autoassess_area_base._write_suite_metrics(str(tmpdir), metrics, timings)
+    assert tmpdir.join('metrics.csv').read().splitlines() == [
+        'b,suite', 'a,1.0', 'c,2.0'
+    ]
+    assert len(tmpdir.join('metrics_timings.csv').readlines()) == 2
+
+    area_package.metrics_functions = [_metric_b, _metric_b]
+    with pytest.raises(AssertionError):
+        autoassess_area_base._calculate_suite_metrics({
+            '_area': 'stratosphere',
+            'runid': 'suite'
+        })
+
+
+def test_init_metrics_worker(monkeypatch):
+    """Test that the worker processes log like the diagnostic."""
+    root = logging.getLogger()
+    monkeypatch.setattr(root, 'level', root.level)
+    monkeypatch.setattr(logging.Formatter, 'converter',
+                        logging.Formatter.converter)
+    autoassess_area_base._init_metrics_worker('debug')
+    assert root.level == logging.DEBUG
+    assert root.handlers
+    logging.captureWarnings(False)
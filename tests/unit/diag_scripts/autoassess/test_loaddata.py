@@ -0,0 +1,130 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.autoassess.loaddata`."""
+import datetime
+import os
+
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+from cf_units import Unit
+
+from esmvaltool.diag_scripts.autoassess import loaddata
+
+
+def _get_cube(name, stash, interval, days_per_step=30.):
+    """Get a monthly zonal mean cube on two pressure levels."""
+    bounds = days_per_step * np.array([[i, i + 1] for i in range(24)])
+    time = iris.coords.DimCoord(
+        bounds.mean(axis=1),
+        bounds=bounds,
+        standard_name='time',
+        units=Unit('days since 2000-01-01', calendar='360_day'))
+    pressure = iris.coords.DimCoord([100., 50.],
+                                    long_name='pressure',
+                                    units='hPa')
+    cube = iris.cube.Cube(np.arange(48.).reshape(24, 2),
+                          standard_name=name,
+                          units='1',
+                          dim_coords_and_dims=[(time, 0), (pressure, 1)],
+                          attributes={'STASH': stash})
+    cube.add_cell_method(
+        iris.coords.CellMethod('mean', 'time', intervals=interval))
+    return cube
+
+
+@pytest.fixture
+def run_object(tmpdir, monkeypatch):
+    """Write a cubeList file and return the run object to read it."""
+    monkeypatch.setattr(loaddata, 'CUBELISTS', {})
+    cubes = iris.cube.CubeList([
+        _get_cube('eastward_wind', 'm01s30i201', '1 hour'),
+        _get_cube('air_temperature', 'm01s30i204', '1 hour'),
+        _get_cube('air_temperature', 'm01s30i294', '6 hour'),
+    ])
+    tmpdir.mkdir('run').mkdir('area')
+    iris.save(cubes, str(tmpdir.join('run', 'area', 'cubeList.nc')))
+    return {
+        'data_root': str(tmpdir),
+        'runid': 'run',
+        '_area': 'area',
+        'from_monthly': datetime.date(2000, 1, 1),
+        'to_monthly': datetime.date(2000, 12, 30),
+    }
+
+
+@pytest.mark.parametrize('days_per_step,periods', [
+    (24., ['daily']),
+    (1., []),
+    (30., ['monthly']),
+    (90., ['seasonal']),
+    (360., ['annual']),
+])
+def test_averaging_periods(days_per_step, periods):
+    """Test the classification of the time bounds."""
+    cube = _get_cube('air_temperature', 'm01s30i204', '1 hour',
+                     days_per_step=days_per_step)
+    result = [
+        period for period, is_period in [
+            ('daily', loaddata.is_daily),
+            ('monthly', loaddata.is_monthly),
+            ('seasonal', loaddata.is_seasonal),
+            ('annual', loaddata.is_yearly),
+        ] if is_period(cube)
+    ]
+    assert result == periods
+
+
+def test_load_run_ss(run_object, monkeypatch):
+    """Test that the cubeList is loaded once and is not modified."""
+    loaded = []
+    load = iris.load
+
+    def _load(*args):
+        loaded.append(args)
+        return load(*args)
+
+    monkeypatch.setattr(loaddata.iris, 'load', _load)
+    for _ in range(2):
+        cube = loaddata.load_run_ss(run_object, 'monthly', 'eastward_wind',
+                                    lbmon=[1, 7], lblev=[50.])
+        assert cube.standard_name == 'eastward_wind'
+        assert cube.coord('month_number').points.tolist() == [1, 7]
+        assert cube.coord('pressure').points.tolist() == [50.]
+    assert len(loaded) == 1
+    cubes, _ = loaddata.CUBELISTS[os.path.join(run_object['data_root'], 'run',
+                                               'area', 'cubeList.nc')][1:]
+    assert not any(cube.coords('month_number') for cube in cubes)
+
+
+def test_load_run_ss_selection(run_object):
+    """Test the selection by STASH code and initial meaning period."""
+    cube = loaddata.load_run_ss(run_object, 'monthly', 'm01s30i204')
+    assert cube.cell_methods[0].intervals == ('1 hour', )
+    cube = loaddata.load_run_ss(run_object, 'monthly', 'air_temperature',
+                                lbtim=[622])
+    assert cube.cell_methods[0].intervals == ('6 hour', )
+    with pytest.raises(AssertionError, match='More than one cube found'):
+        loaddata.load_run_ss(run_object, 'monthly', 'air_temperature')
+    with pytest.raises(NotImplementedError):
+        loaddata.load_run_ss(run_object, 'monthly', 'air_temperature',
+                             lbtim=[123])
+
+
+def test_select_indexed_cubes_lazy(monkeypatch):
+    """Test that checking the averaging period keeps the cached data lazy."""
+
+    def _annual_mean(cube):
+        """Realize the data, like `aggregated_by` does on iris 2."""
+        cube.data = np.asarray(cube.data)
+        return cube
+
+    monkeypatch.setattr(loaddata, 'annual_mean', _annual_mean)
+    cube = _get_cube('eastward_wind', 'm01s30i201', '1 hour')
+    cube.data = da.from_array(cube.data, chunks=cube.shape)
+    cubes = iris.cube.CubeList([cube])
+    index = loaddata.index_cubes(cubes)
+    selected = loaddata._select_indexed_cubes(cubes, index, 'annual',
+                                              'eastward_wind', None, None)
+    assert not selected
+    assert index['descriptors'][0]['averaging_periods'] == {'annual': False}
+    assert cube.has_lazy_data()
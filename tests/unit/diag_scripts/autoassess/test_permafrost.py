@@ -0,0 +1,59 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.autoassess.land_surface_permafrost.permafrost`."""  # noqa
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.autoassess.land_surface_permafrost import \
+    permafrost
+
+
+def _num_frozen(data, threshold, frozen_length):
+    """Count frozen points of a 1D sequence with a loop over all windows."""
+    frozen = data < threshold
+    return sum(
+        frozen[i:i + frozen_length].all()
+        for i in range(len(data) - frozen_length + 1))
+
+
+@pytest.mark.parametrize('frozen_length', [1, 3, 24, 40])
+def test_num_frozen(frozen_length):
+    """Test the counts of frozen points along an axis."""
+    rng = np.random.RandomState(0)
+    data = 273.2 + rng.normal(-1., 2., size=(5, 36, 4))
+    result = permafrost.num_frozen(data, 273.2, -2, frozen_length)
+    assert result.shape == (5, 4)
+    for i, j in np.ndindex(result.shape):
+        assert result[i, j] == _num_frozen(data[i, :, j], 273.2,
+                                           frozen_length)
+
+
+def test_num_frozen_masked():
+    """Test that windows without valid points are not counted."""
+    data = np.ma.masked_array(
+        np.full((2, 6), 270.),
+        mask=[[True, True, False, True, True, True], [True] * 6])
+    result = permafrost.num_frozen(data, 273.2, 1, 2)
+    np.testing.assert_array_equal(np.ma.getmaskarray(result), [False, True])
+    assert result[0] == 2
+
+
+def test_num_frozen_lazy():
+    """Test that counts of lazy cubes are computed lazily."""
+    rng = np.random.RandomState(0)
+    data = 273.2 + rng.normal(-1., 2., size=(48, 3))
+    time = iris.coords.DimCoord(np.arange(48.),
+                                standard_name='time',
+                                units='days since 2000-01-01')
+    cube = iris.cube.Cube(da.from_array(data, chunks=(10, 3)),
+                          dim_coords_and_dims=[(time, 0)])
+    frozen_count = iris.analysis.Aggregator('frozen_count',
+                                            permafrost.num_frozen,
+                                            lazy_func=permafrost.num_frozen)
+    result = cube.collapsed('time',
+                            frozen_count,
+                            threshold=273.2,
+                            frozen_length=4)
+    assert result.has_lazy_data()
+    np.testing.assert_array_equal(
+        result.data, permafrost.num_frozen(data, 273.2, 0, 4))
@@ -0,0 +1,84 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.autoassess.stratosphere.strat_metrics_1`."""  # noqa
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.autoassess.stratosphere import strat_metrics_1
+
+
+class _Cube:
+    """Minimal stand-in for a QBO timeseries cube."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _get_winds(period, amplitude=20., n_times=120):
+    """Get a sinusoidal QBO timeseries."""
+    return amplitude * np.sin(2 * np.pi * (np.arange(n_times) + 0.5) / period)
+
+
+def test_find_zero_crossings():
+    """Test zero crossings which include zero."""
+    array = [1., 2., 0., -1., -2., 0., 0., 3., -1., 0., 1.]
+    last_pos, last_neg = strat_metrics_1.find_zero_crossings(array)
+    assert last_pos == [2, 7]
+    assert last_neg == [9]
+
+
+def test_get_zero_crossings_axis():
+    """Test that the zero crossings are found along any axis."""
+    array = np.array([[1., -1., 0., 1.], [-1., 0., 1., 1.]])
+    last_pos, last_neg = strat_metrics_1.get_zero_crossings(array.T, axis=0)
+    np.testing.assert_array_equal(last_pos.T, [[1, 0, 0], [0, 0, 0]])
+    np.testing.assert_array_equal(last_neg.T, [[0, 0, 1], [0, 1, 0]])
+
+
+def test_calc_qbo_index():
+    """Test the QBO indices of a single timeseries."""
+    winds = _get_winds(28.)
+    winds[winds < 0.] *= 0.5
+    period, ampl_west, ampl_east = strat_metrics_1.calc_qbo_index(
+        _Cube(winds))
+    assert period == pytest.approx(28.)
+    assert ampl_west == pytest.approx(0.5 * ampl_east)
+    assert ampl_east == pytest.approx(20., rel=0.01)
+
+
+def test_calc_qbo_indices():
+    """Test the QBO indices of N-D arrays of noisy timeseries.
+
+    The expected values were computed with the previous implementation of
+    calc_qbo_index, which looped over the zero crossings of each timeseries.
+    """
+    periods = np.array([[10., 14., 20.], [24., 28., 40.]])
+    winds = np.stack([_get_winds(period) for period in periods.ravel()])
+    winds = winds.reshape(periods.shape + (-1, ))
+    winds += np.random.RandomState(0).normal(scale=0.5, size=winds.shape)
+    ampl_west = np.array([
+        [19.887224262832692, 20.105796052646518, 20.06785396982007],
+        [20.301173836384645, 20.53953327654873, 20.36575122947194],
+    ])
+    ampl_east = np.array([
+        [19.881322453861284, 20.055998626285106, 19.840902588601857],
+        [20.161570570776295, 20.232221203912754, 20.92159380747964],
+    ])
+    result = strat_metrics_1.calc_qbo_indices(np.moveaxis(winds, -1, 1),
+                                              axis=1)
+    np.testing.assert_allclose(result[0], periods, rtol=1e-12)
+    np.testing.assert_allclose(result[1], ampl_west, rtol=1e-12)
+    np.testing.assert_allclose(result[2], ampl_east, rtol=1e-12)
+    for index in np.ndindex(periods.shape):
+        period, west, east = strat_metrics_1.calc_qbo_index(
+            _Cube(winds[index]))
+        assert period == pytest.approx(periods[index], rel=1e-12)
+        assert west == pytest.approx(ampl_west[index], rel=1e-12)
+        assert east == pytest.approx(ampl_east[index], rel=1e-12)
+
+
+def test_calc_qbo_indices_no_oscillation():
+    """Test the QBO indices of timeseries without zero crossings."""
+    winds = np.stack([np.full(24, 5.), _get_winds(12., n_times=24)])
+    period, ampl_west, ampl_east = strat_metrics_1.calc_qbo_indices(winds)
+    np.testing.assert_allclose(period, [0., 12.])
+    assert ampl_west[0] == 0.
+    assert ampl_east[0] == 0.
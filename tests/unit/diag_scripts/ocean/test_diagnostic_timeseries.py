@@ -0,0 +1,83 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.ocean.diagnostic_timeseries`."""  # noqa
+
+import cftime
+import iris
+import numpy as np
+import pytest
+from cf_units import Unit
+
+from esmvaltool.diag_scripts.ocean import diagnostic_timeseries as dts
+
+
+def _get_cube(ntime, calendar='360_day', daily=False, shape=(),
+              masked=False):
+    """Get a cube with a monthly or daily time series starting in 1850."""
+    rng = np.random.RandomState(ntime)
+    data = rng.normal(size=(ntime, ) + shape)
+    if masked:
+        data = np.ma.masked_where(rng.uniform(size=data.shape) < 0.2, data)
+    units = Unit('days since 1850-01-01', calendar=calendar)
+    if daily:
+        points = np.arange(ntime) + 0.5
+    else:
+        points = units.date2num([
+            cftime.datetime(1850 + i // 12, i % 12 + 1, 15, calendar=calendar)
+            for i in range(ntime)
+        ])
+    time = iris.coords.DimCoord(points, standard_name='time', units=units)
+    dim_coords = [(time, 0)]
+    for i, length in enumerate(shape):
+        dim_coords.append((iris.coords.DimCoord(
+            np.arange(length), long_name='x{}'.format(i)), i + 1))
+    return iris.cube.Cube(data, dim_coords_and_dims=dim_coords)
+
+
+def _month_window_mean(cube, months):
+    """Compute a moving average over a number of months per time point."""
+    data = cube.data
+    result = []
+    for index in range(cube.shape[0]):
+        window = data[max(index - months, 0):index + months + 1]
+        result.append(np.ma.mean(window, axis=0))
+    return np.ma.array(result)
+
+
+@pytest.mark.parametrize('calendar',
+                         ['360_day', 'noleap', 'proleptic_gregorian'])
+@pytest.mark.parametrize('window,months', [('6 years', 36), ('5 yr', 30),
+                                           ('12 months', 6)])
+def test_moving_average_months(calendar, window, months):
+    """Test moving averages of monthly data."""
+    cube = _get_cube(240, calendar)
+    expected = _month_window_mean(cube, months)
+    result = dts.moving_average(cube, window)
+    np.testing.assert_allclose(result.data, expected)
+
+
+def test_moving_average_days():
+    """Test moving averages of daily data."""
+    cube = _get_cube(100, 'noleap', daily=True)
+    times = cube.coord('time').points
+    expected = [
+        cube.data[(times >= time - 5.) & (times <= time + 5.)].mean()
+        for time in times
+    ]
+    result = dts.moving_average(cube, '10 days')
+    np.testing.assert_allclose(result.data, expected)
+
+
+def test_moving_average_masked_multidim():
+    """Test moving averages of masked data along the time dimension."""
+    cube = _get_cube(60, shape=(2, 3), masked=True)
+    cube.data[:, 0, 0] = np.ma.masked
+    expected = _month_window_mean(cube, 12)
+    result = dts.moving_average(cube, '2 years')
+    np.testing.assert_allclose(result.data, expected)
+    assert np.array_equal(np.ma.getmaskarray(result.data),
+                          np.ma.getmaskarray(expected))
+
+
+def test_moving_average_wrong_units():
+    """Test moving averages with unknown window units."""
+    with pytest.raises(ValueError):
+        dts.moving_average(_get_cube(12), '3 weeks')
@@ -0,0 +1,137 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.ocean.diagnostic_tools`."""  # noqa
+
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+from cf_units import Unit
+
+from esmvaltool.diag_scripts.ocean import diagnostic_tools as diagtools
+
+
+def _get_cube(points, units):
+    """Get a cube with a time coordinate."""
+    time = iris.coords.DimCoord(points, standard_name='time', units=units)
+    return iris.cube.Cube(
+        np.zeros(len(points)), dim_coords_and_dims=[(time, 0)])
+
+
+@pytest.mark.parametrize('calendar,year_length', [
+    ('360_day', 360.),
+    ('noleap', 365.),
+    ('proleptic_gregorian', 366.),
+])
+def test_cube_time_to_float(calendar, year_length):
+    """Test the decimal time in calendars with different year lengths."""
+    units = Unit('hours since 2000-01-01', calendar=calendar)
+    points = np.array([0., 12., 24. * year_length, 24. * year_length + 36.])
+    result = diagtools.cube_time_to_float(_get_cube(points, units))
+    expected = [
+        2000., 2000. + 0.5 / year_length, 2001.,
+        2001. + 1.5 / (year_length - 1. if year_length == 366. else
+                       year_length)
+    ]
+    np.testing.assert_allclose(result, expected)
+
+
+def test_cube_time_to_float_cache():
+    """Test that the decimal times of identical time axes are cached."""
+    units = Unit('days since 1850-01-01', calendar='360_day')
+    points = np.arange(24) * 30. + 15.
+    cube = _get_cube(points, units)
+    result = diagtools.cube_time_to_float(cube)
+    assert len(diagtools.DECIMAL_TIMES) >= 1
+    result[0] = 0.
+    assert diagtools.cube_time_to_float(cube.copy())[0] == 1850. + 15. / 360.
+    other = _get_cube(points + 1., units)
+    assert diagtools.cube_time_to_float(other)[0] == 1850. + 16. / 360.
+
+
+def _get_map_cube(data):
+    """Get a cube with (possibly lazy) data and no coordinates."""
+    return iris.cube.Cube(data, var_name='tos')
+
+
+def test_get_cube_statistics():
+    """Test the lazy statistics of several cubes."""
+    values = np.ma.masked_greater(np.arange(100.).reshape(10, 10), 89.)
+    cube = _get_map_cube(da.from_array(values, chunks=(3, 4)))
+    diff = cube - _get_map_cube(np.full((10, 10), 50.))
+    result = diagtools.get_cube_statistics([cube, diff],
+                                           percentiles=(10., 50.),
+                                           realise=True)
+    assert result[0]['min'] == 0.
+    assert result[0]['max'] == 89.
+    np.testing.assert_allclose(result[0]['percentiles'],
+                               np.percentile(values.compressed(), [10., 50.]))
+    assert result[1]['min'] == -50.
+    assert result[1]['max'] == 39.
+    assert not cube.has_lazy_data()
+    assert not diff.has_lazy_data()
+    np.testing.assert_array_equal(diff.data.mask, values.mask)
+    assert diagtools.get_cube_range([cube, diff]) == [-50., 89.]
+    assert diagtools.get_cube_range_diff([diff]) == [-50., 50.]
+
+
+def test_get_cube_statistics_memoized():
+    """Test that the statistics are only computed once for each cube."""
+    cube = _get_map_cube(da.arange(10., chunks=3))
+    first = diagtools.get_cube_statistics([cube])[0]
+    assert id(cube) in diagtools.CUBE_STATISTICS
+    diagtools.CUBE_STATISTICS[id(cube)]['max'] = 99.
+    assert diagtools.get_cube_statistics([cube])[0] == {
+        'min': first['min'],
+        'max': 99.
+    }
+    assert cube.has_lazy_data()
+    assert diagtools.get_array_range([np.arange(5.), np.ones(3)]) == [0., 4.]
+    key = id(cube)
+    del cube
+    assert key not in diagtools.CUBE_STATISTICS
+
+
+def _plot_task(number, text):
+    """Open a figure and return the task arguments."""
+    diagtools.plt.figure()
+    return number, text
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_run_plot_tasks(n_workers):
+    """Test that the plot tasks return their results in order."""
+    tasks = [(_plot_task, (number, str(number))) for number in range(5)]
+    result = diagtools.run_plot_tasks({'n_workers': n_workers}, tasks)
+    assert result == [(number, str(number)) for number in range(5)]
+    assert diagtools.plt.get_fignums() == []
+
+
+def test_iterate_cube_layers(monkeypatch):
+    """Test that each file is loaded once and its layers are extracted."""
+    depth = iris.coords.DimCoord([5., 50.], standard_name='depth', units='m')
+    cubes = {
+        'a.nc':
+        iris.cube.Cube(da.arange(6.).reshape(2, 3),
+                       var_name='thetao',
+                       dim_coords_and_dims=[(depth, 0)]),
+        'b.nc':
+        iris.cube.Cube(da.arange(3.), var_name='thetao'),
+    }
+    loaded = []
+
+    def _load_cube(filename):
+        loaded.append(filename)
+        return cubes[filename]
+
+    monkeypatch.setattr(diagtools.iris, 'load_cube', _load_cube)
+    layers = {}
+    for layer, layer_cubes in diagtools.iterate_cube_layers(
+            {'b.nc': {}, 'a.nc': {}}):
+        for filename, cube in layer_cubes.items():
+            layers.setdefault(layer, {})[filename] = cube.data.tolist()
+    assert loaded == ['a.nc', 'b.nc']
+    assert layers == {
+        5.: {'a.nc': [0., 1., 2.]},
+        50.: {'a.nc': [3., 4., 5.]},
+        '': {'b.nc': [0., 1., 2.]},
+    }
+    assert all(cube.has_lazy_data() for cube in cubes.values())
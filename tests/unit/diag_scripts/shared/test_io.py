@@ -4,6 +4,7 @@ import os
 from collections import OrderedDict
 from copy import deepcopy
 
+import dask.array as da
 import iris
 import mock
 import numpy as np
@@ -449,6 +450,47 @@ def test_save_1d_data(mock_logger, mock_save, var_attrs, attrs):
         assert mock_save.call_args_list == [mock.call(new_cube, PATH)]
 
 
+def test_save_1d_data_lazy(tmp_path):
+    """Test that lazy 1D data is not realized before it is written."""
+    path = str(tmp_path / 'lazy_1d.nc')
+    coords = [
+        iris.coords.DimCoord([0.0, 1.0, 2.0], long_name='x'),
+        iris.coords.DimCoord([1.0, 3.0], long_name='x'),
+    ]
+    cubes = OrderedDict([
+        ('model1',
+         iris.cube.Cube(da.ma.masked_invalid(da.from_array(
+             [1.0, np.nan, 3.0])),
+                        var_name='xy',
+                        units='kg',
+                        dim_coords_and_dims=[(coords[0], 0)])),
+        ('model2',
+         iris.cube.Cube(da.arange(2.0),
+                        var_name='xy',
+                        units='kg',
+                        dim_coords_and_dims=[(coords[1], 0)])),
+    ])
+    saved = []
+    save = iris.save
+
+    def _save(cube, *args, **kwargs):
+        saved.append(cube.has_lazy_data())
+        save(cube, *args, **kwargs)
+
+    with mock.patch.object(io.iris, 'save', side_effect=_save):
+        io.save_1d_data(cubes, path, 'x', {
+            'short_name': 'xy',
+            'long_name': 'XY',
+            'units': 'kg'
+        })
+    assert saved == [True]
+    assert all(cube.has_lazy_data() for cube in cubes.values())
+    new_cube = iris.load_cube(path)
+    np.testing.assert_array_equal(
+        np.ma.filled(new_cube.data, -1.0),
+        [[1.0, -1.0, 3.0, -1.0], [-1.0, 0.0, -1.0, 1.0]])
+
+
 CUBELIST = [
     iris.cube.Cube(1),
     iris.cube.Cube(2, attributes={
@@ -480,6 +522,106 @@ def test_iris_save(mock_logger, mock_save, source, output):
     mock_logger.info.assert_called_once()
 
 
+INVALID_NETCDF_OPTIONS = [
+    {'compression': 'gzip'},
+    {'netcdf_format': 'HDF5'},
+    {'complevel': 10},
+    {'complevel': -1},
+]
+
+
+@pytest.mark.parametrize('options', INVALID_NETCDF_OPTIONS)
+def test_invalid_netcdf_options(options):
+    """Test invalid options for writing netcdf files."""
+    with pytest.raises(ValueError):
+        io.get_netcdf_options(**options)
+    with pytest.raises(ValueError):
+        io.set_netcdf_options(**options)
+    with pytest.raises(ValueError):
+        io.set_netcdf_options({'netcdf_options': options})
+
+
+@mock.patch.object(io, '_GLOBAL_NETCDF_OPTIONS', {})
+def test_set_netcdf_options():
+    """Test setting of global netcdf options."""
+    assert io.get_netcdf_options() == {}
+    cfg = {'netcdf_options': {'zlib': True, 'complevel': 2}}
+    io.set_netcdf_options(cfg)
+    assert io.get_netcdf_options() == {'zlib': True, 'complevel': 2}
+    assert io.get_netcdf_options(complevel=9, shuffle=False) == {
+        'zlib': True,
+        'complevel': 9,
+        'shuffle': False,
+    }
+    io.set_netcdf_options(cfg, netcdf_format='NETCDF4_CLASSIC', complevel=5)
+    assert io.get_netcdf_options() == {
+        'zlib': True,
+        'complevel': 5,
+        'netcdf_format': 'NETCDF4_CLASSIC',
+    }
+    io.set_netcdf_options({'netcdf_options': None})
+    assert io.get_netcdf_options() == {}
+
+
+CHUNK_CUBE = iris.cube.Cube(
+    np.zeros((10, 3, 4)),
+    dim_coords_and_dims=[
+        (iris.coords.DimCoord(np.arange(10.0), long_name='time'), 0),
+        (iris.coords.DimCoord(np.arange(3.0), long_name='lat'), 1),
+        (iris.coords.DimCoord(np.arange(4.0), long_name='lon'), 2),
+    ],
+)
+CHUNKSIZES = [
+    ([CHUNK_CUBE], {'time': 5}, (5, 3, 4)),
+    ([CHUNK_CUBE], {'time': 20, 'lon': 2, 'x': 1}, (10, 3, 2)),
+    ([CHUNK_CUBE], (1, 3, 0), (1, 3, 1)),
+    ([CHUNK_CUBE], (1, 3), None),
+    ([CHUNK_CUBE, CHUNK_CUBE[:5]], {'time': 5}, (5, 3, 4)),
+    ([CHUNK_CUBE, CHUNK_CUBE[:, 0]], {'time': 5}, None),
+    ([iris.cube.Cube(0.0)], {'time': 5}, None),
+]
+
+
+@pytest.mark.parametrize('cubes,chunksizes,output', CHUNKSIZES)
+def test_get_chunksizes(cubes, chunksizes, output):
+    """Test determination of chunk sizes."""
+    assert io._get_chunksizes(cubes, chunksizes) == output
+
+
+@mock.patch.object(io, '_GLOBAL_NETCDF_OPTIONS', {'zlib': True})
+@mock.patch('esmvaltool.diag_scripts.shared.io.iris.save', autospec=True)
+def test_iris_save_netcdf_options(mock_save):
+    """Test iris save function with netcdf options."""
+    cube = CHUNK_CUBE.copy()
+    io.iris_save(cube, PATH, chunksizes={'time': 2}, complevel=None)
+    assert mock_save.call_args_list == [
+        mock.call(cube, PATH, zlib=True, chunksizes=(2, 3, 4))
+    ]
+    mock_save.reset_mock()
+    io.iris_save(cube, PATH, zlib=False, unlimited_dimensions=['time'])
+    assert mock_save.call_args_list == [
+        mock.call(cube, PATH, zlib=False, unlimited_dimensions=['time'])
+    ]
+
+
+def test_iris_save_lazy(tmp_path):
+    """Test writing of lazy data with netcdf options."""
+    path = str(tmp_path / 'lazy.nc')
+    cube = CHUNK_CUBE.copy(da.arange(120.0, chunks=12).reshape(10, 3, 4))
+    cube.var_name = 'x'
+    io.iris_save(cube,
+                 path,
+                 zlib=True,
+                 complevel=1,
+                 chunksizes={'time': 1},
+                 netcdf_format='NETCDF4_CLASSIC')
+    assert cube.has_lazy_data()
+    new_cube = iris.load_cube(path)
+    np.testing.assert_array_equal(new_cube.data, np.arange(120.0).reshape(
+        10, 3, 4))
+    assert new_cube.attributes['filename'] == path
+
+
 AUX_COORDS = [
     None,
     None,
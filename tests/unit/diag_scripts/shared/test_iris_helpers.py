@@ -1,5 +1,6 @@
 """Tests for the module :mod:`esmvaltool.diag_scripts.shared.iris_helpers`."""
 
+import dask.array as da
 import iris
 import mock
 import numpy as np
@@ -337,6 +338,30 @@ def test_intersect_dataset_coords(cubes, output):
     assert new_cubes == output
 
 
+@pytest.mark.parametrize('cubes,output', CUBES_TO_INTERSECT)
+def test_intersect_dataset_data(cubes, output):
+    """Test getting intersected data of cubes."""
+    # ValueErrors
+    if isinstance(output, type):
+        with pytest.raises(output):
+            ih.intersect_dataset_data(cubes)
+        return
+
+    # Working examples
+    lazy_cubes = [c.copy(c.lazy_data()) for c in cubes]
+    for cube_list in (cubes, lazy_cubes):
+        (datasets, all_data) = ih.intersect_dataset_data(cube_list)
+        np.testing.assert_array_equal(datasets,
+                                      output[0].coord('dataset').points)
+        assert len(all_data) == len(output)
+        for (data, cube) in zip(all_data, output):
+            assert isinstance(data, np.ma.MaskedArray)
+            np.testing.assert_array_equal(data.mask,
+                                          np.ma.getmaskarray(cube.data))
+            np.testing.assert_array_equal(data.compressed(),
+                                          np.ma.compressed(cube.data))
+
+
 DIM_COORD_4 = DIM_COORD_1.copy([100.0, 150.0, 160.0])
 DIM_COORD_4.rename('time')
 DIM_COORD_LONGEST = DIM_COORD_1.copy([-200.0, -1.0, 0.0, 1.0, 2.0, 3.0, 200.0])
@@ -387,3 +412,60 @@ def test_unify_1d_cubes(mock_unify_time, mock_transform, cubes, coord_name,
         assert mock_unify_time.call_count == 1
     else:
         assert not mock_unify_time.called
+
+
+UNIFIED_DATA = np.ma.masked_invalid([
+    [np.nan, np.nan, np.nan, -100.0, -99.0, -98.0, np.nan],
+    [np.nan, -1.0, np.nan, 2.0, np.nan, np.nan, np.nan],
+    [0.0, np.nan, np.nan, np.nan, np.nan, np.nan, 1.0],
+])
+CUBES_TO_UNIFY_TO_ARRAY = [
+    ([CUBE_1, iris.cube.Cube([[1.0]])], LONG_NAME, ValueError),
+    (
+        [iris.cube.Cube([0.0])],
+        LONG_NAME,
+        iris.exceptions.CoordinateNotFoundError,
+    ),
+    ([CUBE_1, CUBE_4, CUBE_3], LONG_NAME, ValueError),
+    ([CUBE_7, CUBE_1, CUBE_WRONG], LONG_NAME,
+     (UNIFIED_DATA, DIM_COORD_LONGEST)),
+    ([CUBE_8], 'time', (CUBE_1.data.reshape(1, 3), DIM_COORD_4)),
+]
+
+
+@pytest.mark.parametrize('cubes,coord_name,output', CUBES_TO_UNIFY_TO_ARRAY)
+def test_unify_1d_cubes_to_array(cubes, coord_name, output):
+    """Test unifying 1D cubes to a single array."""
+    # ValueErrors
+    if isinstance(output, type):
+        with pytest.raises(output):
+            ih.unify_1d_cubes_to_array(cubes, coord_name)
+        return
+
+    # Working examples
+    cubes = iris.cube.CubeList(cubes)
+    (data, coord) = ih.unify_1d_cubes_to_array(cubes, coord_name)
+    np.testing.assert_array_equal(data.mask, output[0].mask)
+    np.testing.assert_array_equal(data.compressed(), output[0].compressed())
+    assert coord == output[1]
+    assert isinstance(coord, iris.coords.DimCoord)
+
+    # Compare to unified cubes
+    new_cubes = ih.unify_1d_cubes(cubes, coord_name)
+    assert new_cubes[0].coord(coord_name) == coord
+    np.testing.assert_array_equal(
+        np.ma.filled(data, np.nan),
+        np.ma.filled(np.ma.array([c.data for c in new_cubes]), np.nan))
+
+    # Lazy data stays lazy
+    lazy_cubes = iris.cube.CubeList(
+        [cube.copy(cube.lazy_data()) for cube in cubes])
+    (lazy_data, lazy_coord) = ih.unify_1d_cubes_to_array(lazy_cubes,
+                                                         coord_name)
+    assert isinstance(lazy_data, da.Array)
+    assert all(cube.has_lazy_data() for cube in lazy_cubes)
+    assert lazy_coord == coord
+    lazy_data = lazy_data.compute()
+    np.testing.assert_array_equal(np.ma.getmaskarray(lazy_data),
+                                  np.ma.getmaskarray(data))
+    np.testing.assert_array_equal(lazy_data.compressed(), data.compressed())
@@ -0,0 +1,119 @@
+"""Tests for the map templates in :mod:`esmvaltool.diag_scripts.shared.plot`."""  # noqa
+import cartopy.crs as ccrs
+import iris
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+import shapely.geometry
+from cartopy.feature import ShapelyFeature
+
+from esmvaltool.diag_scripts.shared.plot import _maps
+
+
+@pytest.fixture
+def features(monkeypatch):
+    """Replace the Natural Earth features by small local features."""
+    land = ShapelyFeature([shapely.geometry.box(-20., 60., 20., 80.)],
+                          ccrs.PlateCarree())
+    coastline = ShapelyFeature(
+        [shapely.geometry.LineString([(-20., 60.), (20., 60.)])],
+        ccrs.PlateCarree())
+    monkeypatch.setattr(_maps.cfeature, 'LAND', land)
+    monkeypatch.setattr(_maps.cfeature, 'COASTLINE', coastline)
+    monkeypatch.setattr(_maps, 'MAP_TEMPLATES', {})
+    monkeypatch.setattr(_maps, 'PROJECTED_POINTS', {})
+
+
+def _get_cube():
+    """Get a global 2D cube with 1D latitude and longitude."""
+    lat = iris.coords.DimCoord(np.linspace(-85., 85., 18),
+                               standard_name='latitude',
+                               units='degrees')
+    lon = iris.coords.DimCoord(np.linspace(5., 355., 36),
+                               standard_name='longitude',
+                               units='degrees')
+    data = np.linspace(0., 100., 18 * 36).reshape(18, 36)
+    return iris.cube.Cube(data, dim_coords_and_dims=[(lat, 0), (lon, 1)])
+
+
+def test_get_map_template(features):
+    """Test that the features are projected once per template."""
+    template = _maps.get_map_template('NorthPolarStereo', [-180, 180, 50, 90])
+    assert isinstance(template['projection'], ccrs.NorthPolarStereo)
+    assert template['extent'] == (-180., 180., 50., 90.)
+    for name in ('land', 'coastlines'):
+        assert template[name].crs is template['projection']
+        bounds = list(template[name].geometries())[0].bounds
+        assert np.max(np.abs(bounds)) > 1e5
+    assert _maps.get_map_template('NorthPolarStereo',
+                                  (-180, 180, 50, 90)) is template
+    assert _maps.get_map_template('SouthPolarStereo') is not template
+
+
+def test_make_map_axes(features):
+    """Test the map axes with the cached features."""
+    axes = _maps.make_map_axes('NorthPolarStereo', [-180, 180, 50, 90],
+                               land={'facecolor': 'grey'})
+    template = _maps.get_map_template('NorthPolarStereo', [-180, 180, 50, 90])
+    assert axes.projection is template['projection']
+    features = [artist._feature for artist in axes.artists + axes.collections
+                if hasattr(artist, '_feature')]
+    assert template['land'] in features
+    assert template['coastlines'] in features
+    plt.close('all')
+
+
+def test_fast_map_plot(features):
+    """Test the pcolormesh plot on the projected grid."""
+    cube = _get_cube()
+    axes = _maps.make_map_axes('PlateCarree', coastlines=False)
+    mesh = _maps.fast_map_plot(cube, [10., 50., 90.], axes=axes)
+    data = mesh.get_array()
+    expected_mask = (cube.data < 10.) | (cube.data > 90.)
+    expected_mask[:, 18] = True
+    np.testing.assert_array_equal(np.ma.getmaskarray(data).reshape(18, 36),
+                                  expected_mask)
+    coordinates = mesh.get_coordinates()
+    assert coordinates.shape == (19, 37, 2)
+    np.testing.assert_allclose(coordinates[0, :18, 0],
+                               np.arange(0., 180., 10.))
+    np.testing.assert_allclose(coordinates[:, 0, 1],
+                               np.linspace(-90., 90., 19))
+    assert len(_maps.PROJECTED_POINTS) == 1
+    _maps.fast_map_plot(cube, [0., 100.], axes=axes)
+    assert len(_maps.PROJECTED_POINTS) == 1
+    plt.close('all')
+
+
+def test_fast_map_plot_2d_coords(features):
+    """Test the cell corners of 2D coordinates with and without bounds."""
+    cube = _get_cube()
+    lon, lat = np.meshgrid(cube.coord('longitude').points,
+                           cube.coord('latitude').points)
+    cube.remove_coord('longitude')
+    cube.remove_coord('latitude')
+    axes = _maps.make_map_axes('PlateCarree', coastlines=False)
+    for bounds in (False, True):
+        coords = [
+            iris.coords.AuxCoord(lat, standard_name='latitude',
+                                 units='degrees'),
+            iris.coords.AuxCoord(lon, standard_name='longitude',
+                                 units='degrees'),
+        ]
+        if bounds:
+            for coord, offsets in zip(coords, ([-5., -5., 5., 5.],
+                                               [-5., 5., 5., -5.])):
+                coord.bounds = coord.points[..., np.newaxis] + offsets
+        new_cube = cube.copy()
+        new_cube.add_aux_coord(coords[0], (0, 1))
+        new_cube.add_aux_coord(coords[1], (0, 1))
+        mesh = _maps.fast_map_plot(new_cube, [0., 100.], axes=axes)
+        coordinates = mesh.get_coordinates()
+        assert coordinates.shape == (19, 37, 2)
+        np.testing.assert_allclose(coordinates[0, :18, 0],
+                                   np.arange(0., 180., 10.),
+                                   atol=1e-10)
+        np.testing.assert_allclose(coordinates[:, 0, 1],
+                                   np.linspace(-90., 90., 19),
+                                   atol=1e-10)
+    plt.close('all')
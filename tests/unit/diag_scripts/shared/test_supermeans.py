@@ -0,0 +1,290 @@
+"""Tests for the module :mod:`esmvaltool.diag_scripts.shared._supermeans`."""
+
+import datetime
+import os
+
+import cf_units
+import dask.array as da
+import iris
+import mock
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.shared import _supermeans
+
+# Aggregation by coordinates only keeps data lazy on iris>=3
+IRIS_3 = int(iris.__version__.split('.')[0]) >= 3
+TIME_UNITS = cf_units.Unit('days since 2000-01-01', calendar='gregorian')
+SEASONS = {
+    'djf': [12, 1, 2],
+    'mam': [3, 4, 5],
+    'jja': [6, 7, 8],
+    'son': [9, 10, 11],
+}
+
+
+def _month_starts(n_months):
+    """Get first days of `n_months` + 1 months starting at 2000-12-01."""
+    dates = []
+    for idx in range(n_months + 1):
+        (year, month) = divmod(11 + idx, 12)
+        dates.append(datetime.datetime(2000 + year, month + 1, 1))
+    return dates
+
+
+def _get_monthly_cube(n_years=2, lazy=False):
+    """Get cube with monthly data covering full climate years."""
+    starts = TIME_UNITS.date2num(_month_starts(12 * n_years))
+    bounds = np.stack([starts[:-1], starts[1:]], axis=-1)
+    time_coord = iris.coords.DimCoord(bounds.mean(axis=1),
+                                      bounds=bounds,
+                                      standard_name='time',
+                                      units=TIME_UNITS)
+    data = np.random.RandomState(42).rand(12 * n_years, 2, 3)
+    data = data.astype(np.float32)
+    if lazy:
+        data = da.from_array(data, chunks=(5, 2, 3))
+    cube = iris.cube.Cube(
+        data,
+        var_name='tas',
+        units='K',
+        dim_coords_and_dims=[
+            (time_coord, 0),
+            (iris.coords.DimCoord([0.0, 1.0], long_name='y'), 1),
+            (iris.coords.DimCoord([0.0, 1.0, 2.0], long_name='x'), 2),
+        ])
+    cube.add_cell_method(iris.coords.CellMethod('mean', coords='time'))
+    return cube
+
+
+def _get_reference_mean(cube, months=None):
+    """Calculate duration weighted mean with plain numpy."""
+    time_coord = cube.coord('time')
+    weights = np.diff(time_coord.bounds, axis=1)[:, 0]
+    month_points = np.array(
+        [d.month for d in time_coord.units.num2date(time_coord.points)])
+    if months is not None:
+        weights = np.where(np.isin(month_points, months), weights, 0.0)
+    data = np.asarray(cube.data, dtype=np.float64)
+    return np.einsum('i,ijk->jk', weights, data) / weights.sum()
+
+
+def test_durations():
+    """Test calculation of durations."""
+    cube = _get_monthly_cube()
+    durations = _supermeans.durations(cube.coord('time'))
+    assert durations.shape == (24, )
+    np.testing.assert_array_equal(durations[:3], [31.0, 31.0, 28.0])
+    np.testing.assert_array_equal(durations[12:15], [31.0, 31.0, 28.0])
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_periodic_mean_annual(lazy):
+    """Test multi-annual supermean."""
+    cube = _get_monthly_cube(lazy=lazy)
+    result = _supermeans.periodic_mean(cube)
+    if IRIS_3:
+        assert result.has_lazy_data() is lazy
+    assert cube.has_lazy_data() is lazy
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result.data,
+                               _get_reference_mean(cube),
+                               rtol=1e-6)
+    assert result.cell_methods[-1] == iris.coords.CellMethod('mean',
+                                                             coords='time')
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_periodic_mean_season(lazy):
+    """Test seasonal supermeans."""
+    cube = _get_monthly_cube(lazy=lazy)
+    original_data = cube.copy().data
+    result = _supermeans.periodic_mean(cube, period='season')
+    if IRIS_3:
+        assert result.has_lazy_data() is lazy
+    assert result.shape == (4, 2, 3)
+    for (season, months) in SEASONS.items():
+        season_cube = result.extract(iris.Constraint(season=season))
+        np.testing.assert_allclose(season_cube.data,
+                                   _get_reference_mean(cube, months),
+                                   rtol=1e-6)
+
+    # Input data is not modified
+    np.testing.assert_array_equal(cube.data, original_data)
+
+
+def test_periodic_mean_lazy_matches_eager():
+    """Test that lazy and eager calculation give identical results."""
+    for period in (None, 'season', 'month'):
+        eager = _supermeans.periodic_mean(_get_monthly_cube(), period=period)
+        lazy = _supermeans.periodic_mean(_get_monthly_cube(lazy=True),
+                                         period=period)
+        if IRIS_3:
+            assert lazy.has_lazy_data()
+        assert not eager.has_lazy_data()
+        np.testing.assert_allclose(lazy.data, eager.data, rtol=1e-6)
+        assert lazy.coords() == eager.coords()
+
+
+def test_periodic_mean_invalid_period():
+    """Test invalid period."""
+    with pytest.raises(_supermeans.InvalidPeriod):
+        _supermeans.periodic_mean(_get_monthly_cube(), period='decade')
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_all_periodic_means(lazy):
+    """Test calculation of all supermeans at once."""
+    cube = _get_monthly_cube(lazy=lazy)
+    supermeans = _supermeans.all_periodic_means(cube)
+    assert len(supermeans) == 17
+    expected = {'ann': _supermeans.periodic_mean(cube)}
+    seasonal = _supermeans.periodic_mean(cube, period='season')
+    for season in _supermeans.SEASONS:
+        expected[season] = seasonal.extract(iris.Constraint(season=season))
+    monthly = _supermeans.periodic_mean(cube, period='month')
+    for month in _supermeans.MONTHS:
+        expected[month] = monthly.extract(
+            iris.Constraint(month=month.capitalize()))
+    for (period, expected_cube) in expected.items():
+        result = supermeans[period]
+        assert not result.has_lazy_data()
+        assert result.coords() == expected_cube.coords()
+        assert result.cell_methods == expected_cube.cell_methods
+        np.testing.assert_allclose(result.data, expected_cube.data, rtol=1e-6)
+
+
+def test_get_supermean_cached(tmp_path):
+    """Test caching of loaded cubes and supermeans."""
+    _supermeans.clear_cache()
+    cube = _get_monthly_cube()
+    iris.save(cube, str(tmp_path / 'cubeList.nc'))
+    with mock.patch.object(_supermeans.iris, 'load',
+                           wraps=iris.load) as mock_load:
+        ann = _supermeans.get_supermean('tas', 'ann', str(tmp_path))
+        djf = _supermeans.get_supermean('tas', 'djf', str(tmp_path))
+        assert mock_load.call_count == 1
+        with pytest.raises(ValueError):
+            _supermeans.get_supermean('tas', 'spring', str(tmp_path))
+    np.testing.assert_allclose(ann.data, _get_reference_mean(cube),
+                               rtol=1e-6)
+    np.testing.assert_allclose(djf.data,
+                               _get_reference_mean(cube, SEASONS['djf']),
+                               rtol=1e-6)
+
+    # Returned cubes are copies
+    ann.data[:] = 0.0
+    ann = _supermeans.get_supermean('tas', 'ann', str(tmp_path))
+    np.testing.assert_allclose(ann.data, _get_reference_mean(cube),
+                               rtol=1e-6)
+    _supermeans.clear_cache()
+
+
+def test_get_supermean_cache_size(tmp_path, monkeypatch):
+    """Test that old versions of files and supermeans are not kept."""
+    _supermeans.clear_cache()
+    monkeypatch.setattr(_supermeans, '_MAX_CACHED_SUPERMEANS', 2)
+    path = str(tmp_path / 'cubeList.nc')
+    cube = _get_monthly_cube()
+    cubes = iris.cube.CubeList([cube])
+    for name in ('a', 'b', 'c'):
+        cubes.append(cube.copy())
+        cubes[-1].var_name = name
+    iris.save(cubes, path)
+    for name in ('tas', 'a', 'b', 'c'):
+        _supermeans.get_supermean(name, 'ann', str(tmp_path))
+    assert [key[0] for key in _supermeans._SUPERMEANS_CACHE] == ['b', 'c']
+    assert len(_supermeans._CUBES_CACHE) == 1
+
+    os.utime(path, (0.0, 0.0))
+    _supermeans.get_supermean('tas', 'ann', str(tmp_path))
+    assert [key[0] for key in _supermeans._SUPERMEANS_CACHE] == ['tas']
+    assert [key[1] for key in _supermeans._CUBES_CACHE] == [0.0]
+    _supermeans.clear_cache()
+
+
+def _get_diurnal_cube(start_month=12, hour_shift=0):
+    """Get cube with 3-hourly sampled monthly means."""
+    units = cf_units.Unit('hours since 2000-01-01', calendar='gregorian')
+    dates = [
+        datetime.datetime(2000 + (start_month + idx - 1) // 12,
+                          (start_month + idx - 1) % 12 + 1, 1)
+        for idx in range(13)
+    ]
+    starts = units.date2num(dates)
+    bounds = np.array([[starts[idx] + hour, starts[idx + 1] + hour]
+                       for idx in range(12)
+                       for hour in range(hour_shift, 24, 3)])
+    time_coord = iris.coords.DimCoord(bounds.mean(axis=1),
+                                      bounds=bounds,
+                                      standard_name='time',
+                                      units=units)
+    cube = iris.cube.Cube(np.arange(len(bounds), dtype=np.float32),
+                          var_name='tas',
+                          units='K',
+                          dim_coords_and_dims=[(time_coord, 0)])
+    cube.add_cell_method(
+        iris.coords.CellMethod('mean', coords='time', intervals='24 hour'))
+    return cube
+
+
+def test_time_axis_profile():
+    """Test profile of time axis."""
+    profile = _supermeans.TimeAxisProfile(_get_monthly_cube())
+    assert not profile.is_24h_sampled
+    np.testing.assert_array_equal(profile.start_hours, np.zeros(24))
+    np.testing.assert_array_equal(profile.sampling_hours, [0])
+    assert profile.intervals == 1
+    assert profile.starts_climate_year
+    assert profile.ends_climate_year
+    assert profile.full_climate_years
+
+    profile = _supermeans.TimeAxisProfile(_get_diurnal_cube(hour_shift=2))
+    assert profile.is_24h_sampled
+    np.testing.assert_array_equal(profile.sampling_hours,
+                                  [2, 5, 8, 11, 14, 17, 20, 23])
+    np.testing.assert_array_equal(profile.start_hours[:9],
+                                  [2, 5, 8, 11, 14, 17, 20, 23, 2])
+    assert profile.intervals == 8
+    assert profile.full_climate_years
+
+
+CLIMATE_YEAR_CUBES = [
+    (_get_monthly_cube(), True),
+    (_get_monthly_cube()[1:], False),
+    (_get_monthly_cube()[:-1], False),
+    (_get_diurnal_cube(), True),
+    (_get_diurnal_cube(hour_shift=1), True),
+    (_get_diurnal_cube(start_month=1), False),
+]
+
+
+@pytest.mark.parametrize('cube,output', CLIMATE_YEAR_CUBES)
+def test_contains_full_climate_years(cube, output):
+    """Test check for full climate years."""
+    assert _supermeans.contains_full_climate_years(cube) is output
+    profile = _supermeans.TimeAxisProfile(cube)
+    assert _supermeans.contains_full_climate_years(cube, profile) is output
+
+
+def test_contains_full_climate_years_no_bounds():
+    """Test check for full climate years without bounds."""
+    cube = _get_monthly_cube()
+    cube.coord('time').bounds = None
+    with pytest.raises(_supermeans.NoBoundsError):
+        _supermeans.contains_full_climate_years(cube)
+    with pytest.raises(_supermeans.NoBoundsError):
+        _supermeans.TimeAxisProfile(cube).full_climate_years
+
+
+def test_periodic_mean_diurnal():
+    """Test supermeans of diurnal data."""
+    cube = _get_diurnal_cube()
+    profile = _supermeans.TimeAxisProfile(cube)
+    result = _supermeans.periodic_mean(cube, profile=profile)
+    assert result.shape == (8, )
+    np.testing.assert_array_equal(result.coord('start_hour').points,
+                                  np.arange(0, 24, 3))
+    supermeans = _supermeans.all_periodic_means(cube, profile=profile)
+    assert supermeans['ann'].coords() == result.coords()
+    np.testing.assert_allclose(supermeans['ann'].data, result.data)
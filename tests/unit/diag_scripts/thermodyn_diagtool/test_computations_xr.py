@@ -0,0 +1,334 @@
+"""Tests for the in-memory computations of the thermodyn_diagtool."""
+
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from esmvaltool.diag_scripts.thermodyn_diagtool import computations_xr
+
+VARS = [
+    'hfls', 'hfss', 'hus', 'pr', 'prsn', 'ps', 'rlds', 'rlus', 'rlut', 'rsds',
+    'rsdt', 'rsus', 'rsut'
+]
+NEEDS_CDO = pytest.mark.skipif(
+    shutil.which('cdo') is None, reason='cdo is not available')
+
+
+def _get_field(name, nyears=2, nan=False):
+    """Get a random monthly (time,lat,lon) field."""
+    rng = np.random.RandomState(sum(ord(char) for char in name))
+    time = pd.date_range('2000-01-01', periods=12 * nyears, freq='MS')
+    time = time + pd.Timedelta(days=14)
+    lat = np.linspace(-87.5, 87.5, 36)
+    lon = np.linspace(0., 350., 36)
+    values = rng.uniform(50., 300., size=(len(time), len(lat), len(lon)))
+    if nan:
+        values[rng.uniform(size=values.shape) < 0.1] = np.nan
+    coords = {
+        'time': time,
+        'lat': ('lat', lat, {
+            'units': 'degrees_north',
+            'standard_name': 'latitude'
+        }),
+        'lon': ('lon', lon, {
+            'units': 'degrees_east',
+            'standard_name': 'longitude'
+        }),
+    }
+    return xr.DataArray(
+        values,
+        coords=coords,
+        dims=('time', 'lat', 'lon'),
+        name=name,
+        attrs={'units': 'W m-2'})
+
+
+def _get_filelist(path):
+    """Write input fields to files and return them as in filelist."""
+    filelist = [None] * 21
+    index = {
+        'hfls': 0,
+        'hfss': 1,
+        'pr': 3,
+        'prsn': 4,
+        'rlds': 6,
+        'rlus': 7,
+        'rlut': 8,
+        'rsds': 9,
+        'rsdt': 10,
+        'rsus': 11,
+        'rsut': 12,
+        'ts': 15,
+    }
+    for name, i in index.items():
+        filename = str(path.join('{}.nc'.format(name)))
+        _get_field(name).to_netcdf(filename)
+        filelist[i] = filename
+    return filelist
+
+
+def _fldmean(values, lat):
+    """Compute the area weighted mean of a (...,lat,lon) array."""
+    bounds = np.deg2rad(np.concatenate(([-90.], 0.5 * (lat[1:] + lat[:-1]),
+                                        [90.])))
+    weights = np.sin(bounds[1:]) - np.sin(bounds[:-1])
+    weights = np.broadcast_to(weights[:, np.newaxis], values.shape)
+    weights = np.where(np.isnan(values), 0., weights)
+    return (np.nansum(values * weights, axis=(-2, -1)) /
+            np.sum(weights, axis=(-2, -1)))
+
+
+def _yearmonmean(data):
+    """Compute annual means weighted by the number of days per month."""
+    days = data['time'].dt.days_in_month.values
+    values = data.values
+    result = []
+    for year in np.unique(data['time'].dt.year):
+        idx = data['time'].dt.year.values == year
+        weights = np.where(np.isnan(values[idx]), 0.,
+                           days[idx][:, np.newaxis, np.newaxis])
+        result.append(
+            np.nansum(values[idx] * weights, axis=0) / weights.sum(axis=0))
+    return np.array(result)
+
+
+@pytest.mark.parametrize('nan', [False, True])
+def test_fldmean(nan):
+    """Test area weighted global means."""
+    data = _get_field('rsdt', nan=nan)
+    result = computations_xr.fldmean(data)
+    expected = _fldmean(data.values, data['lat'].values)
+    np.testing.assert_allclose(result.values, expected)
+
+
+def test_fldmean_decreasing_lat():
+    """Test area weighted global means with latitudes from N to S."""
+    data = _get_field('rsdt')
+    result = computations_xr.fldmean(data[:, ::-1, :])
+    expected = _fldmean(data.values, data['lat'].values)
+    np.testing.assert_allclose(result.values, expected)
+
+
+@pytest.mark.parametrize('nan', [False, True])
+def test_yearmonmean(nan):
+    """Test annual means of monthly data."""
+    data = _get_field('rsdt', nan=nan)
+    result = computations_xr.yearmonmean(data)
+    np.testing.assert_allclose(result.values, _yearmonmean(data))
+    assert list(result['time'].dt.year.values) == [2000, 2001]
+
+
+def test_masks():
+    """Test masking operators."""
+    data = xr.DataArray(np.array([-2., 0., np.nan, 3., 1000.]), dims=('x', ))
+    np.testing.assert_array_equal(
+        computations_xr.gtc(data, 0).values, [0., 0., np.nan, 1., 1.])
+    np.testing.assert_array_equal(
+        computations_xr.ltc(data, 0).values, [1., 0., np.nan, 0., 0.])
+    np.testing.assert_array_equal(
+        computations_xr.setrtomiss(data, -1000, 0).values,
+        [np.nan, np.nan, np.nan, 3., 1000.])
+    np.testing.assert_array_equal(
+        computations_xr.setctomiss(data, 0).values,
+        [-2., np.nan, np.nan, 3., 1000.])
+
+
+def test_budgets(tmpdir):
+    """Test energy budgets."""
+    filelist = _get_filelist(tmpdir)
+    eb_gmean, eb_file, toab_ymm_file = computations_xr.budgets(
+        'model', str(tmpdir), None, filelist)
+    fields = {name: _get_field(name) for name in VARS}
+    toab = fields['rsdt'] - fields['rsut'] - fields['rlut']
+    surb = (fields['rsds'] + fields['rlds'] - fields['rsus'] -
+            fields['rlus'] - fields['hfls'] - fields['hfss'])
+    expected = [toab, toab - surb, surb]
+    lat = toab['lat'].values
+    for gmean, filename, exp, name in zip(eb_gmean, eb_file, expected,
+                                          ['toab', 'atmb', 'surb']):
+        np.testing.assert_allclose(gmean, _fldmean(_yearmonmean(exp), lat))
+        with xr.open_dataset(filename) as dataset:
+            assert dataset[name].dtype == np.float32
+            np.testing.assert_allclose(dataset[name].values, exp.values,
+                                       rtol=1e-6)
+    with xr.open_dataset(toab_ymm_file) as dataset:
+        np.testing.assert_allclose(dataset['toab'].values,
+                                   _yearmonmean(toab), rtol=1e-6)
+
+
+@NEEDS_CDO
+def test_budgets_cdo(tmpdir):
+    """Compare energy budgets with the CDO computations."""
+    computations = pytest.importorskip(
+        'esmvaltool.diag_scripts.thermodyn_diagtool.computations')
+    filelist = _get_filelist(tmpdir)
+    cdo_dir = tmpdir.mkdir('cdo')
+    xr_dir = tmpdir.mkdir('xr')
+    cdo_gmean, cdo_file, cdo_ymm = computations.budgets(
+        'model', str(cdo_dir), str(cdo_dir.join('aux.nc')), filelist)
+    xr_gmean, xr_file, xr_ymm = computations_xr.budgets(
+        'model', str(xr_dir), None, filelist)
+    for i, name in enumerate(['toab', 'atmb', 'surb']):
+        np.testing.assert_allclose(
+            xr_gmean[i], np.ravel(cdo_gmean[i]), rtol=1e-5)
+        with xr.open_dataset(cdo_file[i]) as cdo_ds, \
+                xr.open_dataset(xr_file[i]) as xr_ds:
+            np.testing.assert_allclose(xr_ds[name].values,
+                                       cdo_ds[name].values)
+    with xr.open_dataset(cdo_ymm) as cdo_ds, xr.open_dataset(xr_ymm) as xr_ds:
+        np.testing.assert_allclose(
+            xr_ds['toab'].values, cdo_ds['toab'].values, rtol=1e-5)
+    te_file = str(tmpdir.join('te_ymm.nc'))
+    computations_xr.write_field(
+        computations_xr.yearmonmean(_get_field('rlut')), 'rlut', te_file)
+    cdo_eff = computations.baroceff('model', str(cdo_dir),
+                                    str(cdo_dir.join('aux.nc')), cdo_ymm,
+                                    te_file)
+    xr_eff = computations_xr.baroceff('model', str(xr_dir), None, xr_ymm,
+                                      te_file)
+    np.testing.assert_allclose(xr_eff, cdo_eff, rtol=1e-5)
+
+
+def _get_wfluxes_files(tmpdir, fields):
+    """Write the evaporation and rainfall files of mkthe.wfluxes."""
+    evspsbl_file = str(tmpdir.join('evspsbl.nc'))
+    (fields['hfls'] / computations_xr.L_C).rename('hfls').to_netcdf(
+        evspsbl_file)
+    prr_file = str(tmpdir.join('prr.nc'))
+    (fields['pr'] - fields['prsn']).rename('prr').to_netcdf(prr_file)
+    return [evspsbl_file, None, prr_file]
+
+
+def test_wmbudg(tmpdir):
+    """Test water mass and latent energy budgets."""
+    filelist = _get_filelist(tmpdir)
+    fields = {name: _get_field(name) for name in VARS}
+    auxlist = _get_wfluxes_files(tmpdir, fields)
+    wm_gmean, wm_file = computations_xr.wmbudg('model', str(tmpdir), None,
+                                               filelist, auxlist)
+    wmb = fields['hfls'] / computations_xr.L_C - fields['pr']
+    latent = fields['hfls'] - (
+        computations_xr.LC_SUB * fields['prsn'] + computations_xr.L_C *
+        (fields['pr'] - fields['prsn']))
+    lat = wmb['lat'].values
+    for gmean, filename, exp, name in zip(wm_gmean, wm_file, [wmb, latent],
+                                          ['wmb', 'latent']):
+        np.testing.assert_allclose(gmean, _fldmean(_yearmonmean(exp), lat))
+        with xr.open_dataset(filename) as dataset:
+            np.testing.assert_allclose(dataset[name].values, exp.values,
+                                       rtol=1e-6)
+
+
+@NEEDS_CDO
+def test_wmbudg_cdo(tmpdir):
+    """Compare water mass and latent energy budgets with CDO computations."""
+    computations = pytest.importorskip(
+        'esmvaltool.diag_scripts.thermodyn_diagtool.computations')
+    mkthe = pytest.importorskip(
+        'esmvaltool.diag_scripts.thermodyn_diagtool.mkthe')
+    filelist = _get_filelist(tmpdir)
+    cdo_dir = tmpdir.mkdir('cdo')
+    xr_dir = tmpdir.mkdir('xr')
+    evspsbl_file, prr_file = mkthe.wfluxes('model', str(cdo_dir), filelist)
+    # As in init_mkthe, the rainfall is the third auxiliary file
+    auxlist = [evspsbl_file, None, prr_file]
+    cdo_gmean, cdo_file = computations.wmbudg(
+        'model', str(cdo_dir), str(cdo_dir.join('aux.nc')), filelist,
+        auxlist)
+    xr_gmean, xr_file = computations_xr.wmbudg('model', str(xr_dir), None,
+                                               filelist, auxlist)
+    for i, name in enumerate(['wmb', 'latent']):
+        np.testing.assert_allclose(
+            xr_gmean[i], np.ravel(cdo_gmean[i]), rtol=1e-5)
+        with xr.open_dataset(cdo_file[i]) as cdo_ds, \
+                xr.open_dataset(xr_file[i]) as xr_ds:
+            np.testing.assert_allclose(xr_ds[name].values,
+                                       cdo_ds[name].values, rtol=1e-5)
+
+
+def _mkthe_reference(hfss, hus, p_s, t_e, t_s, vv_hor, lev):
+    """Compute the boundary layer fields with the formulas of mkthe."""
+    huss = np.where(lev[0] >= p_s, hus[:, 0], 0.)
+    for l_l in range(len(lev)):
+        huss = huss + np.where(p_s >= lev[l_l], hus[:, l_l], 0.)
+    ricr = np.where(hfss >= 0.75, 0.28, 0.39)
+    h_bl = np.where(hfss >= 0.75, 1000., 300.)
+    ev_p = huss * p_s / (huss + 287.0 / 461.51)
+    t_d = 1 / ((1 / 273.15) - (461.51 / 2.5008e6) * np.log(ev_p / 610.78))
+    hlcl = 125. * (t_s - t_d)
+    hlcl = np.where(hlcl >= 0., hlcl, h_bl)
+    cp_d = 287.0 / 0.286
+    ztlcl = t_s - (9.81 / cp_d) * hlcl
+    gw_pa = (9.81 / cp_d) * (1 + ((2.5008e6 * huss) / (287.0 * ztlcl)) / (1 + (
+        (2.5008e6**2 * huss * 0.622) / (cp_d * 287.0 * ztlcl**2))))
+    htop = -(t_e - ztlcl) / gw_pa + hlcl
+    ths = t_s * (100000. / p_s)**0.286
+    thz = ths + 0.03 * ricr * vv_hor**2 / h_bl
+    p_z = p_s * np.exp((-9.81 * h_bl) / (287.0 * t_s))
+    t_z = thz * (100000. / p_z)**(-0.286)
+    return ztlcl, t_z, htop
+
+
+def _get_mkthe_files(tmpdir):
+    """Write the input fields of mkthe_main and return them and the files."""
+    ranges = {
+        'ts': (250., 300.),
+        'ps': (60000., 103000.),
+        'uas': (-10., 10.),
+        'vas': (-10., 10.),
+        'hfss': (-20., 60.),
+        'rlut': (200., 260.),
+    }
+    fields = {}
+    for name, (vmin, vmax) in ranges.items():
+        field = _get_field(name)
+        fields[name] = vmin + (field - 50.) * (vmax - vmin) / 250.
+    lev = np.array([100000., 85000., 70000., 50000.])
+    hus = xr.concat([_get_field('hus') * 1e-4] * len(lev), 'plev')
+    hus = hus.assign_coords(plev=lev).transpose('time', 'plev', 'lat', 'lon')
+    fields['hus'] = hus
+    file_list = []
+    for name in ['ts', 'hus', 'ps', 'uas', 'vas', 'hfss', 'rlut']:
+        filename = str(tmpdir.join('{}.nc'.format(name)))
+        fields[name].rename(name).to_netcdf(filename)
+        file_list.append(filename)
+    return fields, file_list
+
+
+def test_mkthe_main(tmpdir, monkeypatch):
+    """Test the chunked computation of the boundary layer fields."""
+    monkeypatch.setattr(computations_xr, 'CHUNKS', {'time': 5})
+    fields, file_list = _get_mkthe_files(tmpdir)
+    outfiles = computations_xr.mkthe_main(str(tmpdir), file_list, 'model')
+    vv_hor = np.sqrt(fields['uas']**2 + fields['vas']**2).astype(np.float32)
+    expected = _mkthe_reference(fields['hfss'].values, fields['hus'].values,
+                                fields['ps'].values, fields['rlut'].values,
+                                fields['ts'].values, vv_hor.values,
+                                fields['hus']['plev'].values)
+    for filename, name, exp, rmax in zip(outfiles, ['htop', 'tabl', 'tlcl'],
+                                         expected[::-1], [12000, 400, 400]):
+        with xr.open_dataset(filename) as dataset:
+            np.testing.assert_allclose(dataset[name].values,
+                                       np.where(exp >= rmax, np.nan, exp))
+
+
+@NEEDS_CDO
+def test_mkthe_main_cdo(tmpdir):
+    """Compare the boundary layer fields with the CDO computations."""
+    mkthe = pytest.importorskip(
+        'esmvaltool.diag_scripts.thermodyn_diagtool.mkthe')
+    _, file_list = _get_mkthe_files(tmpdir)
+    cdo_dir = tmpdir.mkdir('cdo')
+    xr_dir = tmpdir.mkdir('xr')
+    cdo_files = mkthe.mkthe_main(str(cdo_dir), file_list, 'model')
+    xr_files = computations_xr.mkthe_main(str(xr_dir), file_list, 'model')
+    for cdo_file, xr_file, name in zip(cdo_files, xr_files,
+                                       ['htop', 'tabl', 'tlcl']):
+        with xr.open_dataset(cdo_file) as cdo_ds, \
+                xr.open_dataset(xr_file) as xr_ds:
+            np.testing.assert_allclose(xr_ds[name].values,
+                                       cdo_ds[name].values,
+                                       rtol=1e-5)
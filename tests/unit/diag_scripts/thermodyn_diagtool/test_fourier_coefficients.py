@@ -0,0 +1,124 @@
+"""Tests for the Fourier coefficients of the thermodyn_diagtool."""
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from esmvaltool.diag_scripts.thermodyn_diagtool import fourier_coefficients
+
+NTIME = 5
+LEV = np.array([90000., 70000., 50000., 30000.])
+LAT = np.linspace(-80., 80., 8)
+LON = np.linspace(0., 337.5, 16)
+
+
+def _create_coords(dataset, names):
+    """Create the coordinates of a dataset."""
+    values = {
+        'time': np.arange(NTIME, dtype=float),
+        'plev': LEV,
+        'lat': LAT,
+        'lon': LON,
+    }
+    for name in names:
+        dataset.createDimension(name, len(values[name]))
+        dataset.createVariable(name, 'f8', (name, ))[:] = values[name]
+
+
+def _write_input(tmpdir):
+    """Write random ta, ua, va, wap and tas fields, with ta below ground."""
+    rng = np.random.RandomState(0)
+    shape = (NTIME, len(LEV), len(LAT), len(LON))
+    ta_input = str(tmpdir.join('energy.nc'))
+    with Dataset(ta_input, 'w') as dataset:
+        _create_coords(dataset, ['time', 'plev', 'lat', 'lon'])
+        for name, mean, scale in [('ta', 250., 20.), ('ua', 10., 10.),
+                                  ('va', 0., 10.), ('wap', 0., 0.1)]:
+            values = mean + scale * rng.standard_normal(shape)
+            if name == 'ta':
+                values[:, 0][rng.uniform(size=values[:, 0].shape) < 0.3] = 0.
+            dataset.createVariable(name, 'f8',
+                                   ('time', 'plev', 'lat', 'lon'))[:] = values
+    tas_input = str(tmpdir.join('tas.nc'))
+    with Dataset(tas_input, 'w') as dataset:
+        _create_coords(dataset, ['time', 'lat', 'lon'])
+        values = 290. + 5. * rng.standard_normal(
+            (NTIME, len(LAT), len(LON)))
+        dataset.createVariable('tas', 'f8', ('time', 'lat', 'lon'))[:] = values
+    return ta_input, tas_input
+
+
+def _read(filename, names):
+    """Read variables from a file."""
+    with Dataset(filename) as dataset:
+        return {name: dataset.variables[name][:] for name in names}
+
+
+def _fourier_coeff(tmpdir, name, **kwargs):
+    """Compute the Fourier coefficients and read the outputs."""
+    ta_input, tas_input = _write_input(tmpdir)
+    tadiag_file = str(tmpdir.join('{}_ta.nc'.format(name)))
+    outfile = str(tmpdir.join('{}_fourier.nc'.format(name)))
+    fourier_coefficients.fourier_coeff(tadiag_file, outfile, ta_input,
+                                       tas_input, **kwargs)
+    fourier = _read(outfile, ['ta', 'ua', 'va', 'wap', 'wave'])
+    fourier['ta_filled'] = _read(tadiag_file, ['ta'])['ta']
+    return fourier
+
+
+@pytest.mark.parametrize('ntime_chunk', [1, 2, NTIME])
+def test_fourier_coeff_chunks(tmpdir, ntime_chunk):
+    """Test that the outputs do not depend on the number of timesteps."""
+    expected = _fourier_coeff(tmpdir, 'all')
+    result = _fourier_coeff(tmpdir, 'chunk', ntime_chunk=ntime_chunk)
+    assert set(result) == set(expected)
+    for name, values in expected.items():
+        assert np.all(np.isfinite(values))
+        np.testing.assert_array_equal(result[name], values)
+    assert np.all(expected['ta_filled'] > 0.)
+    assert expected['ta'].shape == (NTIME, len(LEV), len(LAT), 6)
+    np.testing.assert_array_equal(expected['wave'], np.arange(6))
+
+
+def test_fourier_coeff_dtype(tmpdir):
+    """Test that the outputs are computed in single precision."""
+    expected = _fourier_coeff(tmpdir, 'f8')
+    result = _fourier_coeff(tmpdir, 'f4', ntime_chunk=2, dtype='f4')
+    for name in ['ta', 'ua', 'va', 'wap', 'ta_filled']:
+        assert result[name].dtype == np.float32
+        np.testing.assert_allclose(result[name],
+                                   expected[name],
+                                   rtol=1e-4,
+                                   atol=1e-5 * np.max(np.abs(expected[name])))
+
+
+@pytest.mark.parametrize('trunc', [2, 6, 16])
+def test_fourier(trunc):
+    """Test the truncated Fourier coefficients against the full FFT."""
+    rng = np.random.RandomState(trunc)
+    fld = rng.standard_normal((3, 2, 4, len(LON)))
+    result = fourier_coefficients.fourier(fld, len(LON), trunc, 'f8')
+    fft = np.fft.fft(fld, axis=3)[:, :, :, :int(trunc / 2)] / len(LON)
+    expected = np.zeros(fld.shape[:3] + (trunc, ))
+    expected[:, :, :, 0::2] = np.real(fft)
+    expected[:, :, :, 1::2] = np.imag(fft)
+    assert result.dtype == np.float64
+    np.testing.assert_allclose(result, expected, atol=1e-12)
+
+
+@pytest.mark.parametrize('dtype', ['f4', 'f8'])
+def test_fill_ta(dtype):
+    """Test that only the temperatures below the surface are filled."""
+    rng = np.random.RandomState(1)
+    t_a = 250. + 20. * rng.standard_normal(
+        (2, len(LEV), len(LAT), len(LON)))
+    below = np.zeros(t_a.shape, dtype=bool)
+    below[:, 0][rng.uniform(size=t_a[:, 0].shape) < 0.3] = True
+    t_a = np.where(below, 0., t_a).astype(dtype)
+    tas = (290. + 5. * rng.standard_normal(
+        (2, len(LAT), len(LON)))).astype(dtype)
+    original = t_a.copy()
+    result = fourier_coefficients.fill_ta(t_a, tas, LEV.astype(dtype))
+    assert result.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(result[~below], original[~below])
+    assert np.all((result[below] > 200.) & (result[below] < 350.))
@@ -0,0 +1,498 @@
+"""Tests for the batched kernels of the Lorenz energy cycle."""
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from esmvaltool.diag_scripts.thermodyn_diagtool import lorenz_cycle
+from esmvaltool.diag_scripts.thermodyn_diagtool.lorenz_cycle import AA, CP, R
+
+NLEV = 5
+NLAT = 8
+NWAVE = 6
+LEV = np.array([100000., 85000., 70000., 50000., 20000.])
+LAT = np.linspace(-70., 70., NLAT)
+
+
+def _averages(x_c, g_w):
+    """Reference implementation of ``averages`` (one timestep)."""
+    xc_ztmn = np.squeeze(np.real(x_c[:, :, 0]))
+    xc_gmn = np.nansum(xc_ztmn * g_w[np.newaxis, :], axis=1) / np.nansum(g_w)
+    return xc_ztmn, xc_gmn
+
+
+def _makek(u_t, v_t):
+    """Reference implementation of ``makek`` (one timestep)."""
+    ck1 = u_t * np.conj(u_t)
+    ck2 = v_t * np.conj(v_t)
+    e_k = np.real(ck1 + ck2)
+    e_k[:, :, 0] = 0.5 * np.real(u_t[:, :, 0] * u_t[:, :, 0] +
+                                 v_t[:, :, 0] * v_t[:, :, 0])
+    return e_k
+
+
+def _makea(t_t, t_g, gam):
+    """Reference implementation of ``makea`` (one timestep)."""
+    ape = gam[:, np.newaxis, np.newaxis] * np.real(t_t * np.conj(t_t))
+    ape[:, :, 0] = (gam[:, np.newaxis] * 0.5 * np.real(
+        (t_t[:, :, 0] - t_g[:, np.newaxis]) *
+        (t_t[:, :, 0] - t_g[:, np.newaxis])))
+    return ape
+
+
+def _mka2k(wap, t_t, w_g, t_g, p_l):
+    """Reference implementation of ``mka2k`` (one timestep)."""
+    a2k = -(R / p_l[:, np.newaxis, np.newaxis] *
+            (t_t * np.conj(wap) + np.conj(t_t) * wap))
+    a2k[:, :, 0] = -(R / p_l[:, np.newaxis] *
+                     (t_t[:, :, 0] - t_g[:, np.newaxis]) *
+                     (wap[:, :, 0] - w_g[:, np.newaxis]))
+    return a2k
+
+
+def _mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
+    """Reference implementation of ``mkaeaz`` (one timestep)."""
+    dtdp = np.zeros([nlev, nlat])
+    dtdy = np.zeros([nlev, nlat])
+    for l_l in np.arange(nlev):
+        if l_l == 0:
+            t_1 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
+            t_2 = np.real(ttt[l_l + 1, :, 0]) - ttg[l_l + 1]
+            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
+        elif l_l == nlev - 1:
+            t_1 = np.real(ttt[l_l - 1, :, 0]) - ttg[l_l - 1]
+            t_2 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
+            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
+        else:
+            t_1 = np.real(ttt[l_l, :, 0]) - ttg[l_l]
+            t_2 = np.real(ttt[l_l + 1, :, 0]) - ttg[l_l + 1]
+            dtdp1 = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
+            t_2 = t_1
+            t_1 = np.real(ttt[l_l - 1, :, 0]) - ttg[l_l - 1]
+            dtdp2 = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
+            dtdp[l_l, :] = (
+                (dtdp1 * (p_l[l_l] - p_l[l_l - 1]) + dtdp2 *
+                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
+        dtdp[l_l, :] = dtdp[l_l, :] - (R / (CP * p_l[l_l]) *
+                                       (ttt[l_l, :, 0] - ttg[l_l]))
+    for i_l in np.arange(nlat):
+        if i_l == 0:
+            t_1 = np.real(ttt[:, i_l, 0])
+            t_2 = np.real(ttt[:, i_l + 1, 0])
+            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l])
+        elif i_l == nlat - 1:
+            t_1 = np.real(ttt[:, i_l - 1, 0])
+            t_2 = np.real(ttt[:, i_l, 0])
+            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l] - lat[i_l - 1])
+        else:
+            t_1 = np.real(ttt[:, i_l - 1, 0])
+            t_2 = np.real(ttt[:, i_l + 1, 0])
+            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l - 1])
+    dtdy = dtdy / AA
+    c_1 = np.real(v_t * np.conj(t_t) + t_t * np.conj(v_t))
+    c_2 = np.real(wap * np.conj(t_t) + t_t * np.conj(wap))
+    ae2az = (gam[:, np.newaxis, np.newaxis] *
+             (dtdy[:, :, np.newaxis] * c_1 + dtdp[:, :, np.newaxis] * c_2))
+    ae2az[:, :, 0] = 0.
+    return ae2az
+
+
+def _mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
+    """Reference implementation of ``mkkekz`` (one timestep)."""
+    dudp = np.zeros([nlev, nlat])
+    dvdp = np.zeros([nlev, nlat])
+    dudy = np.zeros([nlev, nlat])
+    dvdy = np.zeros([nlev, nlat])
+    for l_l in np.arange(nlev):
+        if l_l == 0:
+            dudp[l_l, :] = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
+                            (p_l[l_l + 1] - p_l[l_l]))
+            dvdp[l_l, :] = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
+                            (p_l[l_l + 1] - p_l[l_l]))
+        elif l_l == nlev - 1:
+            dudp[l_l, :] = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
+                            (p_l[l_l] - p_l[l_l - 1]))
+            dvdp[l_l, :] = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
+                            (p_l[l_l] - p_l[l_l - 1]))
+        else:
+            dudp1 = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
+                     (p_l[l_l + 1] - p_l[l_l]))
+            dvdp1 = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
+                     (p_l[l_l + 1] - p_l[l_l]))
+            dudp2 = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
+                     (p_l[l_l] - p_l[l_l - 1]))
+            dvdp2 = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
+                     (p_l[l_l] - p_l[l_l - 1]))
+            dudp[l_l, :] = (
+                (dudp1 * (p_l[l_l] - p_l[l_l - 1]) + dudp2 *
+                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
+            dvdp[l_l, :] = (
+                (dvdp1 * (p_l[l_l] - p_l[l_l - 1]) + dvdp2 *
+                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
+    for i_l in np.arange(nlat):
+        if i_l == 0:
+            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l, 0])) /
+                            (lat[i_l + 1] - lat[i_l]))
+            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l, 0])) /
+                            (lat[i_l + 1] - lat[i_l]))
+        elif i_l == nlat - 1:
+            dudy[:, i_l] = ((np.real(utt[:, i_l, 0] - utt[:, i_l - 1, 0])) /
+                            (lat[i_l] - lat[i_l - 1]))
+            dvdy[:, i_l] = ((np.real(vtt[:, i_l, 0] - vtt[:, i_l - 1, 0])) /
+                            (lat[i_l] - lat[i_l - 1]))
+        else:
+            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l - 1, 0]))
+                            / (lat[i_l + 1] - lat[i_l - 1]))
+            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l - 1, 0]))
+                            / (lat[i_l + 1] - lat[i_l - 1]))
+    dudy = dudy / AA
+    dvdy = dvdy / AA
+    c_1 = np.zeros([nlev, nlat, ntp - 1])
+    c_2 = np.zeros([nlev, nlat, ntp - 1])
+    c_3 = np.zeros([nlev, nlat, ntp - 1])
+    c_4 = np.zeros([nlev, nlat, ntp - 1])
+    c_5 = np.zeros([nlev, nlat, ntp - 1])
+    c_6 = np.zeros([nlev, nlat, ntp - 1])
+    u_u = u_t * np.conj(u_t) + u_t * np.conj(u_t)
+    u_v = u_t * np.conj(v_t) + v_t * np.conj(u_t)
+    v_v = v_t * np.conj(v_t) + v_t * np.conj(v_t)
+    u_w = u_t * np.conj(wap) + wap * np.conj(u_t)
+    v_w = v_t * np.conj(wap) + wap * np.conj(v_t)
+    for i_l in np.arange(nlat):
+        c_1[:, i_l, :] = dudy[:, i_l][:, np.newaxis] * u_v[:, i_l, :]
+        c_2[:, i_l, :] = dvdy[:, i_l][:, np.newaxis] * v_v[:, i_l, :]
+        c_5[:, i_l, :] = (np.tan(lat[i_l]) / AA * np.real(
+            utt[:, i_l, 0])[:, np.newaxis] * (u_v[:, i_l, :]))
+        c_6[:, i_l, :] = -(np.tan(lat[i_l]) / AA * np.real(
+            vtt[:, i_l, 0])[:, np.newaxis] * (u_u[:, i_l, :]))
+    for l_l in np.arange(nlev):
+        c_3[l_l, :, :] = dudp[l_l, :][:, np.newaxis] * u_w[l_l, :, :]
+        c_4[l_l, :, :] = dvdp[l_l, :][:, np.newaxis] * v_w[l_l, :, :]
+    ke2kz = (c_1 + c_2 + c_3 + c_4 + c_5 + c_6)
+    ke2kz[:, :, 0] = 0.
+    return ke2kz
+
+
+def _mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
+    """Reference implementation of ``mkatas`` (one timestep)."""
+    t_r = np.fft.ifft(t_t, axis=2)
+    u_r = np.fft.ifft(u_t, axis=2)
+    v_r = np.fft.ifft(v_t, axis=2)
+    w_r = np.fft.ifft(wap, axis=2)
+    tur = t_r * u_r
+    tvr = t_r * v_r
+    twr = t_r * w_r
+    t_u = np.fft.fft(tur, axis=2)
+    t_v = np.fft.fft(tvr, axis=2)
+    t_w = np.fft.fft(twr, axis=2)
+    c_1 = (t_u * np.conj(ttt[:, :, np.newaxis]) -
+           ttt[:, :, np.newaxis] * np.conj(t_u))
+    c_6 = (t_w * np.conj(ttt[:, :, np.newaxis]) -
+           ttt[:, :, np.newaxis] * np.conj(t_w))
+    c_2 = np.zeros([nlev, nlat, ntp - 1])
+    c_3 = np.zeros([nlev, nlat, ntp - 1])
+    c_5 = np.zeros([nlev, nlat, ntp - 1])
+    for i_l in range(nlat):
+        if i_l == 0:
+            c_2[:, i_l, :] = (
+                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l])) *
+                np.conj(ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
+            c_3[:, i_l, :] = (
+                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l])) *
+                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
+        elif i_l == nlat - 1:
+            c_2[:, i_l, :] = (
+                t_v[:, i_l, :] / (AA * (lat[i_l] - lat[i_l - 1])) *
+                np.conj(ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
+            c_3[:, i_l, :] = (
+                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l] - lat[i_l - 1])) *
+                (ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
+        else:
+            c_2[:, i_l, :] = (
+                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l - 1])) *
+                np.conj(ttt[:, i_l + 1, np.newaxis] -
+                        ttt[:, i_l - 1, np.newaxis]))
+            c_3[:, i_l, :] = (
+                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l - 1]))
+                * (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
+    for l_l in range(nlev):
+        if l_l == 0:
+            c_5[l_l, :, :] = (
+                (ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
+                (p_l[l_l + 1] - p_l[l_l]))
+        elif l_l == nlev - 1:
+            c_5[l_l, :, :] = (
+                (ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
+                (p_l[l_l] - p_l[l_l - 1]))
+        else:
+            c51 = ((ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
+                   (p_l[l_l + 1] - p_l[l_l]))
+            c52 = ((ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
+                   (p_l[l_l] - p_l[l_l - 1]))
+            c_5[l_l, :, :] = (
+                (c51 * (p_l[l_l] - p_l[l_l - 1]) + c52 *
+                 (p_l[l_l + 1] - p_l[l_l])) / (p_l[l_l + 1] - p_l[l_l - 1]))
+    k_k = np.arange(0, ntp - 1)
+    at2as = (
+        ((k_k - 1)[np.newaxis, np.newaxis, :] * np.imag(c_1) /
+         (AA * np.cos(lat[np.newaxis, :, np.newaxis])) +
+         np.real(t_w * np.conj(c_5) + np.conj(t_w) * c_5) + np.real(c_2 + c_3)
+         + R / (CP * p_l[:, np.newaxis, np.newaxis]) * np.real(c_6)) *
+        g_w[:, :, np.newaxis])
+    at2as[:, :, 0] = 0.
+    return at2as
+
+
+def _mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
+    """Reference implementation of ``mkktks`` (one timestep)."""
+    dut = np.zeros([nlev, nlat, ntp - 1])
+    dvt = np.zeros([nlev, nlat, ntp - 1])
+    dlat = np.zeros([nlat])
+    u_r = np.fft.irfft(u_t, axis=2)
+    v_r = np.fft.irfft(v_t, axis=2)
+    uur = u_r * u_r
+    uvr = u_r * v_r
+    vvr = v_r * v_r
+    u_u = np.fft.rfft(uur, axis=2)
+    v_v = np.fft.rfft(vvr, axis=2)
+    u_v = np.fft.rfft(uvr, axis=2)
+    c_1 = u_u * np.conj(u_t) - u_t * np.conj(u_u)
+    # c_3 = u_v * np.conj(u_t) + u_t * np.conj(u_v)
+    c_5 = u_u * np.conj(v_t) + v_t * np.conj(u_u)
+    c_6 = u_v * np.conj(v_t) - v_t * np.conj(u_v)
+    for i_l in range(nlat):
+        if i_l == 0:
+            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l, :])
+            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l, :])
+            dlat[i_l] = (lat[i_l + 1] - lat[i_l])
+        elif i_l == nlat - 1:
+            dut[:, i_l, :] = (utt[:, i_l, :] - utt[:, i_l - 1, :])
+            dvt[:, i_l, :] = (vtt[:, i_l, :] - vtt[:, i_l - 1, :])
+            dlat[i_l] = (lat[i_l] - lat[i_l - 1])
+        else:
+            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l - 1, :])
+            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l - 1, :])
+            dlat[i_l] = (lat[i_l + 1] - lat[i_l - 1])
+    c21 = np.conj(u_u) * dut / dlat[np.newaxis, :, np.newaxis]
+    c22 = u_u * np.conj(dut) / dlat[np.newaxis, :, np.newaxis]
+    c41 = np.conj(v_v) * dvt / dlat[np.newaxis, :, np.newaxis]
+    c42 = v_v * np.conj(dvt) / dlat[np.newaxis, :, np.newaxis]
+    k_k = np.arange(0, ntp - 1)
+    kt2ks = (np.real(c21 + c22 + c41 + c42) / AA +
+             np.tan(lat)[np.newaxis, :, np.newaxis] * np.real(c_1 - c_5) / AA +
+             np.imag(c_1 + c_6) * (k_k - 1)[np.newaxis, np.newaxis, :] /
+             (AA * np.cos(lat)[np.newaxis, :, np.newaxis]))
+    kt2ks[:, :, 0] = 0
+    return kt2ks
+
+
+def _stabil(ta_gmn, p_l, nlev):
+    """Reference implementation of ``stabil`` (one timestep)."""
+    cpdr = CP / R
+    t_g = ta_gmn
+    g_s = np.zeros(nlev)
+    for i_l in range(nlev):
+        if i_l == 0:
+            dtdp = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
+        elif i_l == nlev - 1:
+            dtdp = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
+        else:
+            dtdp1 = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
+            dtdp2 = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
+            dtdp = (
+                (dtdp1 * (p_l[i_l] - p_l[i_l - 1]) + dtdp2 *
+                 (p_l[i_l + 1] - p_l[i_l])) / (p_l[i_l + 1] - p_l[i_l - 1]))
+        g_s[i_l] = CP / (t_g[i_l] - p_l[i_l] * dtdp * cpdr)
+    return g_s
+
+
+def _reference_terms(fields, fields_tmn, lev, y_l, g_w):
+    """Compute the reservoirs and conversion terms one timestep at a time."""
+    ta_c, ua_c, va_c, wap_c = fields
+    ta_tmn, ua_tmn, va_tmn, wap_tmn = fields_tmn
+    nlev, ntime, nlat, nwave = ta_c.shape
+    ntp = nwave + 1
+    ta_ztmn, ta_gmn = _averages(ta_tmn, g_w)
+    gam_ztmn = np.zeros([nlev, nlat])
+    for l_l in range(nlat):
+        gam_ztmn[:, l_l] = _stabil(ta_ztmn[:, l_l], lev, nlev)
+    gam_tmn = _stabil(ta_gmn, lev, nlev)
+    terms = [np.zeros([nlev, ntime, nlat, ntp - 1]) for _ in range(7)]
+    for t_t in range(ntime):
+        ta_tan = ta_c[:, t_t, :, :] - ta_tmn
+        ua_tan = ua_c[:, t_t, :, :] - ua_tmn
+        va_tan = va_c[:, t_t, :, :] - va_tmn
+        wap_tan = wap_c[:, t_t, :, :] - wap_tmn
+        _, ta_tgan = _averages(ta_tan, g_w)
+        _, wap_tgan = _averages(wap_tan, g_w)
+        terms[0][:, t_t, :, :] = _makek(ua_tan, va_tan)
+        terms[1][:, t_t, :, :] = _makea(ta_tan, ta_tgan, gam_tmn)
+        terms[2][:, t_t, :, :] = _mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan,
+                                        lev)
+        terms[3][:, t_t, :, :] = _mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn,
+                                         ta_gmn, lev, y_l, gam_tmn, nlat,
+                                         nlev)
+        terms[4][:, t_t, :, :] = _mkkekz(ua_tan, va_tan, wap_tan, ua_tmn,
+                                         va_tmn, lev, y_l, nlat, ntp, nlev)
+        terms[5][:, t_t, :, :] = _mkatas(ua_tan, va_tan, wap_tan, ta_tan,
+                                         ta_ztmn, gam_ztmn, lev, y_l, nlat,
+                                         ntp, nlev)
+        terms[6][:, t_t, :, :] = _mkktks(ua_tan, va_tan, ua_tmn, va_tmn, y_l,
+                                         nlat, ntp, nlev)
+    return terms
+
+
+def _get_fields(ntime):
+    """Get random Fourier coefficients of t, u, v and w."""
+    rng = np.random.RandomState(ntime)
+    shape = (NLEV, ntime, NLAT, NWAVE)
+    scales = [(250., 10.), (0., 10.), (0., 10.), (0., 0.1)]
+    fields = []
+    for (offset, scale) in scales:
+        field = scale * (rng.normal(size=shape) + 1j * rng.normal(size=shape))
+        field[..., 0] = field[..., 0].real + offset
+        fields.append(field)
+    return fields
+
+
+def test_delta():
+    """Test centered differences against a loop over the axis."""
+    fld = np.random.RandomState(0).normal(size=(4, 7, 3))
+    expected = np.zeros(fld.shape)
+    for i_l in range(7):
+        lower = max(i_l - 1, 0)
+        upper = min(i_l + 1, 6)
+        expected[:, i_l, :] = fld[:, upper, :] - fld[:, lower, :]
+    np.testing.assert_array_equal(lorenz_cycle.delta(fld, axis=1), expected)
+
+
+def test_vert_deriv():
+    """Test vertical derivatives against the per-level formulas."""
+    fld = np.random.RandomState(1).normal(size=(NLEV, NLAT))
+    expected = np.zeros(fld.shape)
+    expected[0] = (fld[1] - fld[0]) / (LEV[1] - LEV[0])
+    expected[-1] = (fld[-1] - fld[-2]) / (LEV[-1] - LEV[-2])
+    for l_l in range(1, NLEV - 1):
+        dfdp1 = (fld[l_l + 1] - fld[l_l]) / (LEV[l_l + 1] - LEV[l_l])
+        dfdp2 = (fld[l_l] - fld[l_l - 1]) / (LEV[l_l] - LEV[l_l - 1])
+        expected[l_l] = ((dfdp1 * (LEV[l_l] - LEV[l_l - 1]) + dfdp2 *
+                          (LEV[l_l + 1] - LEV[l_l])) /
+                         (LEV[l_l + 1] - LEV[l_l - 1]))
+    np.testing.assert_allclose(
+        lorenz_cycle.vert_deriv(fld, LEV), expected, rtol=1e-12)
+
+
+def test_stabil():
+    """Test the stability parameter for several profiles at once."""
+    ta_z = 250. + 10. * np.random.RandomState(2).normal(size=(NLEV, NLAT))
+    expected = np.zeros(ta_z.shape)
+    for l_l in range(NLAT):
+        expected[:, l_l] = _stabil(ta_z[:, l_l], LEV, NLEV)
+    np.testing.assert_allclose(
+        lorenz_cycle.stabil(ta_z, LEV, NLEV), expected, rtol=1e-12)
+    np.testing.assert_allclose(
+        lorenz_cycle.stabil(ta_z[:, 0], LEV, NLEV), expected[:, 0],
+        rtol=1e-12)
+
+
+@pytest.mark.parametrize('ntime', [1, 4, 7])
+def test_lec_terms(ntime, monkeypatch):
+    """Test batched reservoirs and conversions against a per-step loop."""
+    monkeypatch.setattr(lorenz_cycle, 'NTIME_CHUNK', 3)
+    fields = _get_fields(ntime)
+    fields_tmn = [np.nanmean(field, axis=1) for field in fields]
+    _, y_l, g_w = lorenz_cycle.weights(LEV, NLEV, LAT)
+    expected = _reference_terms(fields, fields_tmn, LEV, y_l, g_w)
+    terms = lorenz_cycle.lec_terms(fields, fields_tmn, LEV, y_l, g_w)
+    assert len(terms) == len(expected)
+    for (term, ref) in zip(terms, expected):
+        assert term.shape == (NLEV, ntime, NLAT, NWAVE)
+        np.testing.assert_allclose(term, ref, rtol=1e-10, atol=1e-12)
+
+
+def test_lec_year_removes_scratch_dir(tmpdir, monkeypatch):
+    """Test that the scratch directory is removed if the LEC fails."""
+
+    class _Cdo:
+        """Stand-in for Cdo."""
+
+        def selyear(self, *args, **kwargs):
+            """Pretend to select a year."""
+
+    def _fourier_coeff(*args, **kwargs):
+        """Fail like a broken input file would."""
+        raise OSError('broken input')
+
+    monkeypatch.setattr(lorenz_cycle, 'Cdo', _Cdo)
+    monkeypatch.setattr(lorenz_cycle.fourier_coefficients, 'fourier_coeff',
+                        _fourier_coeff)
+    with pytest.raises(OSError, match='broken input'):
+        lorenz_cycle.lec_year('model', 2000, str(tmpdir), str(tmpdir),
+                              'energy.nc', 'tas.nc')
+    assert tmpdir.listdir() == []
+
+
+def _write_fourier_coeff(filename, seed, ntime=4):
+    """Write random Fourier coefficients of t,u,v,w for one year."""
+    rng = np.random.RandomState(seed)
+    with Dataset(filename, 'w') as dataset:
+        for name, values in [('time', np.arange(ntime, dtype=float)),
+                             ('plev', LEV), ('lat', LAT),
+                             ('wave', np.arange(NWAVE, dtype=float))]:
+            dataset.createDimension(name, len(values))
+            dataset.createVariable(name, 'f8', (name, ))[:] = values
+        for name, mean, scale in [('ta', 250., 10.), ('ua', 10., 5.),
+                                  ('va', 0., 5.), ('wap', 0., 0.1)]:
+            values = scale * rng.standard_normal(
+                (ntime, NLEV, NLAT, NWAVE))
+            values[:, :, :, 0] += mean
+            dataset.createVariable(name, 'f8',
+                                   ('time', 'plev', 'lat', 'wave'))[:] = values
+
+
+def test_map_years(tmpdir):
+    """Test that the LEC of each year is the same in parallel."""
+    years = [2000, 2001]
+    args_list = []
+    for year in years:
+        filenc = str(tmpdir.join('fourier_coeff_{}.nc'.format(year)))
+        _write_fourier_coeff(filenc, year)
+        for outdir in ['serial', 'parallel']:
+            tmpdir.ensure(outdir, dir=True)
+            args_list.append([
+                str(tmpdir.join(outdir)), 'model', year, filenc,
+                str(tmpdir.join(outdir, '{}.png'.format(year))),
+                str(tmpdir.join(outdir, '{}.txt'.format(year)))
+            ])
+    serial = lorenz_cycle.map_years(lorenz_cycle.lorenz, args_list[0::2])
+    parallel = lorenz_cycle.map_years(lorenz_cycle.lorenz, args_list[1::2],
+                                      2)
+    assert np.all(np.isfinite(serial))
+    np.testing.assert_allclose(parallel, serial, rtol=1e-12)
+    for year in years:
+        for name in ['ek', 'ape', 'a2k', 'ae2az', 'ke2kz']:
+            basename = '{}_tmap_model_{}.nc'.format(name, year)
+            with Dataset(str(tmpdir.join('serial', basename))) as expected, \
+                    Dataset(str(tmpdir.join('parallel', basename))) as result:
+                np.testing.assert_allclose(result.variables[name][:],
+                                           expected.variables[name][:],
+                                           rtol=1e-12)
+
+
+def test_map_years_daemon(monkeypatch):
+    """Test that the years are processed serially in a daemonic process."""
+
+    class _Process:
+        """Stand-in for a pool worker."""
+
+        daemon = True
+
+    def _fail(*args, **kwargs):
+        """Fail if a pool is started."""
+        raise AssertionError('a pool was started')
+
+    monkeypatch.setattr(lorenz_cycle.multiprocessing, 'current_process',
+                        _Process)
+    monkeypatch.setattr(lorenz_cycle.multiprocessing, 'get_context', _fail)
+    result = lorenz_cycle.map_years(pow, [[2, 3], [3, 2]], 2)
+    assert result == [8, 9]
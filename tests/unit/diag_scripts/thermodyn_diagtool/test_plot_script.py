@@ -0,0 +1,99 @@
+"""Tests for the meridional transports of the thermodyn_diagtool."""
+
+import math
+
+import numpy as np
+import pytest
+from scipy import interpolate
+
+from esmvaltool.diag_scripts.thermodyn_diagtool import plot_script
+
+LAT = np.linspace(-87.5, 87.5, 36)
+
+
+def _latwgt(lat, t_r):
+    """Compute weighted average over latitudes, one latitude at a time."""
+    conv = 2 * math.pi / 360
+    dlat = np.zeros(len(lat))
+    for i in range(len(lat) - 1):
+        dlat[i] = abs(lat[i + 1] - lat[i])
+    dlat[len(lat) - 1] = dlat[len(lat) - 2]
+    tr2 = np.zeros(np.shape(t_r))
+    for j in range(len(lat)):
+        tr2[:, j] = t_r[:, j] * np.cos(conv * lat[j]) * conv * dlat[j] / 2
+    return tr2
+
+
+def _transport(zmean, gmean, lat):
+    """Integrate the budgets with a loop over the latitudes."""
+    zmn_ub = np.zeros(np.shape(zmean))
+    for index, value in enumerate(gmean):
+        zmn_ub[index, :] = zmean[index, :] - value
+    zmn_ub[np.isnan(zmn_ub)] = 0
+    cumb = np.zeros(np.shape(zmean))
+    for j_l in range(len(lat) - 1):
+        cumb[:, j_l] = (-2 * np.nansum(
+            _latwgt(lat[j_l:len(lat)], zmn_ub[:, j_l:len(lat)]), axis=1))
+    r_earth = 6.371 * 10**6
+    return [zmn_ub, 2 * math.pi * cumb * r_earth * r_earth]
+
+
+def _zerocross1d(x_x, y_y):
+    """Find the zero crossing points of a single data set."""
+    indi = np.where(y_y[1:] * y_y[0:-1] < 0.0)[0]
+    d_x = x_x[indi + 1] - x_x[indi]
+    d_y = y_y[indi + 1] - y_y[indi]
+    z_c = -y_y[indi] * (d_x / d_y) + x_x[indi]
+    z_i = np.where(y_y == 0.0)[0]
+    z_i = z_i[np.where((z_i > 0) & (z_i < x_x.size - 1))]
+    z_i = z_i[np.where(y_y[z_i - 1] * y_y[z_i + 1] < 0.0)]
+    return np.sort(np.concatenate((z_c, x_x[z_i])))
+
+
+def _transp_max(lat, transp, lim):
+    """Find the peaks of a single transport."""
+    x_c = _zerocross1d(lat, np.gradient(transp))
+    y_i = np.zeros(2)
+    xc_cut = np.zeros(2)
+    j_p = 0
+    for value in x_c:
+        if abs(value) <= lim:
+            xc_cut[j_p] = value
+            y_i[j_p] = interpolate.interp1d(lat, transp, kind='cubic')(value)
+            j_p = j_p + 1
+            if j_p == 2:
+                break
+    return [xc_cut, y_i]
+
+
+def _get_budgets(nyears=5):
+    """Get noisy zonal mean budgets with two or more transport peaks."""
+    rng = np.random.RandomState(0)
+    zmean = (100. * np.cos(np.deg2rad(2 * LAT)) +
+             40. * rng.normal(size=(nyears, len(LAT))))
+    zmean[1, 3] = np.nan
+    gmean = np.nanmean(zmean, axis=1) + rng.normal(size=nyears)
+    return zmean, gmean
+
+
+def test_transport():
+    """Test the vectorized transport against a loop over latitudes."""
+    zmean, gmean = _get_budgets()
+    result = plot_script.transport(zmean, gmean, LAT)
+    expected = _transport(zmean, gmean, LAT)
+    np.testing.assert_allclose(result[0], expected[0])
+    np.testing.assert_allclose(result[1], expected[1], rtol=1e-10,
+                               atol=1e-10 * np.abs(expected[1]).max())
+
+
+@pytest.mark.parametrize('lim', [90., 45., 30.])
+def test_transp_max(lim):
+    """Test the vectorized peak search against a loop over the years."""
+    zmean, gmean = _get_budgets()
+    transp = _transport(zmean, gmean, LAT)[1]
+    lat_max, tr_max = plot_script.transp_max(LAT, transp, lim)
+    assert lat_max.shape == (len(transp), 2)
+    for year, transp_yr in enumerate(transp):
+        expected = _transp_max(LAT, transp_yr, lim)
+        np.testing.assert_allclose(lat_max[year], expected[0])
+        np.testing.assert_allclose(tr_max[year], expected[1], rtol=1e-8)
@@ -0,0 +1,98 @@
+"""Tests for the processing of several models in the thermodyn_diagtool."""
+
+import os
+
+import numpy as np
+import yaml
+
+from esmvaltool.diag_scripts.shared import ProvenanceLogger
+from esmvaltool.diag_scripts.thermodyn_diagtool import thermodyn_diagnostics
+
+MODELS = ['model1', 'model2', 'model3']
+
+
+def _get_cfg(tmpdir, n_workers=1):
+    """Get a configuration with run and work directories in tmpdir."""
+    return {
+        'run_dir': str(tmpdir.ensure('run', dir=True)),
+        'work_dir': str(tmpdir.ensure('work', dir=True)),
+        'n_workers': n_workers,
+        'lec_workers': 2,
+    }
+
+
+def _get_record(model):
+    """Get the provenance record of a model."""
+    return {'caption': 'Test output of {}'.format(model), 'ancestors': []}
+
+
+def _compute_model(cfg, model, filenames):
+    """Stand-in for compute_model, logging one provenance record."""
+    assert cfg['lec_workers'] == 1 or cfg['n_workers'] == 1
+    with ProvenanceLogger(cfg) as provlog:
+        provlog.log('{}.nc'.format(model), _get_record(model))
+    seed = sum(ord(char) for char in model + filenames[0])
+    rng = np.random.RandomState(seed)
+    return {
+        key: rng.uniform(size=shape)
+        for key, shape in thermodyn_diagnostics.SUMMARY_SHAPES.items()
+    }
+
+
+def _read_provenance(cfg):
+    """Read the main provenance file."""
+    filename = os.path.join(cfg['run_dir'], 'diagnostic_provenance.yml')
+    with open(filename) as file:
+        return yaml.safe_load(file)
+
+
+def test_get_model_cfg(tmpdir):
+    """Test that each model gets its own run directory."""
+    cfg = _get_cfg(tmpdir)
+    model_cfg = thermodyn_diagnostics.get_model_cfg(cfg, 'model1')
+    assert model_cfg['run_dir'] == os.path.join(cfg['run_dir'], 'model1')
+    assert os.path.isdir(model_cfg['run_dir'])
+    assert model_cfg['lec_workers'] == 1
+    assert cfg['run_dir'] == str(tmpdir.join('run'))
+    assert cfg['lec_workers'] == 2
+
+
+def test_merge_provenance(tmpdir):
+    """Test that the provenance records of the models are merged."""
+    cfg = _get_cfg(tmpdir)
+    with ProvenanceLogger(cfg) as provlog:
+        provlog.log('main.png', _get_record('main'))
+    model_cfgs = [
+        thermodyn_diagnostics.get_model_cfg(cfg, model) for model in MODELS
+    ]
+    for model, model_cfg in zip(MODELS, model_cfgs):
+        _compute_model(model_cfg, model, ['file.nc'])
+    thermodyn_diagnostics.merge_provenance(cfg, model_cfgs)
+    expected = {'{}.nc'.format(model): _get_record(model) for model in MODELS}
+    expected['main.png'] = _get_record('main')
+    assert _read_provenance(cfg) == expected
+    for model_cfg in model_cfgs:
+        assert not os.path.exists(model_cfg['run_dir'])
+    assert os.listdir(cfg['run_dir']) == ['diagnostic_provenance.yml']
+
+
+def test_compute_models(tmpdir, monkeypatch):
+    """Test that the summary does not depend on n_workers."""
+    monkeypatch.setattr(thermodyn_diagnostics, 'compute_model',
+                        _compute_model)
+    filenames = [['{}.nc'.format(model)] for model in MODELS]
+    summaries = []
+    provenance = []
+    for n_workers in [1, 2]:
+        cfg = _get_cfg(tmpdir.mkdir(str(n_workers)), n_workers)
+        summaries.append(
+            thermodyn_diagnostics.compute_models(cfg, MODELS, filenames))
+        provenance.append(_read_provenance(cfg))
+        assert os.listdir(cfg['run_dir']) == ['diagnostic_provenance.yml']
+    assert provenance[0] == provenance[1]
+    assert len(provenance[0]) == len(MODELS)
+    serial, parallel = summaries
+    assert set(serial) == set(thermodyn_diagnostics.SUMMARY_SHAPES)
+    for key, shape in thermodyn_diagnostics.SUMMARY_SHAPES.items():
+        assert serial[key].shape == (len(MODELS), ) + shape
+        np.testing.assert_array_equal(parallel[key], serial[key])